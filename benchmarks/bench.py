@@ -0,0 +1,267 @@
+"""
+Benchmarks for calendar queries and widget scheduling. Run from a checkout:
+
+    python benchmarks/bench.py --output bench.json
+
+Results are written as JSON so that runs from different releases can be
+compared. Each result has a name, the parameters it was run with and timing
+statistics in seconds.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+# benchmark the checkout this script lives in rather than an installed copy
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
+
+# pylint: disable=wrong-import-position
+from sleepcounter.core.application import Application
+from sleepcounter.core.mocks import mock_datetime
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.event import Anniversary, SpecialDay
+from sleepcounter.core.widget import BaseWidget
+
+DEFAULT_SIZES = (10, 1000, 100000, 1000000)
+DEFAULT_WIDGETS = (1, 10, 100)
+QUERIES = (
+    "next_event",
+    "events",
+    "todays_event",
+    "special_day_today",
+    "sleeps_to_next_event",
+)
+_START = datetime.datetime(2019, 1, 1, 12)
+# seconds to wait for a widget's first update before giving up
+_UPDATE_TIMEOUT = 60.0
+# run in a fresh interpreter to time a cold start from the first import
+_STARTUP_SCRIPT = """
+import json, sys, threading, time
+started = time.perf_counter()
+sys.path.insert(0, %r)
+from sleepcounter.core.application import Application
+from sleepcounter.core.diary import CUSTOM_DIARY
+from sleepcounter.core.widget import BaseWidget
+imported = time.perf_counter()
+
+class Widget(BaseWidget):
+    updated = threading.Event()
+
+    def update(self):
+        self.calendar.next_event
+        self.updated.set()
+
+app = Application([Widget(CUSTOM_DIARY)])
+app.start()
+if not Widget.updated.wait(%r):
+    app.stop()
+    sys.exit("The widget wasn't updated within %r seconds")
+updated = time.perf_counter()
+app.stop()
+print(json.dumps({
+    "import": imported - started,
+    "first_update": updated - started,
+}))
+"""
+
+
+def make_events(count, seed=0):
+    """Returns a reproducible mix of Anniversary and SpecialDay events"""
+    rand = random.Random(seed)
+    events = []
+    for i in range(count):
+        month, day = rand.randint(1, 12), rand.randint(1, 28)
+        sleeps = rand.choice([None, 10, 20, 100])
+        if rand.random() < 0.5:
+            events.append(Anniversary(
+                name="anniversary%d" % i, month=month, day=day, sleeps=sleeps))
+        else:
+            events.append(SpecialDay(
+                name="special%d" % i,
+                year=rand.randint(2018, 2021),
+                month=month,
+                day=day,
+                sleeps=sleeps))
+    return events
+
+
+def summarise(samples):
+    """Returns timing statistics for a list of durations in seconds"""
+    return {
+        "count": len(samples),
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "max": max(samples),
+    }
+
+
+def bench_queries(size, repeat):
+    """
+    Time each calendar query on a calendar of the given size. Cold queries
+    are made at a new day and time each repeat so nothing is cached; warm
+    queries repeat the query straight afterwards.
+    """
+    results = []
+    start = time.perf_counter()
+    calendar = Calendar(make_events(size))
+    results.append({
+        "name": "calendar.build",
+        "size": size,
+        "seconds": summarise([time.perf_counter() - start]),
+    })
+    for query in QUERIES:
+        cold, warm = [], []
+        for i in range(repeat):
+            now = _START + datetime.timedelta(days=i, hours=i % 24)
+            with mock_datetime(target=now):
+                start = time.perf_counter()
+                getattr(calendar, query)
+                cold.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                getattr(calendar, query)
+                warm.append(time.perf_counter() - start)
+        results.append({
+            "name": "calendar.%s.cold" % query,
+            "size": size,
+            "seconds": summarise(cold),
+        })
+        results.append({
+            "name": "calendar.%s.warm" % query,
+            "size": size,
+            "seconds": summarise(warm),
+        })
+    return results
+
+
+class _TimingWidget(BaseWidget):
+    # records when each update happens
+    def __init__(self, calendar, interval):
+        super().__init__(calendar)
+        self.mins_between_updates = interval / 60
+        self.updates = []
+
+    def update(self):
+        self.updates.append(time.monotonic())
+
+
+def bench_application(widgets, threaded, interval, duration):
+    """
+    Time Application.start and stop with the given number of widgets and
+    measure how late each widget's updates were compared to its timetable.
+    """
+    calendar = Calendar(make_events(10))
+    instances = [_TimingWidget(calendar, interval) for _ in range(widgets)]
+    app = Application(instances, threaded=threaded)
+    start = time.perf_counter()
+    app.start()
+    started = time.perf_counter() - start
+    time.sleep(duration)
+    start = time.perf_counter()
+    app.stop()
+    stopped = time.perf_counter() - start
+    drift = []
+    for widget in instances:
+        for first, later in zip(widget.updates, widget.updates[1:]):
+            drift.append(later - first - interval)
+    mode = "threaded" if threaded else "scheduled"
+    results = [
+        {
+            "name": "application.start.%s" % mode,
+            "widgets": widgets,
+            "seconds": summarise([started]),
+        },
+        {
+            "name": "application.stop.%s" % mode,
+            "widgets": widgets,
+            "seconds": summarise([stopped]),
+        },
+    ]
+    if drift:
+        results.append({
+            "name": "application.wakeup_drift.%s" % mode,
+            "widgets": widgets,
+            "interval": interval,
+            "seconds": summarise(drift),
+        })
+    return results
+
+
+def bench_startup(repeat):
+    """
+    Time importing sleepcounter and starting an application up to the first
+    widget update, each in a fresh interpreter
+    """
+    samples = {"import": [], "first_update": []}
+    for _ in range(repeat):
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                _STARTUP_SCRIPT % (_ROOT, _UPDATE_TIMEOUT, _UPDATE_TIMEOUT)],
+            check=True,
+            stdout=subprocess.PIPE).stdout
+        for name, seconds in json.loads(output).items():
+            samples[name].append(seconds)
+    return [
+        {"name": "startup.%s" % name, "seconds": summarise(seconds)}
+        for name, seconds in samples.items()]
+
+
+def main(argv=None):
+    """Run the benchmarks and write the results as JSON"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+        help="numbers of events to benchmark calendar queries with")
+    parser.add_argument(
+        "--widgets", type=int, nargs="+", default=DEFAULT_WIDGETS,
+        help="numbers of widgets to benchmark the application with")
+    parser.add_argument(
+        "--repeat", type=int, default=20,
+        help="repeats of each calendar query")
+    parser.add_argument(
+        "--interval", type=float, default=0.05,
+        help="seconds between widget updates when measuring drift")
+    parser.add_argument(
+        "--duration", type=float, default=1.0,
+        help="seconds to run the application for when measuring drift")
+    parser.add_argument(
+        "--startups", type=int, default=5,
+        help="cold starts to time, each in a new interpreter")
+    parser.add_argument(
+        "--output", type=argparse.FileType("w"), default=sys.stdout,
+        help="file to write JSON results to")
+    args = parser.parse_args(argv)
+
+    results = bench_startup(args.startups) if args.startups else []
+    for size in args.sizes:
+        results.extend(bench_queries(size, args.repeat))
+    for widgets in args.widgets:
+        for threaded in (False, True):
+            results.extend(bench_application(
+                widgets, threaded, args.interval, args.duration))
+    json.dump(
+        {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "threads": threading.active_count(),
+            "timestamp": datetime.datetime.now(
+                datetime.timezone.utc).isoformat(),
+            "results": results,
+        },
+        args.output,
+        indent=2)
+    args.output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
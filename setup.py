@@ -5,4 +5,7 @@ setuptools.setup(
     version="0.0.0",
     packages=setuptools.find_namespace_packages(include=["sleepcounter.*"]),
     install_requires=[],
+    extras_require={
+        "numpy": ["numpy"],
+    },
 )
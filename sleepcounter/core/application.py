@@ -2,8 +2,21 @@
 Sleepcounter application
 """
 from logging import getLogger
+import time
+
+from sleepcounter.core import metrics
+from sleepcounter.core.lazy import lazy_import
+from sleepcounter.core.render import RenderHost, RenderWidget
+from sleepcounter.core.scheduler import AsyncScheduler, Scheduler
+from sleepcounter.core.simulation import Simulation
+from sleepcounter.core.time.state import SharedState
+from sleepcounter.core.widget import AsyncBaseWidget, BaseWidget
+
+asyncio = lazy_import("asyncio")  # pylint: disable=invalid-name
 
 _LOGGER = getLogger("application")
+# seconds that stop() waits for widgets by default
+_STOP_TIMEOUT = 5.0
 
 
 class Application:
@@ -11,22 +24,178 @@ class Application:
     The sleepcounter application class that manages the starting and stopping
     of all its date display widgets.
 
+    By default all widgets are updated from a single scheduler thread. Pass
+    threaded=True to run each widget in its own thread instead. Alternatively
+    await run_async() to run widgets on an asyncio event loop, which is
+    required for AsyncBaseWidgets.
+
+    Widgets reading their calendar's state (see BaseWidget.state) share one
+    evaluation of each calendar per change of state, so the cost of an update
+    doesn't grow with the number of widgets showing the same calendar.
+
+    Pass processes to render the frames of RenderWidgets in that many worker
+    processes (see sleepcounter.core.render) rather than in the threads that
+    update them.
+
+    Pass update_timeout to stop one hung widget, eg. with a stuck display
+    driver, from holding up the others (see Scheduler). It can't be combined
+    with threaded=True, where each widget already has a thread of its own.
+
     keyword arguments:
     widgets -- a list of all widgets to be run
+    threaded -- whether to start a thread per widget
+    processes -- the number of processes to render frames in, or None to
+        render them in-process
+    update_timeout -- the seconds a widget update may take before it's
+        treated as hung, or None to never time updates out
     """
-    def __init__(self, widgets: list):
+    def __init__(
+            self,
+            widgets: list,
+            threaded=False,
+            processes=None,
+            update_timeout=None,
+        ):
+        if threaded and update_timeout is not None:
+            raise ValueError("Threaded widgets can't time out their updates")
         self._widgets = widgets
+        self._update_timeout = update_timeout
+        self._scheduler = None if threaded else Scheduler(update_timeout)
+        self._host = RenderHost(processes) if processes else None
+        self._shared_states = {}
+        self._async_stop = None
 
     def start(self):
         """Start all the widgets"""
         _LOGGER.info("Starting widgets...")
-        for widget in self._widgets:
-            _LOGGER.info("Starting widget %s", widget)
-            widget.start()
+        with metrics.timer("application.start"):
+            self._share_states()
+            self._start_host()
+            if self._scheduler is not None:
+                self._scheduler.start()
+            for widget in self._widgets:
+                _LOGGER.info("Starting widget %s", widget)
+                if self._scheduler is None:
+                    widget.start()
+                else:
+                    widget.start(scheduler=self._scheduler)
+        metrics.observe("application.widgets", len(self._widgets))
+
+    def stop(self, timeout=_STOP_TIMEOUT):
+        """
+        Stop all the widgets, waiting up to timeout seconds in all for their
+        threads to finish. Returns a list of the stragglers: the widgets still
+        busy, eg. in the middle of a hung update, which are also logged.
+
+        Under run_async() the widgets finish stopping on the event loop, so
+        stop() returns straight away without any stragglers.
 
-    def stop(self):
-        """Stop all the widgets"""
+        keyword arguments:
+        timeout -- the seconds to wait, or None to wait for as long as it takes
+        """
         _LOGGER.info("Stopping widgets...")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stragglers = []
+        with metrics.timer("application.stop"):
+            for widget in self._widgets:
+                _LOGGER.info("Stopping widget %s", widget)
+                widget.stop()
+            if self._async_stop is not None:
+                loop, stopped = self._async_stop
+                loop.call_soon_threadsafe(stopped.set)
+                return stragglers
+            if self._scheduler is not None:
+                stragglers.extend(
+                    self._scheduler.stop(self._remaining(deadline)))
+            else:
+                for widget in self._widgets:
+                    if isinstance(widget, BaseWidget) and widget.is_alive():
+                        widget.join(self._remaining(deadline))
+                        if widget.is_alive():
+                            stragglers.append(widget)
+            for widget in self._stop_sharing(self._remaining(deadline)):
+                if widget not in stragglers:
+                    stragglers.append(widget)
+        metrics.observe("application.stragglers", len(stragglers))
+        for widget in stragglers:
+            _LOGGER.warning("Widget %s has not stopped", widget)
+        return stragglers
+
+    async def run_async(self, executor=None):
+        """
+        Run all the widgets on the running event loop until stop() is called
+        or the coroutine is cancelled. Coroutine updates run on the loop and
+        plain updates in an executor.
+
+        keyword arguments:
+        executor -- a concurrent.futures executor for plain widget updates.
+            Defaults to the loop's default thread pool.
+        """
+        _LOGGER.info("Starting widgets on event loop...")
+        scheduler = AsyncScheduler(executor, self._update_timeout)
+        stopped = asyncio.Event()
+        self._async_stop = (asyncio.get_running_loop(), stopped)
+        self._share_states()
+        self._start_host()
+        try:
+            for widget in self._widgets:
+                _LOGGER.info("Starting widget %s", widget)
+                widget.start(scheduler=scheduler)
+            await stopped.wait()
+        finally:
+            for widget in self._widgets:
+                if widget.running:
+                    widget.stop()
+            await scheduler.stop()
+            self._async_stop = None
+            self._stop_sharing()
+            _LOGGER.info("Widgets on event loop have stopped")
+
+    def _share_states(self):
+        # give widgets one SharedState per calendar
         for widget in self._widgets:
-            _LOGGER.info("Stopping widget %s", widget)
-            widget.stop()
+            if not isinstance(widget, (BaseWidget, AsyncBaseWidget)):
+                continue
+            calendar = widget.calendar
+            shared = self._shared_states.get(id(calendar))
+            if shared is None:
+                shared = self._shared_states[id(calendar)] = SharedState(
+                    calendar)
+            widget.shared_state = shared
+        metrics.observe("application.calendars", len(self._shared_states))
+
+    @staticmethod
+    def _remaining(deadline):
+        # the seconds left until a monotonic deadline, or None for no deadline
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+
+    def _stop_sharing(self, timeout=None):
+        # close the render host and drop the shared states once widgets have
+        # stopped, returning the widgets still rendering
+        busy = []
+        if self._host is not None:
+            busy = self._host.close(timeout)
+        for widget in self._widgets:
+            if isinstance(widget, (BaseWidget, AsyncBaseWidget)):
+                widget.shared_state = None
+        self._shared_states = {}
+        return busy
+
+    def _start_host(self):
+        # render the frames of render widgets in worker processes
+        if self._host is None:
+            return
+        self._host.start()
+        for widget in self._widgets:
+            if isinstance(widget, RenderWidget):
+                self._host.add(widget)
+
+    def simulate(self, start, end):
+        """
+        Replay the updates the widgets would make from datetime `start` until
+        datetime `end` on virtual time and return the trace as a list of
+        sleepcounter.core.simulation.TraceEntry. The widgets aren't started.
+        """
+        return Simulation(self._widgets).run(start, end)
@@ -0,0 +1,292 @@
+"""
+A local daemon that owns calendars and serves their state over a Unix domain
+socket, so that widgets in many display processes share one computation:
+
+    server = CalendarServer({"home": calendar}, "/run/sleepcounter.sock")
+    await server.serve_forever()
+
+and in each display process:
+
+    calendar = CalendarClient("/run/sleepcounter.sock", "home")
+    widget = MyWidget(calendar)
+
+The protocol is line based. A request is a compact JSON array of the calendar
+name and the ISO 8601 time to evaluate it at. The response is the state of
+the calendar at that time as a compact JSON object (see CalendarState.encode)
+or {"error": message} if the request can't be answered.
+"""
+import asyncio
+import datetime
+import json
+from logging import getLogger
+import socket
+from threading import Lock
+
+from sleepcounter.core import metrics
+from sleepcounter.core.time.clock import get_clock
+from sleepcounter.core.time.state import CalendarState, StateQueries
+
+_LOGGER = getLogger("daemon")
+_DEFAULT_NAME = "default"
+_ENCODING = "utf-8"
+
+
+class QueryError(ValueError):
+    """Raised by a CalendarClient when the server can't answer a query"""
+
+
+def _dumps(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode(
+        _ENCODING)
+
+
+class CalendarServer:
+    """
+    Serves the state of calendars over a Unix domain socket from an asyncio
+    event loop.
+
+    Each calendar is evaluated at most once per state boundary: states are
+    cached until their valid_until time and the seconds to the next event are
+    worked out from the cached state. Cached states are kept with the version
+    of the calendar's events that they were taken at and recomputed once the
+    version moves on.
+
+    Clients whose clocks lag the state that's cached are answered from it
+    while they're in the same day or night period. Earlier times are
+    evaluated exactly but not cached, so a client with a skewed clock can't
+    displace the state shared by the others. Requests arriving during the
+    same iteration of the event loop are answered in one batch, with each
+    calendar evaluated at most once, so a crowd of clients waking at a
+    boundary costs a single evaluation.
+
+    keyword arguments:
+    calendars -- a dict of calendars by name, or a single calendar to serve
+        by the name "default"
+    path -- the path of the socket to listen on
+    """
+    def __init__(self, calendars, path):
+        if not isinstance(calendars, dict):
+            calendars = {_DEFAULT_NAME: calendars}
+        self._calendars = calendars
+        self._path = path
+        self._server = None
+        self._connections = {}
+        # (state, version of the events) by calendar name
+        self._states = {}
+        self._pending = {}
+
+    @property
+    def path(self):
+        """Returns the path of the socket"""
+        return self._path
+
+    async def start(self):
+        """Start listening on the socket"""
+        self._server = await asyncio.start_unix_server(
+            self._handle, path=self._path)
+        _LOGGER.info(
+            "Serving %s calendars on %s", len(self._calendars), self._path)
+
+    async def serve_forever(self):
+        """Start listening if need be and serve until cancelled"""
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def stop(self):
+        """Stop listening and drop connected clients"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        connections = dict(self._connections)
+        for writer in connections.values():
+            writer.close()
+        await asyncio.gather(*connections, return_exceptions=True)
+        _LOGGER.info("Stopped serving on %s", self._path)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    async def query(self, name, now=None):
+        """
+        Returns the state of a calendar as a response dict. Must be called on
+        the server's event loop.
+
+        keyword arguments:
+        name -- the name of the calendar
+        now -- the datetime to evaluate at. Defaults to the current time of
+            the calendar's clock.
+        """
+        if name not in self._calendars:
+            raise KeyError("Unknown calendar %r" % (name,))
+        future = asyncio.get_running_loop().create_future()
+        if not self._pending:
+            asyncio.get_running_loop().call_soon(self._flush)
+        self._pending.setdefault(name, []).append((now, future))
+        return await future
+
+    def _flush(self):
+        # answer every request received since the last flush
+        pending, self._pending = self._pending, {}
+        metrics.observe(
+            "daemon.batch_size",
+            sum(len(requests) for requests in pending.values()))
+        for name, requests in pending.items():
+            calendar = self._calendars[name]
+            current = calendar.clock.now()
+            requests = [
+                (current if now is None else now, future)
+                for now, future in requests]
+            requests.sort(key=lambda request: request[0])
+            for now, future in requests:
+                try:
+                    result = self._state(name, now).encode(now)
+                except Exception as error:  # pylint: disable=broad-except
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def _state(self, name, now):
+        calendar = self._calendars[name]
+        # read before evaluating, since the events may be changed by another
+        # thread meanwhile
+        version = calendar.version
+        state, cached_version = self._states.get(name, (None, None))
+        if state is None or cached_version != version:
+            state = None
+        elif state.covers(now) or (
+                now < state.now and
+                calendar.next_change(now) == state.valid_until):
+            # the state holds for the whole period, including times before
+            # it was taken
+            metrics.increment("daemon.cache_hit")
+            return state
+        elif now < state.now:
+            metrics.increment("daemon.past_query")
+            return CalendarState.from_snapshot(calendar.snapshot(now))
+        metrics.increment("daemon.cache_miss")
+        state = CalendarState.from_snapshot(calendar.snapshot(now))
+        self._states[name] = (state, version)
+        return state
+
+    async def _handle(self, reader, writer):
+        connection = asyncio.current_task()
+        self._connections[connection] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(_dumps(await self._respond(line)))
+                await writer.drain()
+        except ConnectionError:
+            _LOGGER.info("Client disconnected")
+        finally:
+            self._connections.pop(connection, None)
+            writer.close()
+
+    async def _respond(self, line):
+        try:
+            name, now = json.loads(line.decode(_ENCODING))
+            if now is not None:
+                now = datetime.datetime.fromisoformat(now)
+            return await self.query(name, now)
+        except KeyError as error:
+            return {"error": error.args[0]}
+        except Exception as error:  # pylint: disable=broad-except
+            _LOGGER.exception("Failed to answer %r", line)
+            return {"error": "%s: %s" % (type(error).__name__, error)}
+
+
+class CalendarClient(StateQueries):
+    """
+    A read-only stand-in for a Calendar whose queries are answered by a
+    CalendarServer. It may be given to widgets in place of a calendar. Each
+    answer is kept until the calendar's next change, so the server is asked
+    at most once per state boundary. Safe to share between threads.
+
+    Since answers are kept, changes to the calendar's events are only seen
+    from the next state boundary on. Create a new client to see them sooner.
+
+    keyword arguments:
+    path -- the path of the server's socket
+    name -- the name of the calendar to query
+    clock -- the Clock to tell the time by. Defaults to the clock in use.
+    timeout -- seconds to wait for the server before raising socket.timeout
+    """
+    def __init__(self, path, name=_DEFAULT_NAME, clock=None, timeout=5.0):
+        self._path = path
+        self._name = name
+        self._clock = clock
+        self._timeout = timeout
+        self._lock = Lock()
+        self._socket = None
+        self._stream = None
+        self._state = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def clock(self):
+        """Returns the clock that the client tells the time by"""
+        return self._clock if self._clock is not None else get_clock()
+
+    def close(self):
+        """Close the connection to the server"""
+        with self._lock:
+            self._disconnect()
+
+    def _state_at(self, now):
+        with self._lock:
+            state = self._state
+            if state is None or not state.covers(now):
+                state = self._state = CalendarState.decode(self._request(now))
+            return state
+
+    def _request(self, now):
+        request = _dumps([self._name, now.isoformat()])
+        try:
+            response = self._exchange(request)
+        except (ConnectionError, EOFError):
+            # the server may have restarted so try once more
+            _LOGGER.info("Reconnecting to %s", self._path)
+            response = self._exchange(request)
+        if "error" in response:
+            raise QueryError(response["error"])
+        return response
+
+    def _exchange(self, request):
+        try:
+            if self._socket is None:
+                self._socket = socket.socket(
+                    socket.AF_UNIX, socket.SOCK_STREAM)
+                self._socket.settimeout(self._timeout)
+                self._socket.connect(self._path)
+                self._stream = self._socket.makefile("rb")
+            self._socket.sendall(request)
+            line = self._stream.readline()
+            if not line:
+                raise EOFError("Server closed the connection")
+        except (OSError, EOFError):
+            # a connection that failed or timed out mid-answer can't be
+            # reused, eg. the stream refuses reads once it has timed out
+            self._disconnect()
+            raise
+        return json.loads(line.decode(_ENCODING))
+
+    def _disconnect(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
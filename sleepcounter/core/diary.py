@@ -1,34 +1,45 @@
 """
-A custom calendar that can be used to start up the application
+A custom calendar that can be used to start up the application. CUSTOM_DIARY is
+built on first use rather than on import to keep start-up fast.
 """
 from sleepcounter.core.time.calendar import Calendar
 from sleepcounter.core.time.event import SpecialDay, Anniversary
 
 _DEFAULT_SLEEPS_TO_COUNT = 20
 
-CUSTOM_DIARY = Calendar([
-    Anniversary(
-        name='Bonfire Night',
-        month=11,
-        day=5,
-        sleeps=_DEFAULT_SLEEPS_TO_COUNT
-    ),
-    Anniversary(
-        name='Halloween',
-        month=10,
-        day=31,
-        sleeps=_DEFAULT_SLEEPS_TO_COUNT
-    ),
-    Anniversary(
-        name='Christmas',
-        month=12,
-        day=25,
-    ),
-    SpecialDay(
-        name='Legoland',
-        year=2019,
-        month=4,
-        day=27,
-        sleeps=_DEFAULT_SLEEPS_TO_COUNT
-    ),
-])
+
+def create_diary():
+    """Returns a new calendar holding the events of the custom diary"""
+    return Calendar([
+        Anniversary(
+            name='Bonfire Night',
+            month=11,
+            day=5,
+            sleeps=_DEFAULT_SLEEPS_TO_COUNT
+        ),
+        Anniversary(
+            name='Halloween',
+            month=10,
+            day=31,
+            sleeps=_DEFAULT_SLEEPS_TO_COUNT
+        ),
+        Anniversary(
+            name='Christmas',
+            month=12,
+            day=25,
+        ),
+        SpecialDay(
+            name='Legoland',
+            year=2019,
+            month=4,
+            day=27,
+            sleeps=_DEFAULT_SLEEPS_TO_COUNT
+        ),
+    ])
+
+
+def __getattr__(name):
+    # build CUSTOM_DIARY the first time it's used
+    if name == "CUSTOM_DIARY":
+        return globals().setdefault("CUSTOM_DIARY", create_diary())
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,33 @@
+"""
+Deferred imports for modules that are slow to import but only needed on some
+code paths, eg. asyncio, which is only used when widgets run on an event loop
+"""
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Returns a module that is only executed when one of its attributes is first
+    used. If the module has already been imported it's returned as it is.
+
+    Only top-level modules can be deferred. Finding a submodule imports its
+    package, and a deferred submodule isn't set as an attribute of the package
+    so code doing `import package.module` would later fail. Import submodules
+    where they're needed instead.
+
+    keyword arguments:
+    name -- the absolute name of a top-level module
+    """
+    if "." in name:
+        raise ValueError("Cannot defer importing submodule %s" % name)
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
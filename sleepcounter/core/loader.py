@@ -0,0 +1,298 @@
+"""
+Load calendars of events from CSV, JSON Lines and iCalendar files. Records are
+streamed through a pipeline of generators so that large diaries can be loaded
+without holding the whole file in memory:
+
+    records = read_records(source)   # (line, dict) pairs read from the file
+    events = parse_events(records)   # Anniversary/SpecialDay instances
+    calendar.add_events(batch)       # bulk addition in fixed-size batches
+
+Records define the fields name, month, day and optionally year and sleeps.
+Records without a year are anniversaries. Bad records are reported to an error
+handler and skipped.
+"""
+import csv
+import datetime
+import itertools
+import json
+from logging import getLogger
+import os
+
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.event import Anniversary, SpecialDay
+
+_LOGGER = getLogger("loader")
+_DEFAULT_BATCH_SIZE = 1000
+# a non-leap year used to check that anniversaries happen every year
+_ANY_YEAR = 2001
+_FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".ics": "ics",
+}
+
+
+class LoadError(ValueError):
+    """
+    Raised or reported when a record cannot be loaded
+
+    keyword arguments:
+    message -- a description of the problem
+    source -- the name of the file being read
+    line -- the line number of the record in the file
+    """
+    def __init__(self, message, source=None, line=None):
+        self.message = message
+        self.source = source
+        self.line = line
+        super().__init__(
+            "%s:%s: %s" % (source or "<unknown>", line or "?", message))
+
+
+def log_error(error):
+    """The default error handler: logs the error and skips the record"""
+    _LOGGER.warning("Skipping bad record %s", error)
+
+
+def raise_error(error):
+    """An error handler that aborts loading on the first bad record"""
+    raise error
+
+
+def read_records(source, fmt=None):
+    """
+    Generator yielding (line, record) pairs from a file where record is a dict
+    of raw field values. LoadErrors are yielded in place of records that
+    cannot be read.
+
+    keyword arguments:
+    source -- a path or an open text file
+    fmt -- one of "csv", "jsonl" or "ics". Guessed from the file extension of
+        source if not given.
+    """
+    fmt = fmt or _guess_format(source)
+    try:
+        reader = {
+            "csv": _read_csv,
+            "jsonl": _read_jsonl,
+            "ics": _read_ics,
+        }[fmt]
+    except KeyError as error:
+        raise ValueError("Unsupported diary format %r" % fmt) from error
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline="", encoding="utf-8") as stream:
+            yield from reader(stream, os.fspath(source))
+    else:
+        yield from reader(source, getattr(source, "name", None))
+
+
+def parse_events(records, on_error=log_error):
+    """
+    Generator converting (line, record) pairs into event instances. Records
+    that are not valid are passed to on_error as a LoadError and skipped.
+
+    keyword arguments:
+    records -- an iterable of (line, record) pairs as from read_records
+    on_error -- a callable taking a LoadError
+    """
+    for line, record in records:
+        if isinstance(record, LoadError):
+            on_error(record)
+            continue
+        try:
+            yield event_from_record(record)
+        except LoadError as error:
+            on_error(LoadError(error.message, record.get("_source"), line))
+
+
+def event_from_record(record):
+    """
+    Create an event from a dict with the fields name, month, day and the
+    optional fields year and sleeps. Raises LoadError if the record is not
+    valid.
+    """
+    name = record.get("name")
+    if not name:
+        raise LoadError("missing event name")
+    month = _integer(record, "month")
+    day = _integer(record, "day")
+    year = _integer(record, "year", required=False)
+    sleeps = _integer(record, "sleeps", required=False)
+    if sleeps is not None and sleeps < 0:
+        raise LoadError("sleeps must not be negative")
+    try:
+        datetime.date(year=year or _ANY_YEAR, month=month, day=day)
+    except ValueError as error:
+        raise LoadError("invalid date: %s" % error) from error
+    if year is None:
+        event = Anniversary(name=name, month=month, day=day, sleeps=sleeps)
+    else:
+        event = SpecialDay(
+            name=name, year=year, month=month, day=day, sleeps=sleeps)
+    return event
+
+
+def load_events(source, fmt=None, on_error=log_error):
+    """
+    Generator yielding the events defined in a file
+
+    keyword arguments:
+    source -- a path or an open text file
+    fmt -- one of "csv", "jsonl" or "ics"
+    on_error -- a callable taking a LoadError for each bad record
+    """
+    return parse_events(read_records(source, fmt), on_error)
+
+
+def load_calendar(
+        source,
+        calendar=None,
+        fmt=None,
+        on_error=log_error,
+        batch_size=_DEFAULT_BATCH_SIZE,
+    ):
+    """
+    Load the events defined in a file into a calendar, adding them in batches
+    so that only one batch of parsed events is held outside the calendar at a
+    time. Returns the calendar.
+
+    keyword arguments:
+    source -- a path or an open text file
+    calendar -- the calendar to add events to. A new one is created if None.
+    fmt -- one of "csv", "jsonl" or "ics"
+    on_error -- a callable taking a LoadError for each bad record
+    batch_size -- the number of events to add to the calendar at once
+    """
+    calendar = calendar if calendar is not None else Calendar()
+    events = load_events(source, fmt, on_error)
+    count = 0
+    while True:
+        batch = list(itertools.islice(events, batch_size))
+        if not batch:
+            break
+        calendar.add_events(batch)
+        count += len(batch)
+    _LOGGER.info("Loaded %s events from %s", count, source)
+    return calendar
+
+
+def _guess_format(source):
+    name = os.fspath(source) if isinstance(source, (str, os.PathLike)) \
+        else getattr(source, "name", "")
+    extension = os.path.splitext(str(name))[1].lower()
+    try:
+        return _FORMATS[extension]
+    except KeyError as error:
+        raise ValueError(
+            "Cannot tell the format of diary %r" % name) from error
+
+
+def _integer(record, field, required=True):
+    value = record.get(field)
+    if value is None or value == "":
+        if required:
+            raise LoadError("missing %s" % field)
+        return None
+    if isinstance(value, bool):
+        raise LoadError("invalid %s %r" % (field, value))
+    try:
+        return int(value)
+    except (TypeError, ValueError) as error:
+        raise LoadError("invalid %s %r" % (field, value)) from error
+
+
+def _read_csv(stream, source):
+    reader = csv.DictReader(stream)
+    for row in reader:
+        row["_source"] = source
+        yield reader.line_num, row
+
+
+def _read_jsonl(stream, source):
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as error:
+            yield line, LoadError("invalid JSON: %s" % error, source, line)
+            continue
+        if not isinstance(record, dict):
+            yield line, LoadError("record is not an object", source, line)
+            continue
+        record["_source"] = source
+        yield line, record
+
+
+def _unfold(stream):
+    # join iCalendar continuation lines, yielding (line, text) pairs
+    start, text = None, None
+    for line, raw in enumerate(stream, start=1):
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and text is not None:
+            text += raw[1:]
+            continue
+        if text is not None:
+            yield start, text
+        start, text = line, raw
+    if text is not None:
+        yield start, text
+
+
+def _unescape(text):
+    result, chars = [], iter(text)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            char = "\n" if char in ("n", "N") else char
+        result.append(char)
+    return "".join(result)
+
+
+def _read_ics(stream, source):
+    start, event = None, None
+    for line, text in _unfold(stream):
+        name, _, value = text.partition(":")
+        name = name.split(";", 1)[0].upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            start, event = line, {}
+        elif event is None:
+            continue
+        elif name == "END" and value.upper() == "VEVENT":
+            yield start, _vevent_record(event, source, start)
+            start, event = None, None
+        else:
+            event.setdefault(name, value)
+
+
+def _vevent_record(vevent, source, line):
+    dtstart = vevent.get("DTSTART", "")
+    if len(dtstart) < 8 or not dtstart[:8].isdigit():
+        return LoadError("invalid DTSTART %r" % dtstart, source, line)
+    record = {
+        "name": _unescape(vevent.get("SUMMARY", "")),
+        "year": dtstart[:4],
+        "month": dtstart[4:6],
+        "day": dtstart[6:8],
+        "sleeps": vevent.get("X-SLEEPCOUNTER-SLEEPS"),
+        "_source": source,
+    }
+    if "RRULE" in vevent:
+        rule = dict(
+            part.partition("=")[::2]
+            for part in vevent["RRULE"].upper().split(";") if part)
+        # BYMONTH and BYMONTHDAY are redundant if they repeat DTSTART
+        redundant = {
+            "INTERVAL": "1",
+            "BYMONTH": str(int(dtstart[4:6])),
+            "BYMONTHDAY": str(int(dtstart[6:8])),
+        }
+        for part, value in redundant.items():
+            if rule.get(part, value).lstrip("0") == value:
+                rule.pop(part, None)
+        if rule != {"FREQ": "YEARLY"}:
+            return LoadError(
+                "unsupported RRULE %r" % vevent["RRULE"], source, line)
+        record["year"] = None
+    return record
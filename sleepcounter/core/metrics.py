@@ -0,0 +1,228 @@
+"""
+Lightweight, pluggable metrics for the hot paths of sleepcounter. Metrics are
+disabled by default, in which case recording costs a single check of a module
+global. Enable them with an in-process sink to inspect them on the device:
+
+    from sleepcounter.core import metrics
+    metrics.enable()
+    ...
+    metrics.stats()
+
+Any object with increment, timing and observe methods may be used as a sink,
+eg. to forward metrics to statsd.
+
+Start-up is measured from the first import of this module, which happens as
+soon as sleepcounter.core is used: see first_update.
+"""
+import bisect
+import contextlib
+from logging import getLogger
+from threading import Event, Lock, Thread
+import time
+
+_LOGGER = getLogger("metrics")
+_INFINITY = float("inf")
+TIMING_BOUNDS = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0, _INFINITY)
+HISTOGRAM_BOUNDS = (1, 10, 100, 1000, 10000, 100000, _INFINITY)
+
+_sink = None
+_NULL_TIMER = contextlib.nullcontext()
+_STARTED = time.perf_counter()
+_first_update_done = False
+
+
+class Distribution:
+    """
+    Summary statistics and bucket counts of recorded values
+
+    keyword arguments:
+    bounds -- the ascending inclusive upper bounds of the buckets
+    """
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._buckets = [0] * len(bounds)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """Record a value"""
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self._buckets[bisect.bisect_left(self._bounds, value)] += 1
+
+    def as_dict(self):
+        """Returns the statistics as a dict"""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "buckets": {
+                ("le_%s" % bound): count
+                for bound, count in zip(self._bounds, self._buckets)},
+        }
+
+
+class InMemoryMetrics:
+    """A metrics sink holding counters, timers and histograms in memory"""
+    def __init__(self):
+        self._lock = Lock()
+        self._counters = {}
+        self._timers = {}
+        self._histograms = {}
+
+    def increment(self, name, value=1):
+        """Add value to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def timing(self, name, seconds):
+        """Record a duration in seconds"""
+        with self._lock:
+            if name not in self._timers:
+                self._timers[name] = Distribution(TIMING_BOUNDS)
+            self._timers[name].add(seconds)
+
+    def observe(self, name, value):
+        """Record a value in a histogram"""
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Distribution(HISTOGRAM_BOUNDS)
+            self._histograms[name].add(value)
+
+    def stats(self):
+        """Returns a dict of all metrics recorded so far"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "timers": {
+                    name: timer.as_dict()
+                    for name, timer in self._timers.items()},
+                "histograms": {
+                    name: histogram.as_dict()
+                    for name, histogram in self._histograms.items()},
+            }
+
+    def reset(self):
+        """Discard all metrics recorded so far"""
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+            self._histograms.clear()
+
+
+class _Timer:
+    # context manager recording the duration of its block
+    def __init__(self, sink, name):
+        self._sink = sink
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._sink.timing(self._name, time.perf_counter() - self._start)
+
+
+class PeriodicDump(Thread):
+    """
+    Logs the stats of the in-process metrics sink at a fixed interval until
+    stopped
+
+    keyword arguments:
+    interval -- seconds between dumps
+    log -- a callable taking the stats dict. Defaults to logging them.
+    """
+    def __init__(self, interval, log=None):
+        super().__init__(name="metrics-dump", daemon=True)
+        self._interval = interval
+        self._log = log or (lambda stats: _LOGGER.info("Metrics: %s", stats))
+        self._stopped = Event()
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            self._log(stats())
+
+    def stop(self):
+        """Stop dumping metrics"""
+        self._stopped.set()
+
+
+def enable(sink=None):
+    """
+    Start recording metrics to a sink and return it
+
+    keyword arguments:
+    sink -- the sink to record to. Defaults to a new InMemoryMetrics.
+    """
+    global _sink  # pylint: disable=global-statement
+    _sink = sink if sink is not None else InMemoryMetrics()
+    return _sink
+
+
+def disable():
+    """Stop recording metrics"""
+    global _sink  # pylint: disable=global-statement
+    _sink = None
+
+
+def enabled():
+    """Returns whether metrics are being recorded"""
+    return _sink is not None
+
+
+def increment(name, value=1):
+    """Add value to a counter"""
+    sink = _sink
+    if sink is not None:
+        sink.increment(name, value)
+
+
+def timing(name, seconds):
+    """Record a duration in seconds"""
+    sink = _sink
+    if sink is not None:
+        sink.timing(name, seconds)
+
+
+def observe(name, value):
+    """Record a value in a histogram"""
+    sink = _sink
+    if sink is not None:
+        sink.observe(name, value)
+
+
+def timer(name):
+    """Returns a context manager that records the duration of its block"""
+    sink = _sink
+    if sink is None:
+        return _NULL_TIMER
+    return _Timer(sink, name)
+
+
+def first_update():
+    """
+    Record the seconds from start-up to the first widget update of the
+    process as the timing startup.first_update. Later calls do nothing.
+    """
+    global _first_update_done  # pylint: disable=global-statement
+    if _first_update_done:
+        return
+    _first_update_done = True
+    timing("startup.first_update", time.perf_counter() - _STARTED)
+
+
+def stats():
+    """
+    Returns the metrics recorded by the current sink as a dict, or an empty
+    dict if metrics are disabled or the sink can't report them
+    """
+    sink = _sink
+    return sink.stats() if hasattr(sink, "stats") else {}
@@ -1,7 +1,10 @@
 """Mocks and utilities made publicly available for testing"""
 import datetime
+import random
 from unittest.mock import patch
 
+from sleepcounter.core.time.event import Anniversary, SpecialDay
+
 def mock_datetime(target):
     """
     A utility function for patching the standard library datetime object with a
@@ -39,3 +42,31 @@ def mock_datetime(target):
             return target
 
     return patch.object(datetime, 'datetime', MockedDatetime)
+
+
+def random_events(count, seed=0):
+    """
+    Returns a reproducible list of `count` Anniversary and SpecialDay events
+    on random dates, for filling calendars in tests
+
+    Keyword arguments:
+    count -- the number of events
+    seed -- the seed of the random dates
+    """
+    rand = random.Random(seed)
+    events = []
+    for i in range(count):
+        month = rand.randint(1, 12)
+        day = rand.randint(1, 28)
+        sleeps = rand.choice([None, 0, 1, 5, 20, 100])
+        if rand.random() < 0.5:
+            events.append(Anniversary(
+                name='anniversary%d' % i, month=month, day=day, sleeps=sleeps))
+        else:
+            events.append(SpecialDay(
+                name='special%d' % i,
+                year=rand.randint(2017, 2020),
+                month=month,
+                day=day,
+                sleeps=sleeps))
+    return events
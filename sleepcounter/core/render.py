@@ -0,0 +1,274 @@
+"""
+Widgets that render whole frames, eg. for LED matrices or e-paper, and a host
+that runs their rendering in worker processes so that CPU-bound drawing in
+pure Python doesn't hold up other widgets under the GIL:
+
+    class Matrix(RenderWidget):
+        frame_size = 64 * 32 * 3
+
+        @classmethod
+        def render(cls, state, frame):
+            ...  # draw state into the writable memoryview frame
+
+        def show(self, frame):
+            ...  # push the pixels in frame to the display
+
+    Application([Matrix(calendar)], processes=2).start()
+
+Each update the calendar's state is taken in the main process and sent to a
+worker as a compact CalendarState.encode() dict. The worker draws straight
+into a shared memory buffer owned by the widget, so the frame is never copied
+or pickled and the main process only pushes the pixels.
+"""
+from abc import abstractmethod
+from logging import getLogger
+from threading import Lock
+import time
+
+from sleepcounter.core import metrics
+from sleepcounter.core.time.state import CalendarState
+from sleepcounter.core.widget import BaseWidget
+
+# concurrent.futures and multiprocessing are slow to import and only needed
+# once a RenderHost is in use, so they're imported where they're used
+# pylint: disable=import-outside-toplevel
+
+_LOGGER = getLogger("render")
+# the shared memory buffers attached by a worker process, by name
+_attached = {}
+
+
+def _render_frame(widget_class, message, name, size, args):
+    # runs in a worker process: draw a frame into the named shared memory
+    from multiprocessing import shared_memory
+    buffer = _attached.get(name)
+    if buffer is None:
+        buffer = _attached[name] = shared_memory.SharedMemory(name=name)
+    with buffer.buf[:size] as frame:
+        widget_class.render(CalendarState.decode(message), frame, *args)
+
+
+class RenderWidget(BaseWidget):
+    """
+    A widget whose update is split into rendering a frame from the state of
+    its calendar and showing the frame. render() is a classmethod that only
+    sees the state and the frame, so it may run in a worker process (see
+    RenderHost). Otherwise frames are rendered in the widget's own thread.
+
+    frame_size must be set to the number of bytes in a frame.
+    """
+    frame_size = None
+
+    def __init__(self, calendar, label=None):
+        super().__init__(calendar, label)
+        self._host = None
+        self._frame = None
+
+    @property
+    def host(self):
+        """Returns the RenderHost that renders the widget's frames or None"""
+        return self._host
+
+    @property
+    def render_args(self):
+        """
+        Returns a tuple of extra picklable arguments for render(), eg. the
+        colours or fonts chosen for this widget
+        """
+        return ()
+
+    @classmethod
+    @abstractmethod
+    def render(cls, state, frame, *args):
+        """
+        Draw a frame. Must not use anything but its arguments, since it may be
+        called in another process, nor keep hold of the frame once it returns.
+
+        keyword arguments:
+        state -- the CalendarState to draw
+        frame -- a writable memoryview of frame_size bytes
+        args -- the widget's render_args
+        """
+
+    @abstractmethod
+    def show(self, frame):
+        """
+        Push a rendered frame to the display. The frame is only valid until
+        show() returns.
+
+        keyword arguments:
+        frame -- a read-only memoryview of frame_size bytes
+        """
+
+    def update(self):
+        """Render a frame of the calendar's current state and show it"""
+        if self._host is not None:
+            self._host.render(self)
+            return
+        if self._frame is None:
+            self._frame = bytearray(self.frame_size)
+        with memoryview(self._frame) as frame:
+            self.render(self.state, frame, *self.render_args)
+            with frame.toreadonly() as view:
+                self.show(view)
+
+
+class _Slot:
+    # the shared memory frame buffer of a hosted widget. The lock is held
+    # while a frame is rendered and shown.
+    def __init__(self, size):
+        from multiprocessing import shared_memory
+        self.buffer = shared_memory.SharedMemory(create=True, size=size)
+        self.lock = Lock()
+
+
+class RenderHost:
+    """
+    Renders the frames of RenderWidgets in a pool of worker processes. Each
+    hosted widget owns a shared memory buffer of frame_size bytes that the
+    workers draw into and the widget shows from. A widget's update blocks
+    its thread, without holding the GIL, until its frame is drawn.
+
+    keyword arguments:
+    processes -- the number of worker processes
+    mp_context -- the multiprocessing context to start workers with. Defaults
+        to "spawn", since forking a process that's running threads is unsafe.
+    """
+    def __init__(self, processes, mp_context=None):
+        self._processes = processes
+        self._context = mp_context
+        self._executor = None
+        self._slots = {}
+        self._lock = Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        """Start the pool of worker processes"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+        _LOGGER.info("Rendering in %s processes", self._processes)
+
+    def add(self, widget):
+        """
+        Render a widget's frames in the worker processes from now on
+
+        keyword arguments:
+        widget -- a RenderWidget
+        """
+        if not widget.frame_size:
+            raise ValueError("Widget %r has no frame_size" % (widget,))
+        with self._lock:
+            if widget not in self._slots:
+                self._slots[widget] = _Slot(widget.frame_size)
+        # pylint: disable=protected-access
+        widget._host = self
+        _LOGGER.info("Hosting widget %r", widget)
+
+    def remove(self, widget):
+        """
+        Render a widget's frames in its own thread again and free its buffer
+
+        keyword arguments:
+        widget -- a hosted RenderWidget
+        """
+        with self._lock:
+            slot = self._slots.pop(widget)
+        with slot.lock:
+            # pylint: disable=protected-access
+            widget._host = None
+            self._free(slot)
+
+    def render(self, widget):
+        """
+        Render a frame of a widget's calendar in a worker process and show
+        it. Raises any error raised by rendering.
+
+        keyword arguments:
+        widget -- a hosted RenderWidget
+        """
+        from concurrent import futures
+        message = widget.state.encode()
+        with self._lock:
+            slot = self._slots[widget]
+            executor = self._executor
+        if executor is None:
+            raise RuntimeError("Render host is not running")
+        with slot.lock:
+            with metrics.timer("render.frame.%s" % type(widget).__name__):
+                future = executor.submit(
+                    _render_frame,
+                    type(widget),
+                    message,
+                    slot.buffer.name,
+                    widget.frame_size,
+                    widget.render_args)
+                try:
+                    future.result()
+                except futures.BrokenExecutor:
+                    _LOGGER.exception("Worker died rendering %r", widget)
+                    self._restart(executor)
+                    raise
+            with slot.buffer.buf[:widget.frame_size] as frame:
+                with frame.toreadonly() as view:
+                    widget.show(view)
+
+    def close(self, timeout=None):
+        """
+        Stop the worker processes and free the frame buffers. Returns a list
+        of the widgets whose buffers couldn't be freed because they were still
+        rendering when the timeout ran out.
+
+        keyword arguments:
+        timeout -- the seconds to wait for frames being rendered, or None to
+            wait for them all to finish
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            executor, self._executor = self._executor, None
+            slots, self._slots = self._slots, {}
+        if executor is not None:
+            executor.shutdown(wait=deadline is None, cancel_futures=True)
+        busy = []
+        for widget, slot in slots.items():
+            wait = -1 if deadline is None else \
+                max(0.0, deadline - time.monotonic())
+            if not slot.lock.acquire(timeout=wait):
+                _LOGGER.warning("Widget %r is still rendering", widget)
+                busy.append(widget)
+                continue
+            try:
+                # pylint: disable=protected-access
+                widget._host = None
+                self._free(slot)
+            finally:
+                slot.lock.release()
+        _LOGGER.info("Render host has stopped")
+        return busy
+
+    def _create_executor(self):
+        from concurrent import futures
+        import multiprocessing
+        context = self._context
+        if context is None:
+            context = multiprocessing.get_context("spawn")
+        return futures.ProcessPoolExecutor(
+            max_workers=self._processes, mp_context=context)
+
+    def _restart(self, broken):
+        # replace a pool whose worker died, unless it's already replaced
+        with self._lock:
+            if self._executor is broken:
+                self._executor = self._create_executor()
+        metrics.increment("render.restarts")
+
+    @staticmethod
+    def _free(slot):
+        slot.buffer.close()
+        slot.buffer.unlink()
@@ -0,0 +1,338 @@
+"""
+Schedulers that update many widgets from a single thread or event loop
+"""
+from collections import namedtuple
+import functools
+import heapq
+import inspect
+import itertools
+from logging import getLogger
+from threading import Condition, Thread, current_thread
+import time
+
+from sleepcounter.core import metrics
+from sleepcounter.core.lazy import lazy_import
+
+asyncio = lazy_import("asyncio")  # pylint: disable=invalid-name
+
+_LOGGER = getLogger("scheduler")
+
+# seconds to wait before retrying a widget that failed
+_RETRY_SECONDS = 60
+
+_Timer = namedtuple("_Timer", ["due", "seq", "interval", "widget"])
+
+
+class Scheduler:
+    """
+    Calls update() on widgets when they are due from one worker thread. Timers
+    are kept in a heap ordered by due time so the thread only wakes when the
+    next widget needs updating. Widgets are dropped from the schedule once
+    they stop running.
+
+    Pass update_timeout to guard against updates that hang, eg. on a stuck
+    display driver. A watchdog thread reports any update running for longer
+    and isolates its widget: the hung update is left to itself on the old
+    worker thread and a new worker thread carries on updating the other
+    widgets. If the hung update ever returns, the widget is rescheduled and
+    the old thread finishes.
+
+    keyword arguments:
+    update_timeout -- the seconds an update may take before it's treated as
+        hung, or None to never time updates out
+    """
+    daemon = True
+
+    def __init__(self, update_timeout=None):
+        self._timers = []
+        self._seq = itertools.count()
+        self._condition = Condition()
+        self._thread = None
+        self._watchdog = None
+        self._running = False
+        self._update_timeout = update_timeout
+        # each worker thread has a generation and only the worker of the
+        # current generation takes timers. Updates in progress are kept by
+        # generation as (widget, deadline).
+        self._generation = 0
+        self._updates = {}
+
+    @property
+    def running(self):
+        """Retrieve the status of the scheduler's thread of activity"""
+        return self._running
+
+    @property
+    def updating(self):
+        """
+        Retrieve a list of the widgets in the middle of an update, including
+        those whose update has hung
+        """
+        with self._condition:
+            return [widget for widget, _ in self._updates.values()]
+
+    def __len__(self):
+        with self._condition:
+            return len(self._timers)
+
+    def add(self, widget, interval=None, delay=0):
+        """
+        Schedule a widget to be updated repeatedly
+
+        keyword arguments:
+        widget -- the widget to update. It's updated while widget.running.
+        interval -- fixed seconds between updates. By default the widget is
+            asked when it next needs updating after each update.
+        delay -- seconds to wait before the first update
+        """
+        with self._condition:
+            heapq.heappush(self._timers, _Timer(
+                time.monotonic() + delay, next(self._seq), interval, widget))
+            metrics.observe("scheduler.timers", len(self._timers))
+            self._condition.notify_all()
+        _LOGGER.info("Scheduled widget %r", widget)
+
+    def remove(self, widget):
+        """Remove a widget from the schedule"""
+        with self._condition:
+            self._timers = [
+                timer for timer in self._timers if timer.widget is not widget]
+            heapq.heapify(self._timers)
+            self._condition.notify_all()
+
+    def start(self):
+        """Start the scheduler's thread of activity"""
+        with self._condition:
+            if self._running:
+                _LOGGER.info("Scheduler already running")
+                return
+            self._running = True
+            self._start_worker()
+            if self._update_timeout is not None:
+                self._watchdog = Thread(
+                    target=self._watch,
+                    name="scheduler-watchdog",
+                    daemon=Scheduler.daemon)
+                self._watchdog.start()
+        _LOGGER.info("Scheduler has started")
+
+    def stop(self, timeout=None):
+        """
+        Stop the scheduler's thread of activity, waiting up to timeout seconds
+        for an update in progress to finish. Returns a list of the widgets
+        still in the middle of an update.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+            thread, watchdog = self._thread, self._watchdog
+        for other in (thread, watchdog):
+            if other is not None and other is not current_thread():
+                other.join(timeout)
+        _LOGGER.info("Scheduler has stopped")
+        return self.updating
+
+    def _start_worker(self):
+        # start a worker thread for the current generation. Must be called
+        # holding the condition.
+        self._thread = Thread(
+            target=self._run,
+            args=(self._generation,),
+            name="scheduler",
+            daemon=Scheduler.daemon)
+        self._thread.start()
+
+    def _next_due(self, generation):
+        # wait for the next timer to become due and pop it. Returns None once
+        # the scheduler is stopped or the worker has been replaced.
+        with self._condition:
+            while self._running and generation == self._generation:
+                if not self._timers:
+                    self._condition.wait()
+                    continue
+                remaining = self._timers[0].due - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                return heapq.heappop(self._timers)
+        return None
+
+    def _run(self, generation):
+        while True:
+            timer = self._next_due(generation)
+            if timer is None:
+                break
+            if not timer.widget.running:
+                _LOGGER.info("Widget %r has stopped", timer.widget)
+                continue
+            with self._condition:
+                deadline = None if self._update_timeout is None else \
+                    time.monotonic() + self._update_timeout
+                self._updates[generation] = (timer.widget, deadline)
+                self._condition.notify_all()
+            try:
+                with metrics.timer(
+                        "widget.update.%s" % type(timer.widget).__name__):
+                    timer.widget.update()
+                metrics.first_update()
+                if timer.interval is None:
+                    due = time.monotonic() + \
+                        timer.widget.seconds_until_update()
+                else:
+                    # keep to the timetable unless an update overran
+                    due = max(timer.due + timer.interval, time.monotonic())
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Widget %r failed to update", timer.widget)
+                metrics.increment("widget.update_failed")
+                due = time.monotonic() + (timer.interval or _RETRY_SECONDS)
+            with self._condition:
+                del self._updates[generation]
+                heapq.heappush(
+                    self._timers, timer._replace(due=due, seq=next(self._seq)))
+                self._condition.notify_all()
+                replaced = generation != self._generation
+            if replaced:
+                _LOGGER.warning(
+                    "Hung widget %r has returned and is rescheduled",
+                    timer.widget)
+                break
+
+    def _watch(self):
+        # isolate updates that overrun their deadline
+        with self._condition:
+            while self._running:
+                update = self._updates.get(self._generation)
+                if update is None:
+                    self._condition.wait()
+                    continue
+                widget, deadline = update
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                _LOGGER.error(
+                    "Widget %r has taken over %s seconds to update. Carrying "
+                    "on without it.",
+                    widget,
+                    self._update_timeout)
+                metrics.increment("widget.hung")
+                self._generation += 1
+                self._start_worker()
+                self._condition.notify_all()
+
+
+class AsyncScheduler:
+    """
+    Runs widget updates as tasks on an asyncio event loop. Coroutine updates
+    are awaited on the loop and plain updates are run in an executor so that
+    they don't block it. Waits between updates are cancellation-aware so the
+    scheduler stops promptly. Must be used from the thread running the loop.
+
+    Updates running for longer than update_timeout are reported as hung.
+    Coroutine updates are cancelled and retried later. Plain updates can't be
+    cancelled, so they're left running in the executor and the widget is
+    rescheduled once its update returns. Meanwhile it holds one of the
+    executor's threads.
+
+    keyword arguments:
+    executor -- a concurrent.futures executor for plain updates. Defaults to
+        the loop's default thread pool.
+    update_timeout -- the seconds an update may take before it's treated as
+        hung, or None to never time updates out
+    """
+    def __init__(self, executor=None, update_timeout=None):
+        self._executor = executor
+        self._update_timeout = update_timeout
+        self._tasks = set()
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def add(self, widget, interval=None, delay=0):
+        """
+        Schedule a widget to be updated repeatedly
+
+        keyword arguments:
+        widget -- the widget to update. It's updated while widget.running.
+        interval -- fixed seconds between updates. By default the widget is
+            asked when it next needs updating after each update.
+        delay -- seconds to wait before the first update
+        """
+        task = asyncio.get_running_loop().create_task(
+            self._run(widget, interval, delay))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        _LOGGER.info("Scheduled widget %r", widget)
+
+    async def stop(self):
+        """Cancel all widget tasks and wait for them to finish"""
+        self._stopped = True
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        _LOGGER.info("Async scheduler has stopped")
+
+    async def _update(self, widget, interval):
+        # run an update, reporting it if it hangs. Returns False if the update
+        # hung and was left running.
+        timeout = self._update_timeout
+        if inspect.iscoroutinefunction(widget.update):
+            try:
+                await asyncio.wait_for(widget.update(), timeout)
+            except asyncio.TimeoutError:
+                self._hung(widget)
+                raise
+            return True
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, widget.update)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._hung(widget)
+            future.add_done_callback(
+                functools.partial(self._returned, widget, interval))
+            return False
+        return True
+
+    def _returned(self, widget, interval, future):
+        # a hung plain update has returned
+        if not future.cancelled() and future.exception() is not None:
+            _LOGGER.error(
+                "Widget %r failed to update",
+                widget,
+                exc_info=future.exception())
+            metrics.increment("widget.update_failed")
+        if self._stopped or not widget.running:
+            return
+        _LOGGER.warning(
+            "Hung widget %r has returned and is rescheduled", widget)
+        self.add(widget, interval)
+
+    def _hung(self, widget):
+        _LOGGER.error(
+            "Widget %r has taken over %s seconds to update",
+            widget,
+            self._update_timeout)
+        metrics.increment("widget.hung")
+
+    async def _run(self, widget, interval, delay):
+        await asyncio.sleep(delay)
+        while widget.running:
+            try:
+                with metrics.timer(
+                        "widget.update.%s" % type(widget).__name__):
+                    if not await self._update(widget, interval):
+                        return
+                metrics.first_update()
+                wait = interval if interval is not None else \
+                    widget.seconds_until_update()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Widget %r failed to update", widget)
+                metrics.increment("widget.update_failed")
+                wait = interval or _RETRY_SECONDS
+            await asyncio.sleep(wait)
+        _LOGGER.info("Widget %r has stopped", widget)
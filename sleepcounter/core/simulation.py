@@ -0,0 +1,98 @@
+"""
+Replay widget updates on virtual time
+"""
+from collections import namedtuple
+import datetime
+import heapq
+import inspect
+import itertools
+from logging import getLogger
+
+from sleepcounter.core.lazy import lazy_import
+from sleepcounter.core.time.clock import VirtualClock, use_clock
+
+asyncio = lazy_import("asyncio")  # pylint: disable=invalid-name
+
+_LOGGER = getLogger("simulation")
+# the shortest time between two updates of the same widget
+_MIN_STEP = datetime.timedelta(seconds=1)
+
+TraceEntry = namedtuple(
+    "TraceEntry", ["time", "widget", "snapshot", "result", "error"])
+TraceEntry.__doc__ = """
+A record of one simulated widget update.
+
+time -- the virtual datetime of the update
+widget -- the widget that was updated
+snapshot -- the widget's CalendarSnapshot at that time: what it would show.
+    For stand-ins for a calendar (see StateQueries) it's a CalendarState.
+result -- the value returned by the widget's update()
+error -- the exception raised by update(), or None
+"""
+
+
+class Simulation:
+    """
+    Replays the updates that widgets would make between two datetimes on a
+    VirtualClock, without waiting. Each widget is updated at start and then
+    whenever it asks to be (see BaseWidget.seconds_until_update), so a year of
+    wake-up, bedtime and event transitions takes seconds to replay.
+
+    The virtual clock is installed as the clock in use while each widget is
+    updated, so between updates the process is back on the system clock.
+    Calendars given a clock of their own are not simulated.
+
+    keyword arguments:
+    widgets -- a list of BaseWidget or AsyncBaseWidget instances
+    """
+    def __init__(self, widgets):
+        self._widgets = widgets
+
+    def run(self, start, end):
+        """
+        Simulate the widgets from datetime `start` until datetime `end` and
+        return the trace as a list of TraceEntry in time order
+        """
+        return list(self.replay(start, end))
+
+    def replay(self, start, end):
+        """
+        Generator yielding a TraceEntry for each update made by the widgets
+        from datetime `start` until datetime `end`
+        """
+        clock = VirtualClock(start)
+        seq = itertools.count()
+        due = [(start, next(seq), widget) for widget in self._widgets]
+        heapq.heapify(due)
+        loop = asyncio.new_event_loop()
+        _LOGGER.info("Simulating %s widgets from %s to %s",
+                     len(self._widgets), start, end)
+        try:
+            while due and due[0][0] <= end:
+                now, _, widget = heapq.heappop(due)
+                clock.set(now)
+                # only while updating, not while the caller holds the entry
+                with use_clock(clock):
+                    entry = self._update(widget, now, loop)
+                    wait = datetime.timedelta(
+                        seconds=widget.seconds_until_update())
+                heapq.heappush(
+                    due, (now + max(wait, _MIN_STEP), next(seq), widget))
+                yield entry
+        finally:
+            loop.close()
+
+    @staticmethod
+    def _update(widget, now, loop):
+        result, error = None, None
+        try:
+            if inspect.iscoroutinefunction(widget.update):
+                result = loop.run_until_complete(widget.update())
+            else:
+                result = widget.update()
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.exception("Widget %r failed to update", widget)
+            error = exc
+        calendar = getattr(widget, "calendar", None)
+        snapshot = calendar.snapshot(now) if calendar is not None else None
+        return TraceEntry(now, widget, snapshot, result, error)
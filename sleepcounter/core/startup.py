@@ -0,0 +1,176 @@
+"""
+Fast cold starts. The state of the calendar is saved to a file whenever it's
+computed, along with the time it's valid until, so that after a restart the
+first frame can be drawn from the file while the calendar is still loading:
+
+    cache = StartupCache("/var/cache/sleepcounter/state.json")
+    calendar = StartupCalendar(lambda: load_calendar("diary.csv"), cache)
+    widget = MyWidget(calendar)
+"""
+import json
+from logging import getLogger
+import os
+from threading import Event, Lock, Thread
+
+from sleepcounter.core import metrics
+from sleepcounter.core.time.clock import get_clock
+from sleepcounter.core.time.state import CalendarState, StateQueries
+
+_LOGGER = getLogger("startup")
+
+
+class StartupCache:
+    """
+    Persists the last computed state of a calendar in a JSON file
+
+    keyword arguments:
+    path -- the path of the file
+    """
+    def __init__(self, path):
+        self._path = path
+
+    @property
+    def path(self):
+        """Returns the path of the file"""
+        return self._path
+
+    def save(self, state):
+        """
+        Write a CalendarState to the file, replacing it atomically so that a
+        power cut never leaves half a file. Raises TypeError, leaving the file
+        as it was, if the state holds events that can't be encoded.
+
+        keyword arguments:
+        state -- the state to save
+        """
+        message = state.encode()
+        temporary = self._path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as stream:
+            json.dump(message, stream, separators=(",", ":"))
+        os.replace(temporary, self._path)
+        _LOGGER.debug("Saved state valid until %s", state.valid_until)
+
+    def load(self, now):
+        """
+        Returns the saved CalendarState if it holds at the datetime `now`,
+        otherwise None
+
+        keyword arguments:
+        now -- the datetime that the state is needed for
+        """
+        try:
+            with open(self._path, encoding="utf-8") as stream:
+                state = CalendarState.decode(json.load(stream))
+        except FileNotFoundError:
+            _LOGGER.info("No saved state at %s", self._path)
+            return None
+        except (ValueError, KeyError, TypeError):
+            _LOGGER.warning("Ignoring unreadable state at %s", self._path)
+            return None
+        if not state.covers(now):
+            _LOGGER.info("Saved state expired at %s", state.valid_until)
+            return None
+        return state
+
+
+class StartupCalendar(StateQueries):
+    """
+    A stand-in for a calendar that is loaded in the background. Until it has
+    loaded, queries are answered from the state saved in a StartupCache if
+    that's still valid, and otherwise wait for the calendar. Afterwards the
+    calendar is evaluated once per state boundary, or when its events change,
+    and each new state is saved for the next start. Other attributes are those
+    of the calendar, waiting for it to load.
+
+    keyword arguments:
+    load -- a callable returning the Calendar, called on a background thread
+    cache -- a StartupCache
+    clock -- the Clock to tell the time by. Defaults to the clock in use.
+    """
+    def __init__(self, load, cache, clock=None):
+        self._load = load
+        self._cache = cache
+        self._clock = clock
+        self._calendar = None
+        self._error = None
+        self._loaded = Event()
+        self._lock = Lock()
+        # the state is current if it was computed from the loaded calendar
+        # at the version of its events. States from the cache have none.
+        self._state_version = None
+        self._state = cache.load(self.clock.now())
+        metrics.increment(
+            "startup.cache_hit" if self._state else "startup.cache_miss")
+        Thread(target=self._run, name="calendar-loader", daemon=True).start()
+
+    @property
+    def clock(self):
+        """Returns the clock that the calendar tells the time by"""
+        return self._clock if self._clock is not None else get_clock()
+
+    @property
+    def loaded(self):
+        """Returns whether the calendar has loaded"""
+        return self._loaded.is_set()
+
+    @property
+    def calendar(self):
+        """Returns the calendar, waiting for it to load"""
+        return self.wait()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the calendar to load and return it. Raises TimeoutError if it
+        doesn't load in time and re-raises any error raised by loading it.
+
+        keyword arguments:
+        timeout -- the maximum number of seconds to wait
+        """
+        if not self._loaded.wait(timeout):
+            raise TimeoutError("Calendar still loading")
+        if self._error is not None:
+            raise self._error
+        return self._calendar
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.calendar, name)
+
+    def _current(self):
+        # whether the state was computed from the calendar as it is now
+        return self._calendar is not None and \
+            self._state_version == self._calendar.version
+
+    def _run(self):
+        with metrics.timer("startup.load_calendar"):
+            try:
+                self._calendar = self._load()
+            except Exception as error:  # pylint: disable=broad-except
+                _LOGGER.exception("Failed to load the calendar")
+                self._error = error
+        self._loaded.set()
+        _LOGGER.info("Calendar loaded")
+
+    def _state_at(self, now):
+        with self._lock:
+            state = self._state
+            if state is not None and state.covers(now) and \
+                    (not self.loaded or self._current()):
+                return state
+        calendar = self.calendar
+        # read before evaluating, since the events may change meanwhile
+        version = calendar.version
+        state = CalendarState.from_snapshot(calendar.snapshot(now))
+        with self._lock:
+            self._state = state
+            self._state_version = version
+        try:
+            self._cache.save(state)
+        except OSError:
+            _LOGGER.exception("Failed to save state to %s", self._cache.path)
+        except TypeError as error:
+            # eg. a custom event type, which only costs the fast cold start
+            _LOGGER.warning(
+                "Not saving state to %s: %s", self._cache.path, error)
+        return state
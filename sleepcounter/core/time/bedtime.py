@@ -1,10 +1,158 @@
-"""Configuration constants defining wake-up time and bedtime"""
+"""Configuration of wake-up time, bedtime and timezone"""
 import datetime
+import functools
+
+from sleepcounter.core.time import clock
+
+_RESOLUTION = datetime.timedelta(microseconds=1)
+_DAY = datetime.timedelta(days=1)
+
+
+@functools.lru_cache(maxsize=4096)
+def _transitions(wake_up_time, bedtime, date):
+    # the wake-up time and the first instant of the night on a date in local
+    # time. Shared by all schedules with the same times whatever their
+    # timezone.
+    return (
+        datetime.datetime.combine(date, wake_up_time),
+        datetime.datetime.combine(date, bedtime) + _RESOLUTION)
+
+
+class Schedule:
+    """
+    The wake-up time, bedtime and timezone kept by a calendar. Days start at
+    wake-up time and nights start at the first instant after bedtime, local to
+    the timezone.
+
+    The transition instants of each day are computed once and cached in local
+    time, where they don't depend on the timezone, so they're shared by every
+    schedule with the same wake-up time and bedtime. Checks against them are
+    then plain comparisons. The timezone is only applied when converting the
+    time told by a clock to local time and back.
+
+    keyword arguments:
+    wake_up_time -- a datetime.time. Defaults to SleepChecker.WAKE_UP_TIME.
+    bedtime -- a datetime.time later than wake_up_time. Defaults to
+        SleepChecker.BEDTIME.
+    timezone -- a datetime.tzinfo for the local time of the household.
+        Defaults to None, in which case clock times are used as they are.
+    """
+    def __init__(self, wake_up_time=None, bedtime=None, timezone=None):
+        if wake_up_time is None:
+            wake_up_time = SleepChecker.WAKE_UP_TIME
+        if bedtime is None:
+            bedtime = SleepChecker.BEDTIME
+        if not wake_up_time < bedtime:
+            raise ValueError(
+                "Wake-up time %s must be before bedtime %s" % (
+                    wake_up_time, bedtime))
+        self._wake_up_time = wake_up_time
+        self._bedtime = bedtime
+        self._timezone = timezone
+
+    @property
+    def wake_up_time(self):
+        """Returns the wake-up time as a datetime.time"""
+        return self._wake_up_time
+
+    @property
+    def bedtime(self):
+        """Returns the bedtime as a datetime.time"""
+        return self._bedtime
+
+    @property
+    def timezone(self):
+        """Returns the timezone or None to use clock times as they are"""
+        return self._timezone
+
+    def _key(self):
+        return self.wake_up_time, self.bedtime, self.timezone
+
+    def __eq__(self, other):
+        # pylint: disable=protected-access
+        return isinstance(other, Schedule) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return "%s(wake_up_time=%r, bedtime=%r, timezone=%r)" % (
+            (self.__class__.__name__,) + self._key())
+
+    def local(self, now):
+        """
+        Returns the local time, as a naive datetime, of a time told by a clock.
+        Naive clock times are taken to be in the system's timezone.
+
+        keyword arguments:
+        now -- the datetime told by a clock
+        """
+        if self._timezone is None:
+            return now
+        return now.astimezone(self._timezone).replace(tzinfo=None)
+
+    def from_local(self, local, like):
+        """
+        Returns a local time converted back to the kind of time told by a
+        clock, ie. naive if `like` is naive and in the timezone of `like`
+        otherwise.
+
+        keyword arguments:
+        local -- a naive local datetime
+        like -- a datetime told by the clock
+        """
+        if self._timezone is None:
+            return local
+        aware = local.replace(tzinfo=self._timezone)
+        if like.tzinfo is None:
+            return aware.astimezone().replace(tzinfo=None)
+        return aware.astimezone(like.tzinfo)
+
+    def transitions(self, date):
+        """
+        Returns the (wake-up, nightfall) local datetimes of a date, where
+        nightfall is the first instant after bedtime
+
+        keyword arguments:
+        date -- the date to find the transitions of
+        """
+        return _transitions(self.wake_up_time, self.bedtime, date)
+
+    def wake_up(self, date):
+        """Returns the local datetime of wake-up time on a date"""
+        return self.transitions(date)[0]
+
+    def is_nighttime(self, now):
+        """
+        Returns a bool to indicate whether it's nighttime
+
+        keyword arguments:
+        now -- the local datetime to check
+        """
+        wake_up, nightfall = self.transitions(now.date())
+        return not wake_up <= now < nightfall
+
+    def period(self, now):
+        """
+        Returns the (start, end) local datetimes of the daytime or nighttime
+        period containing `now`. The start is inclusive and the end exclusive.
+
+        keyword arguments:
+        now -- the local datetime to find the period for
+        """
+        date = now.date()
+        wake_up, nightfall = self.transitions(date)
+        if now < wake_up:
+            result = (self.transitions(date - _DAY)[1], wake_up)
+        elif now < nightfall:
+            result = (wake_up, nightfall)
+        else:
+            result = (nightfall, self.wake_up(date + _DAY))
+        return result
 
 
 class SleepChecker:
     """Checks whether it's nighttime and returns the result as a bool"""
-    # pylint: disable=too-few-public-methods
     WAKE_UP_TIME = datetime.time(
         hour=6,
         minute=30,
@@ -15,7 +163,52 @@ class SleepChecker:
         second=0)
 
     @staticmethod
-    def is_nighttime():
-        """Returns a bool to indicate whether it's nighttime"""
-        now = datetime.datetime.now().time()
-        return now > __class__.BEDTIME or now < __class__.WAKE_UP_TIME
+    def is_nighttime(now=None):
+        """
+        Returns a bool to indicate whether it's nighttime
+
+        keyword arguments:
+        now -- the datetime to check. Defaults to the current time.
+        """
+        if now is None:
+            now = clock.now()
+        return DEFAULT_SCHEDULE.is_nighttime(now)
+
+    @staticmethod
+    def period(now):
+        """
+        Returns the (start, end) datetimes of the daytime or nighttime period
+        containing `now`. Days start at wake-up time and nights start at the
+        first instant after bedtime. The start is inclusive and the end
+        exclusive.
+
+        keyword arguments:
+        now -- the datetime to find the period for
+        """
+        return DEFAULT_SCHEDULE.period(now)
+
+
+class _DefaultSchedule(Schedule):
+    """
+    The schedule of SleepChecker.WAKE_UP_TIME and SleepChecker.BEDTIME. They
+    are read whenever the schedule is used, so assigning them configures
+    every calendar and event that isn't given a schedule of its own.
+    """
+    @property
+    def wake_up_time(self):
+        """Returns SleepChecker.WAKE_UP_TIME"""
+        return SleepChecker.WAKE_UP_TIME
+
+    @property
+    def bedtime(self):
+        """Returns SleepChecker.BEDTIME"""
+        return SleepChecker.BEDTIME
+
+
+# the schedule used by calendars and events that aren't given one
+DEFAULT_SCHEDULE = _DefaultSchedule()
+
+
+def schedule_or_default(schedule):
+    """Returns `schedule` or the default schedule if it's None"""
+    return DEFAULT_SCHEDULE if schedule is None else schedule
@@ -0,0 +1,313 @@
+"""
+A compact fixed-width binary file format for calendars and a Calendar that
+answers queries directly from a memory-mapped file.
+
+The file holds, all little-endian:
+
+    header   -- magic b"SLPC", version (u16), reserved (u16), count (u32)
+    records  -- count fixed-width records in calendar order: year (i16, 0 for
+                anniversaries), month (u8), day (u8), sleeps (u16, 0xffff for
+                None), name offset (u32) and name length (u16)
+    order    -- count record numbers (u32) sorted by month, day then calendar
+                order
+    names    -- the UTF-8 encoded event names
+"""
+import bisect
+import datetime
+import logging
+import mmap
+import struct
+import weakref
+
+from sleepcounter.core.time import bedtime
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.event import Anniversary, EventBase, SpecialDay
+from sleepcounter.core.time.index import Occurrence
+
+LOGGER = logging.getLogger("binary")
+
+MAGIC = b"SLPC"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHI")
+_RECORD = struct.Struct("<hBBHIH")
+_ORDER = struct.Struct("<I")
+_ANNIVERSARY = 0
+_NO_SLEEPS = 0xffff
+_DAY = datetime.timedelta(days=1)
+# day of year in a leap year, used to walk month/days in calendar order
+_LEAP_YEAR = 2000
+_DAYS_IN_LEAP_YEAR = 366
+
+
+def write_calendar(path, events):
+    """
+    Write events to a binary calendar file
+
+    keyword arguments:
+    path -- the path of the file to write
+    events -- an iterable of Anniversary and SpecialDay instances
+    """
+    records, names, keys = [], bytearray(), []
+    for seq, event in enumerate(events):
+        if isinstance(event, SpecialDay):
+            year = event.year
+            if not 0 < year < 2 ** 15:
+                raise ValueError("Cannot store year of event %r" % event.name)
+        elif isinstance(event, Anniversary):
+            year = _ANNIVERSARY
+        else:
+            raise TypeError(
+                "Cannot store event %r of type %s" % (
+                    event.name, type(event).__name__))
+        # pylint: disable=protected-access
+        sleeps = _NO_SLEEPS if event._sleeps is None else event._sleeps
+        if not 0 <= sleeps <= _NO_SLEEPS:
+            raise ValueError("Cannot store sleeps of event %r" % event.name)
+        name = event.name.encode("utf-8")
+        records.append(_RECORD.pack(
+            year, event.month, event.day, sleeps, len(names), len(name)))
+        names += name
+        keys.append((event.month, event.day, seq))
+    with open(path, "wb") as stream:
+        stream.write(_HEADER.pack(MAGIC, VERSION, 0, len(records)))
+        stream.writelines(records)
+        for _, _, seq in sorted(keys):
+            stream.write(_ORDER.pack(seq))
+        stream.write(names)
+    LOGGER.info("Wrote %s events to %s", len(records), path)
+
+
+class MappedCalendar(Calendar):
+    """
+    A read-only calendar backed by a memory-mapped binary calendar file (see
+    write_calendar). Queries are answered from the mapped buffer and event
+    objects are only created for the records that are returned.
+
+    keyword arguments:
+    path -- the path of the file to map
+    schedule -- the Schedule holding the wake-up time, bedtime and timezone
+        of the household. Defaults to the default schedule.
+    """
+    def __init__(self, path, schedule=None):
+        super().__init__(schedule=schedule)
+        with open(path, "rb") as stream:
+            self._buffer = mmap.mmap(
+                stream.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self._records = _HEADER.unpack_from(
+            self._buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            self._buffer.close()
+            raise ValueError(
+                "%s is not a version %s calendar" % (path, VERSION))
+        self._records_offset = _HEADER.size
+        self._order_offset = (
+            self._records_offset + self._records * _RECORD.size)
+        self._names_offset = self._order_offset + self._records * _ORDER.size
+        self._dates = _MappedDateIndex(self)
+        self._materialized = weakref.WeakValueDictionary()
+        LOGGER.info("Mapped %s events from %s", self._records, path)
+
+    def __len__(self):
+        return self._records
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Unmap the calendar file"""
+        self._buffer.close()
+
+    def add_event(self, event):
+        raise TypeError("Mapped calendars are read-only")
+
+    def add_events(self, events):
+        raise TypeError("Mapped calendars are read-only")
+
+    def remove_events(self, events):
+        raise TypeError("Mapped calendars are read-only")
+
+    def compact(self, now=None):
+        raise TypeError("Mapped calendars are read-only")
+
+    @Calendar.events.setter
+    def events(self, events: list):
+        raise TypeError("Mapped calendars are read-only")
+
+    def event(self, seq):
+        """
+        Returns the event object for the record at position `seq` in calendar
+        order. The same object is returned while it is referenced elsewhere.
+        """
+        result = self._materialized.get(seq)
+        if result is None:
+            year, month, day, sleeps, name = self._record(seq)
+            sleeps = None if sleeps == _NO_SLEEPS else sleeps
+            if year == _ANNIVERSARY:
+                result = Anniversary(
+                    name=name, month=month, day=day, sleeps=sleeps)
+            else:
+                result = SpecialDay(
+                    name=name, year=year, month=month, day=day, sleeps=sleeps)
+            self._materialized[seq] = result
+        return result
+
+    def events_between(self, start, end):
+        """
+        Returns the events with an occurrence from date `start` to date `end`
+        inclusive, in order of occurrence
+
+        keyword arguments:
+        start -- the first date of the range
+        end -- the last date of the range
+        """
+        found = []
+        date = start
+        while date <= end:
+            found.extend(
+                (date, seq) for seq in self._on_month_day(date.month, date.day)
+                if self._occurs_on(seq, date))
+            date += _DAY
+        return [self.event(seq) for _, seq in found]
+
+    def _library(self):
+        return [self.event(seq) for seq in range(self._records)]
+
+    def _record(self, seq):
+        year, month, day, sleeps, offset, length = _RECORD.unpack_from(
+            self._buffer, self._records_offset + seq * _RECORD.size)
+        start = self._names_offset + offset
+        name = self._buffer[start:start + length].decode("utf-8")
+        return year, month, day, sleeps, name
+
+    def _fields(self, seq):
+        # the record without its name
+        return _RECORD.unpack_from(
+            self._buffer, self._records_offset + seq * _RECORD.size)[:4]
+
+    def _ordered(self, position):
+        return _ORDER.unpack_from(
+            self._buffer, self._order_offset + position * _ORDER.size)[0]
+
+    def _key(self, position):
+        seq = self._ordered(position)
+        _, month, day, _ = self._fields(seq)
+        return month, day
+
+    def _on_month_day(self, month, day):
+        # record numbers on a month and day in calendar order
+        position = bisect.bisect_left(_Keys(self), (month, day))
+        while position < self._records and self._key(position) == (month, day):
+            yield self._ordered(position)
+            position += 1
+
+    def _occurs_on(self, seq, date):
+        year, _, _, _ = self._fields(seq)
+        return year in (_ANNIVERSARY, date.year)
+
+    def _date_of(self, seq, now):
+        year, month, day, _ = self._fields(seq)
+        if year == _ANNIVERSARY:
+            return Anniversary.next_date(month, day, now, self._schedule)
+        return datetime.date(year=year, month=month, day=day)
+
+    def _active_events(self, now):
+        result = []
+        for seq in range(self._records):
+            _, _, _, sleeps = self._fields(seq)
+            sleeps = None if sleeps == _NO_SLEEPS else sleeps
+            remaining = EventBase.sleeps_until(
+                self._date_of(seq, now), now, self._schedule)
+            if EventBase.is_active(remaining, sleeps):
+                result.append(self.event(seq))
+        return tuple(result)
+
+    def _upcoming(self, now, k):
+        # walk records in month/day order starting from yesterday, stopping
+        # once no later record can occur before the kth best found so far
+        if k <= 0 or not self._records:
+            return []
+        start = (now - _DAY).date()
+        first = bisect.bisect_left(_Keys(self), (start.month, start.day))
+        best = []
+        for step in range(self._records):
+            seq = self._ordered((first + step) % self._records)
+            _, month, day, sleeps = self._fields(seq)
+            if len(best) == k and _earliest(
+                    month, day, start, self._schedule) > best[-1].target:
+                break
+            sleeps = None if sleeps == _NO_SLEEPS else sleeps
+            date = self._date_of(seq, now)
+            if not EventBase.is_active(
+                    EventBase.sleeps_until(date, now, self._schedule), sleeps):
+                continue
+            target = self._schedule.wake_up(date)
+            bisect.insort(best, Occurrence(target, seq, date, None))
+            del best[k:]
+        return [
+            occurrence._replace(event=self.event(occurrence.seq))
+            for occurrence in best]
+
+    def _next_occurrence(self, now):
+        upcoming = self._upcoming(now, 1)
+        if not upcoming:
+            raise ValueError("No active events in the calendar")
+        return upcoming[0]
+
+
+class _Keys:
+    # a sequence view of the month/day keys of the order section for bisect
+    # pylint: disable=too-few-public-methods
+    def __init__(self, calendar):
+        self._calendar = calendar
+
+    def __len__(self):
+        return len(self._calendar)
+
+    def __getitem__(self, position):
+        # pylint: disable=protected-access
+        return self._calendar._key(position)
+
+
+class _MappedDateIndex:
+    # answers the DateIndex queries used by Calendar from the mapped file
+    def __init__(self, calendar):
+        self._calendar = calendar
+
+    def todays_event(self, now, schedule=None):
+        """Returns the first event happening on the day of `now` or None"""
+        # pylint: disable=protected-access
+        if bedtime.schedule_or_default(schedule).is_nighttime(now):
+            return None
+        for seq in self._calendar._on_month_day(now.month, now.day):
+            if self._calendar._occurs_on(seq, now):
+                return self._calendar.event(seq)
+        return None
+
+    def event_on(self, search_date, now, schedule=None):
+        """Returns the first event whose date is `search_date` or None"""
+        # pylint: disable=unused-argument
+        # pylint: disable=protected-access
+        candidates = self._calendar._on_month_day(
+            search_date.month, search_date.day)
+        for seq in candidates:
+            if self._calendar._date_of(seq, now) == search_date:
+                return self._calendar.event(seq)
+        return None
+
+
+def _earliest(month, day, start, schedule):
+    # a lower bound on the wake-up time of any occurrence on a month and day
+    # that is no earlier than the date `start`
+    offset = (
+        _day_of_year(month, day) - _day_of_year(start.month, start.day)
+    ) % _DAYS_IN_LEAP_YEAR
+    # allow a day for non-leap years
+    date = start + datetime.timedelta(days=max(offset - 1, 0))
+    return schedule.wake_up(date)
+
+
+def _day_of_year(month, day):
+    return datetime.date(_LEAP_YEAR, month, day).timetuple().tm_yday
@@ -0,0 +1,75 @@
+"""
+Memoization of values that only change at wake-up time or bedtime
+"""
+from sleepcounter.core.time import bedtime
+
+
+class CacheStats:
+    """Counts the hits and misses of one or more caches"""
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        """Reset the counters to zero"""
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "%s(hits=%s, misses=%s)" % (
+            self.__class__.__name__, self.hits, self.misses)
+
+
+class PeriodCache:
+    """
+    Memoizes values for the daytime or nighttime period (see
+    Schedule.period) in which they were computed. All cached values are
+    discarded as soon as a lookup is made for a time outside that period,
+    whether the clock moved forward or back.
+
+    keyword arguments:
+    stats -- a CacheStats instance to count hits and misses. May be shared
+        between caches.
+    schedule -- the Schedule defining the periods. Defaults to the default
+        schedule.
+    """
+    def __init__(self, stats=None, schedule=None):
+        self._stats = stats if stats is not None else CacheStats()
+        self._schedule = bedtime.schedule_or_default(schedule)
+        # (start, end, values) replaced as a whole so that threads never see
+        # the values of one period with the bounds of another
+        self._state = None
+
+    @property
+    def stats(self):
+        """Returns the hit and miss counters of the cache"""
+        return self._stats
+
+    def get(self, key, now, compute):
+        """
+        Returns the value cached under `key` for the period containing `now`,
+        calling `compute(now)` to produce it on a miss.
+
+        keyword arguments:
+        key -- a hashable identifying the value
+        now -- the datetime the value is required for
+        compute -- a callable taking `now` and returning the value
+        """
+        state = self._state
+        if state is None or not state[0] <= now < state[1]:
+            start, end = self._schedule.period(now)
+            state = (start, end, {})
+            self._state = state
+        values = state[2]
+        try:
+            value = values[key]
+        except KeyError:
+            self._stats.misses += 1
+            value = values[key] = compute(now)
+        else:
+            self._stats.hits += 1
+        return value
+
+    def clear(self):
+        """Discard all cached values"""
+        self._state = None
@@ -1,20 +1,89 @@
 """
 Defines the Calendar class which holds special events
 """
+from functools import cached_property, update_wrapper
+import itertools
 import logging
+from threading import RLock
 
+from sleepcounter.core import metrics
 from sleepcounter.core.time import bedtime
+from sleepcounter.core.time.cache import PeriodCache
+from sleepcounter.core.time.clock import get_clock
+from sleepcounter.core.time.index import DateIndex, OccurrenceIndex
+from sleepcounter.core.time.observer import Publisher
+from sleepcounter.core.time.snapshot import CalendarSnapshot
+from sleepcounter.core.time.timeline import timeline
 
 LOGGER = logging.getLogger("calendar")
 
 
+class _hybridmethod:
+    # pylint: disable=invalid-name,too-few-public-methods
+    """
+    A method that may also be called on the Calendar class, as before
+    calendars kept a clock and schedule, eg. Calendar.sleeps_to_event(event).
+    It's then told by the clock in use and the default schedule.
+    """
+    def __init__(self, method):
+        update_wrapper(self, method)
+        self._method = method
+
+    def __get__(self, calendar, owner=None):
+        if calendar is None:
+            calendar = owner()
+        return self._method.__get__(calendar, owner)
+
+
 class Calendar:
     """
     Interface to the library of special events. It allows you to lookup the next
     event and find out what is happening today.
+
+    Query results are memoized until the next wake-up time or bedtime, when
+    they may change. Hits and misses are counted in cache_stats.
+
+    A calendar may be read from several threads at once, eg. by threaded
+    widgets, and changed while it's being read.
+
+    keyword arguments:
+    events -- a list of event instances
+    clock -- the Clock to tell the time by. Defaults to the clock in use (see
+        sleepcounter.core.time.clock).
+    schedule -- the Schedule holding the wake-up time, bedtime and timezone
+        of the household. Defaults to the default schedule.
+    auto_compact -- whether to forget one-off events as soon as they are found
+        to have expired, as with compact()
     """
-    def __init__(self, events: list = None):
-        self._date_library = events if events else []
+    def __init__(
+            self,
+            events: list = None,
+            clock=None,
+            schedule=None,
+            auto_compact=False,
+        ):
+        self._clock = clock
+        self._schedule = bedtime.schedule_or_default(schedule)
+        # the events in calendar order by sequence number, and the sequence
+        # numbers of each event object by id, so that events are removed
+        # without a scan
+        self._date_library = {}
+        self._seqs = {}
+        self._count = 0
+        self._auto_compact = auto_compact
+        self._occurrences = None
+        # one-off events that the occurrence index has found to be expired
+        self._expired = []
+        events = events if events else []
+        self._store(events)
+        self._dates = DateIndex(events)
+        self._cache = PeriodCache(schedule=self._schedule)
+        self._publisher = Publisher()
+        self._version = 0
+        # held while the occurrence index or the events are changed or the
+        # index is read. The query cache replaces its state as a whole and
+        # needs no lock.
+        self._lock = RLock()
 
     def add_event(self, event):
         """
@@ -23,42 +92,160 @@ class Calendar:
         keyword arguments:
         event -- an event instance
         """
-        self._date_library.append(event)
+        with self._lock:
+            self._store([event])
+            self._dates.add(event)
+            if self._occurrences is not None:
+                self._occurrences.add(event)
+            self._cache.clear()
+        self._changed()
         return self
 
-    @staticmethod
-    def seconds_to_event(event):
-        """Returns the number of seconds to a given event"""
-        return event.seconds_remaining
+    def add_events(self, events):
+        """
+        Add several events to the calendar, updating its indexes once for the
+        whole batch rather than once per event
+
+        keyword arguments:
+        events -- an iterable of event instances
+        """
+        events = list(events)
+        with self._lock:
+            self._store(events)
+            self._dates.extend(events)
+            if self._occurrences is not None:
+                self._occurrences.extend(events)
+            self._cache.clear()
+        self._changed()
+        return self
+
+    def remove_event(self, event):
+        """
+        Remove an event from the calendar. Raises ValueError if it isn't in
+        the calendar.
 
-    @staticmethod
-    def sleeps_to_event(event):
-        """Return the number of sleeps to a given event"""
-        return event.sleeps_remaining
+        keyword arguments:
+        event -- an event instance
+        """
+        return self.remove_events([event])
+
+    def remove_events(self, events):
+        """
+        Remove several events from the calendar. Each removes the first event
+        in the calendar that is, or is equal to, it. Raises ValueError, and
+        removes nothing, if any isn't in the calendar. Events are found by
+        identity without a scan, and the indexes are updated for each removed
+        event rather than rebuilt, so removals don't cost O(n) each. Finding
+        an event that is only equal to one in the calendar scans the calendar.
+
+        keyword arguments:
+        events -- an iterable of event instances
+        """
+        with self._lock:
+            removed = self._discard(self._find(events))
+            if self._occurrences is not None:
+                for event in removed:
+                    self._occurrences.remove(event)
+            self._cache.clear()
+        self._changed()
+        return self
+
+    def compact(self, now=None):
+        """
+        Forget the one-off events that have expired, so that they no longer
+        cost anything to look after. They are found by the occurrence index as
+        time moves forward, so the events that remain are never evaluated to
+        compact the calendar. Afterwards the calendar no longer reports expired
+        events, eg. in timelines or events_between over past dates. Returns the
+        list of events removed.
+
+        keyword arguments:
+        now -- the datetime to look from. Defaults to the current time.
+        """
+        with self._lock:
+            self._occurrence_index(self._local(now))
+            removed = self._compact()
+            if removed:
+                self._cache.clear()
+        if removed:
+            self._changed()
+        return removed
+
+    @_hybridmethod
+    def seconds_to_event(self, event):
+        """
+        Returns the number of seconds to a given event, told by the calendar's
+        clock and schedule
+        """
+        return event.seconds_remaining_at(self._local(), self._schedule)
+
+    @_hybridmethod
+    def sleeps_to_event(self, event):
+        """
+        Return the number of sleeps to a given event, told by the calendar's
+        clock and schedule
+        """
+        return event.sleeps_remaining_at(self._local(), self._schedule)
 
     @property
     def events(self):
         """Returns all events objects in the calendar"""
-        return [event for event in self._date_library if event.active]
+        metrics.increment("calendar.events")
+        now = self._local()
+        return list(self._cache.get("events", now, self._active_events))
 
     @events.setter
     def events(self, events: list):
         """Update events contained in the calendar to a list of event objects"""
-        self._date_library = events
+        with self._lock:
+            self._date_library = {}
+            self._seqs = {}
+            self._store(events)
+            self._occurrences = None
+            self._expired = []
+            self._dates = DateIndex(events)
+            self._cache.clear()
+        self._changed()
+
+    @property
+    def clock(self):
+        """Returns the clock that the calendar tells the time by"""
+        return self._clock if self._clock is not None else get_clock()
+
+    @property
+    def version(self):
+        """
+        Returns a number that goes up each time the events of the calendar
+        change. Results derived from the events may be kept with the version
+        they were derived at and are stale once it has moved on, which costs
+        nothing when the events change.
+        """
+        return self._version
+
+    @property
+    def schedule(self):
+        """Returns the Schedule that the calendar keeps"""
+        return self._schedule
+
+    @property
+    def cache_stats(self):
+        """Returns the hit and miss counters of the calendar's query cache"""
+        return self._cache.stats
 
     @property
     def next_event(self):
         """Get the next event to happen"""
-        deltas = \
-            {ev: ev.seconds_remaining for ev in self.events}
-        next_event = min(deltas, key=deltas.get)
+        metrics.increment("calendar.next_event")
+        next_event = self._next_event(self._local())
         LOGGER.info("Next event is %s", next_event.name)
         return next_event
 
     @property
     def sleeps_to_next_event(self):
         """Return the number of sleeps to the next event"""
-        return self.sleeps_to_event(self.next_event)
+        metrics.increment("calendar.sleeps_to_next_event")
+        now = self._local()
+        return self._next_event(now).sleeps_remaining_at(now, self._schedule)
 
     @property
     def special_day_today(self):
@@ -66,18 +253,22 @@ class Calendar:
         Checks whether today is a special day registered in the calendar and
         returns the result as a bool
         """
-        result = any(event.today for event in self.events)
+        metrics.increment("calendar.special_day_today")
+        result = self._cache.get(
+            "special_day_today",
+            self._local(),
+            self._special_day_today)
         LOGGER.info("Today %s special", ("is" if result else "is not"))
         return result
 
     @property
     def todays_event(self):
         """Returns todays event or None if it's not a special day"""
-        result = None
-        for event in self._date_library:
-            if event.today:
-                result = event
-                break
+        metrics.increment("calendar.todays_event")
+        result = self._cache.get(
+            "todays_event",
+            self._local(),
+            self._todays_event)
         LOGGER.info(
             "It's %s today",
             (result.name if result else "not a special day"))
@@ -86,23 +277,331 @@ class Calendar:
     @property
     def seconds_to_next_event(self):
         """Returns the time to the next event in seconds"""
-        seconds = self.seconds_to_event(self.next_event)
+        metrics.increment("calendar.seconds_to_next_event")
+        now = self._local()
+        next_event = self._next_event(now)
+        seconds = next_event.seconds_remaining_at(now, self._schedule)
         LOGGER.info(
             "%s seconds to next event (%s)",
             seconds,
-            self.next_event.name)
+            next_event.name)
         return seconds
 
     @property
     def is_nighttime(self):
         """Checks whether it's nighttime and returns the result as a bool"""
-        return bedtime.SleepChecker.is_nighttime()
+        metrics.increment("calendar.is_nighttime")
+        return self._schedule.is_nighttime(self._local())
+
+    def upcoming(self, k, now=None):
+        """
+        Returns up to k active events in order of their next occurrence, so
+        the first is the next event. Events whose sleeps are not yet being
+        counted are left out. Events are taken from the occurrence index in
+        order, costing O(k log n) rather than sorting the whole calendar.
+
+        keyword arguments:
+        k -- the maximum number of events to return
+        now -- the datetime to look from. Defaults to the current time.
+        """
+        metrics.increment("calendar.upcoming")
+        return [
+            occurrence.event
+            for occurrence in self._upcoming(self._local(now), k)]
+
+    def events_between(self, start, end):
+        """
+        Returns the events with an occurrence from date `start` to date `end`
+        inclusive, in order of occurrence. Anniversaries appear once for each
+        year of the range that they fall in. Every event is active on the day
+        that it happens whatever its sleeps, so all of them are returned.
+
+        keyword arguments:
+        start -- the first date of the range
+        end -- the last date of the range
+        """
+        metrics.increment("calendar.events_between")
+        with self._lock:
+            found = self._dates.between(start, end)
+        return [event for _, _, event in found]
+
+    def next_change(self, now=None):
+        """
+        Returns the next datetime after `now` at which the state reported by
+        the calendar may change, other than the seconds to the next event.
+
+        Events only become active or expire at wake-up time, when their sleeps
+        remaining tick over. Anniversaries roll over to the next year at
+        bedtime on the day, and today's event appears at wake-up time and
+        disappears at bedtime. So every change happens at one of the wake-up
+        or bedtime transitions and the calendar day effectively rolls over at
+        wake-up time rather than midnight.
+
+        The result is a time told by the calendar's clock, converted from the
+        local time of its schedule.
+
+        keyword arguments:
+        now -- the datetime to look from. Defaults to the current time.
+        """
+        if now is None:
+            now = self.clock.now()
+        end = self._schedule.period(self._schedule.local(now))[1]
+        return self._schedule.from_local(end, now)
+
+    def snapshot(self, now=None):
+        """
+        Evaluate the calendar once at a single instant and return the result
+        as an immutable CalendarSnapshot.
+
+        keyword arguments:
+        now -- the datetime to evaluate at. Defaults to the current time.
+        """
+        if now is None:
+            now = self.clock.now()
+        return CalendarSnapshot(self, now)
+
+    def timeline(self, start, end):
+        """
+        Generates the state of the calendar for each day from `start` to `end`
+        inclusive as TimelineDay tuples of the date, active events, next
+        event, sleeps to the next event and today's event. Each day is as seen
+        between wake-up time and bedtime, matching snapshot() at wake-up time.
+
+        The timeline is computed incrementally in one sweep over the sorted
+        occurrences of the events, so whole years may be generated cheaply.
+
+        keyword arguments:
+        start -- the first date of the timeline
+        end -- the last date of the timeline
+        """
+        return timeline(self._library(), start, end)
+
+    def subscribe(self, value, callback):
+        """
+        Subscribe to changes in a value derived from the calendar. The callback
+        is called with the new value from publish() whenever it differs from
+        the value last published, and on the first publish after subscribing.
+        Returns a Subscription that can be cancelled.
+
+        Changes to the events are published straight away, evaluating only
+        the values that have subscribers. Use version rather than subscribing
+        to "events" to tell when results derived from the events are stale.
+
+        keyword arguments:
+        value -- one of "events", "next_event", "sleeps_to_next_event",
+            "todays_event", "special_day_today" or "is_nighttime"
+        callback -- a callable taking the new value
+        """
+        return self._publisher.subscribe(value, callback)
+
+    def publish(self, now=None):
+        """
+        Evaluate the calendar once and notify subscribers of any values that
+        have changed. Returns the CalendarSnapshot that was published.
+
+        keyword arguments:
+        now -- the datetime to evaluate at. Defaults to the current time.
+        """
+        snapshot = self.snapshot(now)
+        self._publisher.publish(snapshot)
+        return snapshot
+
+    def _changed(self):
+        # the events have changed, and the query cache has been cleared.
+        # Called without the lock held so that subscribers may take locks of
+        # their own.
+        with self._lock:
+            self._version += 1
+        if self._publisher:
+            self._publisher.publish(_Values(self, self.clock.now()))
+
+    def _store(self, events):
+        # append events to the library. Called with the lock held.
+        for event in events:
+            self._date_library[self._count] = event
+            self._seqs.setdefault(id(event), []).append(self._count)
+            self._count += 1
+
+    def _find(self, events):
+        # the sequence numbers in the library of the events, by identity where
+        # possible and otherwise by equality. Called with the lock held.
+        found = set()
+        for event in events:
+            seq = next(
+                (
+                    seq for seq in self._seqs.get(id(event), ())
+                    if seq not in found),
+                None)
+            if seq is None:
+                seq = next(
+                    (
+                        seq for seq, candidate in self._date_library.items()
+                        if seq not in found and candidate == event),
+                    None)
+            if seq is None:
+                raise ValueError(
+                    "Event %r is not in the calendar" % (event.name,))
+            found.add(seq)
+        return found
+
+    def _discard(self, seqs):
+        # take the events with the sequence numbers out of the library and
+        # the date index, returning them in calendar order. Called with the
+        # lock held.
+        removed = []
+        for seq in sorted(seqs):
+            event = self._date_library.pop(seq)
+            same = self._seqs[id(event)]
+            same.remove(seq)
+            if not same:
+                del self._seqs[id(event)]
+            self._dates.remove(event)
+            removed.append(event)
+        LOGGER.info("Removed %s events", len(removed))
+        return removed
+
+    def _compact(self):
+        # forget the expired one-off events, which the occurrence index has
+        # already dropped. Called with the lock held.
+        if not self._expired:
+            return []
+        expired = {id(event) for event in self._expired}
+        self._expired = []
+        return self._discard({
+            seq for event_id in expired
+            for seq in self._seqs.get(event_id, ())})
+
+    def _active_events(self, now):
+        with metrics.timer("calendar.scan_events"), self._lock:
+            result = tuple(
+                event for event in self._date_library.values()
+                if event.active_at(now, self._schedule))
+            scanned = len(self._date_library)
+        metrics.observe("calendar.events_scanned", scanned)
+        return result
+
+    def _local(self, now=None):
+        # the local time of the schedule at a clock time, by default the
+        # current time
+        if now is None:
+            now = self.clock.now()
+        return self._schedule.local(now)
+
+    def _library(self):
+        # all events in calendar order, active or not
+        with self._lock:
+            return list(self._date_library.values())
+
+    def _special_day_today(self, now):
+        return any(
+            event.today_at(now, self._schedule)
+            for event in self._cache.get("events", now, self._active_events))
+
+    def _todays_event(self, now):
+        with self._lock:
+            return self._dates.todays_event(now, self._schedule)
+
+    def _next_event(self, now):
+        return self._cache.get(
+            "next_event", now, lambda now: self._next_occurrence(now).event)
+
+    def _occurrence_index(self, now):
+        # the index is maintained incrementally while time moves forward and
+        # rebuilt if the clock is wound back past the start of the period of
+        # the index. Within a period the index holds for any time, so readers
+        # slightly out of step with each other share it. Called with the lock
+        # held.
+        index = self._occurrences
+        if index is None or now < self._schedule.period(index.reference)[0]:
+            index = self._occurrences = OccurrenceIndex(
+                self._date_library.values(), now, self._schedule)
+            self._expired = []
+        if now > index.reference:
+            self._expired.extend(index.advance(now))
+            if self._auto_compact:
+                # expired events were inactive so no query results change
+                self._compact()
+        return index
+
+    def _upcoming(self, now, k):
+        # the first k active occurrences from the index
+        with self._lock:
+            return list(itertools.islice(
+                (
+                    occurrence
+                    for occurrence in self._occurrence_index(now).ordered()
+                    if occurrence.event.active_at(now, self._schedule)),
+                max(k, 0)))
+
+    def _next_occurrence(self, now):
+        # get the earliest active occurrence from the index
+        scanned = 0
+        with metrics.timer("calendar.find_next_event"), self._lock:
+            for occurrence in self._occurrence_index(now).ordered():
+                scanned += 1
+                if occurrence.event.active_at(now, self._schedule):
+                    metrics.observe("calendar.events_scanned", scanned)
+                    return occurrence
+        metrics.observe("calendar.events_scanned", scanned)
+        raise ValueError("No active events in the calendar")
 
     def _get_event(self, search_date):
         # get the event corresponding to a given search date
-        result = None
-        for event in self._date_library:
-            if event.date == search_date:
-                result = event
-                return result
-        return result
+        with self._lock:
+            return self._dates.event_on(
+                search_date, self._local(), self._schedule)
+
+
+class _Values:
+    # the values of a calendar that may be subscribed to, at a single instant.
+    # Each is evaluated when it's first read, so that publishing a change to
+    # the events only evaluates the values that have subscribers.
+    # pylint: disable=protected-access
+    def __init__(self, calendar, now):
+        self._calendar = calendar
+        self._now = calendar.schedule.local(now)
+
+    @cached_property
+    def events(self):
+        """Returns a tuple of the active events"""
+        return self._calendar._cache.get(
+            "events", self._now, self._calendar._active_events)
+
+    @cached_property
+    def next_event(self):
+        """Returns the next event or None if there are no active events"""
+        try:
+            return self._calendar._next_event(self._now)
+        except ValueError:
+            return None
+
+    @cached_property
+    def sleeps_to_next_event(self):
+        """Returns the sleeps to the next event or None"""
+        if self.next_event is None:
+            return None
+        return self.next_event.sleeps_remaining_at(
+            self._now, self._calendar.schedule)
+
+    @cached_property
+    def is_nighttime(self):
+        """Returns whether it's nighttime"""
+        return self._calendar.schedule.is_nighttime(self._now)
+
+    @cached_property
+    def todays_event(self):
+        """Returns today's event or None"""
+        if self.is_nighttime:
+            return None
+        return self._calendar._cache.get(
+            "todays_event", self._now, self._calendar._todays_event)
+
+    @cached_property
+    def special_day_today(self):
+        """Returns whether an active event happens today"""
+        if self.is_nighttime:
+            return False
+        return self._calendar._cache.get(
+            "special_day_today",
+            self._now,
+            self._calendar._special_day_today)
@@ -0,0 +1,77 @@
+"""
+Clocks that tell the time to events, calendars and widgets. By default the
+system clock is read; install a VirtualClock to run on simulated time:
+
+    with use_clock(VirtualClock(datetime.datetime(2018, 12, 23))):
+        CODE_UNDER_TEST
+"""
+import contextlib
+import datetime
+
+
+class Clock:
+    """The system clock"""
+    # pylint: disable=too-few-public-methods
+    def now(self):
+        """Returns the current local time as a naive datetime"""
+        return datetime.datetime.today()
+
+
+class VirtualClock(Clock):
+    """
+    A clock whose time only moves when it's told to. Widgets wait for their
+    next update on real time, so simulate them on virtual time with
+    sleepcounter.core.simulation rather than starting them.
+
+    keyword arguments:
+    start -- the datetime that the clock starts at
+    """
+    def __init__(self, start):
+        self._now = start
+
+    def now(self):
+        """Returns the virtual time"""
+        return self._now
+
+    def advance(self, delta):
+        """Move the clock forward by a timedelta"""
+        if delta < datetime.timedelta(0):
+            raise ValueError("Cannot move a virtual clock backwards")
+        self._now += delta
+
+    def set(self, when):
+        """Set the clock to the datetime `when`"""
+        self._now = when
+
+
+_clock = Clock()
+
+
+def get_clock():
+    """Returns the clock currently in use"""
+    return _clock
+
+
+def set_clock(clock):
+    """
+    Install a clock for use by events, calendars and widgets that aren't
+    given one. Returns the clock that was replaced.
+    """
+    global _clock  # pylint: disable=global-statement
+    previous, _clock = _clock, clock
+    return previous
+
+
+@contextlib.contextmanager
+def use_clock(clock):
+    """A context manager that installs a clock for the duration of a block"""
+    previous = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(previous)
+
+
+def now():
+    """Returns the current time according to the clock in use"""
+    return _clock.now()
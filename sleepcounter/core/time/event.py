@@ -6,10 +6,20 @@ import datetime
 import logging
 from math import ceil
 
-from sleepcounter.core.time import bedtime
+from sleepcounter.core import metrics
+from sleepcounter.core.time import bedtime, clock
+from sleepcounter.core.time.cache import CacheStats, PeriodCache
 
 LOGGER = logging.getLogger("event")
 _SECONDS_PER_DAY = 24 * 3600
+_UNCOMPARED = ("_caches", "_years")
+
+
+def _comparable(event):
+    # the attributes of an event that define its identity
+    return {
+        key: value for key, value in vars(event).items()
+        if key not in _UNCOMPARED}
 
 
 class EventBase(ABC):
@@ -21,7 +31,14 @@ class EventBase(ABC):
     month -- a numeric representation of the month 1->12
     day -- the day the event occurs
     sleeps -- the number of sleeps to count in the lead-up to the event.
+
+    Methods taking the current time also take the Schedule whose wake-up time
+    and bedtime apply, defaulting to the default schedule. Dates and sleeps
+    are memoized per schedule until the next wake-up time or bedtime. Hits
+    and misses for all events are counted in EventBase.cache_stats.
     """
+    cache_stats = CacheStats()
+
     def __init__(
             self,
             name: str,
@@ -33,6 +50,7 @@ class EventBase(ABC):
         self._month = month
         self._day = day
         self._sleeps = sleeps
+        self._caches = {}
 
     @property
     def name(self):
@@ -51,6 +69,14 @@ class EventBase(ABC):
         """Returns the day of the event"""
         return self._day
 
+    @property
+    def sleeps(self):
+        """
+        Returns the number of sleeps counted in the lead-up to the event or
+        None if the event is counted down from the previous occurrence
+        """
+        return self._sleeps
+
     @property
     @abstractmethod
     def year(self):
@@ -67,57 +93,130 @@ class EventBase(ABC):
         Status of the event. Returns False if the event has expired or is not
         yet due to be displayed, True otherwise.
         """
-        result = False
-        event_past = self.sleeps_remaining < 0
-        if self._sleeps:
-            counted_sleeps = self.sleeps_remaining > self._sleeps
-            result = not (event_past or counted_sleeps)
-        else:
-            result = not event_past
-        return result
+        metrics.increment("event.active")
+        return self.active_at(clock.now())
 
     @property
     def seconds_remaining(self):
         """Returns the number of seconds to a given event"""
-        return self._seconds_until(self.date)
+        metrics.increment("event.seconds_remaining")
+        return self.seconds_remaining_at(clock.now())
 
     @property
     def sleeps_remaining(self):
         """Return the number of sleeps to a until the event"""
-        sleeps = ceil(self.seconds_remaining / _SECONDS_PER_DAY)
-        LOGGER.debug("%s sleeps to event %s", sleeps, self.name)
-        return sleeps
+        metrics.increment("event.sleeps_remaining")
+        return self.sleeps_remaining_at(clock.now())
 
     @property
     def today(self):
         """
         Checks whether today is a special day returns the result as a bool
         """
+        metrics.increment("event.today")
+        return self.today_at(clock.now())
+
+    def date_at(self, now, schedule=None):
+        """
+        Returns the date of the event as seen at the datetime `now`. Subclasses
+        whose date depends on the current time should override this.
+        """
+        # pylint: disable=unused-argument
+        return self.date
+
+    def occurrences(self, start):
+        """
+        Generates the dates on which the event happens in ascending order,
+        starting from the date `start`. By default that's the date of the
+        event as seen at the start of that day, if it's no earlier. Events
+        that happen more than once should override this.
+        """
+        date = self.date_at(datetime.datetime.combine(start, datetime.time()))
+        if date >= start:
+            yield date
+
+    def active_at(self, now, schedule=None):
+        """Returns the status of the event at the datetime `now`"""
+        return self.is_active(
+            self.sleeps_remaining_at(now, schedule), self._sleeps)
+
+    def seconds_remaining_at(self, now, schedule=None):
+        """Returns the number of seconds to the event from the datetime `now`"""
+        return self._seconds_until(
+            self.date_at(now, schedule), now, schedule)
+
+    def sleeps_remaining_at(self, now, schedule=None):
+        """Returns the number of sleeps to the event from the datetime `now`"""
+        schedule = bedtime.schedule_or_default(schedule)
+        return self._cache(schedule).get(
+            "sleeps",
+            now,
+            lambda now: self._sleeps_remaining_at(now, schedule))
+
+    def _sleeps_remaining_at(self, now, schedule):
+        sleeps = self.sleeps_until(self.date_at(now, schedule), now, schedule)
+        LOGGER.debug("%s sleeps to event %s", sleeps, self.name)
+        return sleeps
+
+    def _cache(self, schedule):
+        # the memoized values of the event under a schedule
+        cache = self._caches.get(schedule)
+        if cache is None:
+            cache = self._caches[schedule] = PeriodCache(
+                EventBase.cache_stats, schedule)
+        return cache
+
+    def today_at(self, now, schedule=None):
+        """Checks whether the datetime `now` falls on the day of the event"""
         special = False
-        if bedtime.SleepChecker.is_nighttime():
+        if bedtime.schedule_or_default(schedule).is_nighttime(now):
             LOGGER.debug("It's nighttime right now. Wait until morning")
         else:
-            today = datetime.datetime.today()
-            special = self.month == today.month and self.day == today.day
+            special = self.month == now.month and self.day == now.day
             LOGGER.debug(
                 "Date: %s; It %s %s",
-                today,
+                now,
                 ("is" if special else "is not"),
                 self.name)
         return special
 
     @staticmethod
-    def _seconds_until(date):
-        target_time = datetime.datetime.combine(date, bedtime.SleepChecker.WAKE_UP_TIME)
-        delta = target_time - datetime.datetime.today()
+    def is_active(sleeps_remaining, sleeps):
+        """
+        Returns whether an event is active given the number of sleeps remaining
+        until it happens and the number of sleeps to count (None to count all)
+        """
+        result = False
+        event_past = sleeps_remaining < 0
+        if sleeps:
+            counted_sleeps = sleeps_remaining > sleeps
+            result = not (event_past or counted_sleeps)
+        else:
+            result = not event_past
+        return result
+
+    @staticmethod
+    def sleeps_until(date, now, schedule=None):
+        """Returns the number of sleeps from the datetime `now` until `date`"""
+        return ceil(
+            EventBase._seconds_until(date, now, schedule) / _SECONDS_PER_DAY)
+
+    @staticmethod
+    def _seconds_until(date, now=None, schedule=None):
+        target_time = bedtime.schedule_or_default(schedule).wake_up(date)
+        if now is None:
+            now = clock.now()
+        delta = target_time - now
         seconds = delta.total_seconds()
         return seconds
 
-    def _in_future(self, date):
-        return self._seconds_until(date) > 0
+    def _in_future(self, date, now=None):
+        return self._seconds_until(date, now) > 0
 
     def __eq__(self, other):
-        return vars(self) == vars(other)
+        if not isinstance(other, EventBase):
+            return NotImplemented
+        return _comparable(self) == _comparable(other)
 
     def __hash__(self):
         # must define a custom has since we have overriden __eq__
@@ -141,23 +240,56 @@ class Anniversary(EventBase):
         Gets the date of the event as a datetime.date object. Will always return
         a date in the future.
         """
+        metrics.increment("event.date")
+        return self.date_at(clock.now())
+
+    def date_at(self, now, schedule=None):
+        """Returns the date of the next occurrence as seen at datetime `now`"""
+        schedule = bedtime.schedule_or_default(schedule)
+        return self._cache(schedule).get(
+            "date",
+            now,
+            lambda now: self.next_date(self.month, self.day, now, schedule))
+
+    @staticmethod
+    def next_date(month, day, now, schedule=None):
+        """
+        Returns the date of the next occurrence of an anniversary on the given
+        month and day as seen at the datetime `now`. That's the date this year
+        until bedtime on the day, and the date next year after that.
+        """
+        schedule = bedtime.schedule_or_default(schedule)
         result = None
         this_year = datetime.date(
-            year=datetime.datetime.today().year,
-            month=self.month,
-            day=self.day)
+            year=now.year,
+            month=month,
+            day=day)
         next_year = datetime.date(
-            year=datetime.datetime.today().year + 1,
-            month=self.month,
-            day=self.day)
-        if self._in_future(this_year):
+            year=now.year + 1,
+            month=month,
+            day=day)
+        today = not schedule.is_nighttime(now) and \
+            month == now.month and day == now.day
+        if EventBase._seconds_until(this_year, now, schedule) > 0:
             result = this_year
-        elif self.today:
+        elif today:
             result = this_year
         else:
             result = next_year
         return result
 
+    def occurrences(self, start):
+        """
+        Generates the dates on which the event happens in ascending order,
+        starting from the date `start`. Never ends.
+        """
+        year = start.year
+        if (self.month, self.day) < (start.month, start.day):
+            year += 1
+        while True:
+            yield datetime.date(year=year, month=self.month, day=self.day)
+            year += 1
+
     @property
     def year(self):
         """the year of the event"""
@@ -202,3 +334,10 @@ class SpecialDay(EventBase):
             year=self.year,
             month=self.month,
             day=self.day)
+
+    def today_at(self, now, schedule=None):
+        """
+        Checks whether the datetime `now` falls on the day of the event. Unlike
+        anniversaries the year must match too.
+        """
+        return now.year == self.year and super().today_at(now, schedule)
@@ -0,0 +1,356 @@
+"""
+Priority index of calendar events ordered by their next occurrence
+"""
+import bisect
+from collections import namedtuple
+import datetime
+import heapq
+
+from sleepcounter.core.time import bedtime
+from sleepcounter.core.time.event import SpecialDay
+from sleepcounter.core.time.recurring import RecurringEvent
+
+Occurrence = namedtuple("Occurrence", ["target", "seq", "date", "event"])
+
+
+class OccurrenceIndex:
+    """
+    A binary heap of events keyed on the instant of their next occurrence, ie.
+    wake-up time on the date of the event. Ties are broken on the order in
+    which events were added so that results match a linear scan of the
+    calendar.
+
+    Keys are computed against the reference time of the index. As time moves
+    forward only the entries whose occurrence has already passed need to be
+    re-evaluated: anniversaries are re-keyed to the following year and expired
+    one-off events are dropped. The index cannot be moved backwards in time and
+    must be rebuilt if the clock goes back.
+
+    Removed events are marked rather than taken out of the heap straight away.
+    Marked entries are skipped, dropped when they reach the top of the heap
+    and purged in one pass once they make up half of it.
+
+    keyword arguments:
+    events -- the events to index, in calendar order
+    now -- the datetime that the index keys are computed against
+    schedule -- the Schedule of the calendar. Defaults to the default
+        schedule.
+    """
+    def __init__(self, events, now, schedule=None):
+        self._now = now
+        self._schedule = bedtime.schedule_or_default(schedule)
+        self._count = 0
+        self._heap = []
+        # the seqs of the entries of each event by id and the seqs of removed
+        # entries still in the heap
+        self._seqs = {}
+        self._removed = set()
+        for event in events:
+            self._heap.append(
+                self._occurrence(event, self._next_seq(event), now))
+        heapq.heapify(self._heap)
+
+    @property
+    def reference(self):
+        """Returns the datetime that the index is currently valid for"""
+        return self._now
+
+    def __len__(self):
+        return len(self._heap) - len(self._removed)
+
+    def add(self, event):
+        """
+        Add an event to the index after all events already indexed
+
+        keyword arguments:
+        event -- an event instance
+        """
+        heapq.heappush(
+            self._heap,
+            self._occurrence(event, self._next_seq(event), self._now))
+
+    def extend(self, events):
+        """
+        Add several events to the index after all events already indexed.
+        Large batches are merged by re-heapifying rather than pushing one at a
+        time.
+
+        keyword arguments:
+        events -- an iterable of event instances
+        """
+        occurrences = []
+        for event in events:
+            occurrences.append(
+                self._occurrence(event, self._next_seq(event), self._now))
+        if len(occurrences) * max(1, len(self._heap)).bit_length() < \
+                len(self._heap):
+            for occurrence in occurrences:
+                heapq.heappush(self._heap, occurrence)
+        else:
+            self._heap.extend(occurrences)
+            heapq.heapify(self._heap)
+
+    def remove(self, event):
+        """
+        Remove an event from the index. Does nothing if the event isn't
+        indexed, eg. because it has expired and been dropped.
+
+        keyword arguments:
+        event -- the event instance to remove
+        """
+        seqs = self._seqs.get(id(event))
+        if not seqs:
+            return
+        self._removed.add(seqs.pop(0))
+        if not seqs:
+            del self._seqs[id(event)]
+        if 2 * len(self._removed) > len(self._heap):
+            self._heap = [
+                occurrence for occurrence in self._heap
+                if occurrence.seq not in self._removed]
+            heapq.heapify(self._heap)
+            self._removed.clear()
+
+    def advance(self, now):
+        """
+        Move the reference time of the index forward to `now`, updating any
+        entries whose occurrence has passed. Returns a list of the one-off
+        events that have expired and been dropped.
+
+        keyword arguments:
+        now -- a datetime no earlier than the current reference time
+        """
+        if now < self._now:
+            raise ValueError(
+                "Cannot move index back from %s to %s" % (self._now, now))
+        passed = []
+        while self._heap and self._heap[0].target < now:
+            passed.append(heapq.heappop(self._heap))
+        expired = []
+        for occurrence in passed:
+            event = occurrence.event
+            if occurrence.seq in self._removed:
+                self._removed.discard(occurrence.seq)
+                continue
+            date = event.date_at(now, self._schedule)
+            if date != occurrence.date:
+                occurrence = self._occurrence(event, occurrence.seq, now, date)
+            elif event.sleeps_remaining_at(now, self._schedule) < 0:
+                # one-off events never come around again
+                self._forget(event, occurrence.seq)
+                expired.append(event)
+                continue
+            heapq.heappush(self._heap, occurrence)
+        self._now = now
+        return expired
+
+    def ordered(self):
+        """
+        Generator yielding the indexed occurrences in order of occurrence. Each
+        item costs O(log k) for the kth item so that the first few entries are
+        cheap to find. The index must not be modified while iterating.
+        """
+        heap = self._heap
+        if not heap:
+            return
+        frontier = [(heap[0], 0)]
+        while frontier:
+            occurrence, position = heapq.heappop(frontier)
+            if occurrence.seq not in self._removed:
+                yield occurrence
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def _next_seq(self, event):
+        seq = self._count
+        self._count += 1
+        self._seqs.setdefault(id(event), []).append(seq)
+        return seq
+
+    def _forget(self, event, seq):
+        seqs = self._seqs[id(event)]
+        seqs.remove(seq)
+        if not seqs:
+            del self._seqs[id(event)]
+
+    def _occurrence(self, event, seq, now, date=None):
+        if date is None:
+            date = event.date_at(now, self._schedule)
+        return Occurrence(self._schedule.wake_up(date), seq, date, event)
+
+
+class DateIndex:
+    """
+    Hash indexes of events so that the events happening on a given day can be
+    found in constant time. One-off events are keyed on their date and
+    anniversaries on their month and day. Where several events match, the one
+    added first wins so that results match a linear scan of the calendar.
+
+    The keys are also kept in sorted order so that the events happening over
+    a range of dates can be found without visiting every event.
+
+    Recurring events have no single key. They are kept in a list and each is
+    asked whether it happens on a date, which is a lookup in its dates for
+    the year.
+
+    keyword arguments:
+    events -- the events to index, in calendar order
+    """
+    def __init__(self, events=()):
+        self._count = 0
+        self._by_date = {}
+        self._by_month_day = {}
+        self._dates = []
+        self._month_days = []
+        self._recurring = []
+        self.extend(events)
+
+    def add(self, event):
+        """
+        Add an event to the index after all events already indexed
+
+        keyword arguments:
+        event -- an event instance
+        """
+        key, keys, new = self._insert(event)
+        if new:
+            bisect.insort(keys, key)
+
+    def extend(self, events):
+        """
+        Add several events to the index after all events already indexed,
+        sorting the keys once for the whole batch
+
+        keyword arguments:
+        events -- an iterable of event instances
+        """
+        added = False
+        for event in events:
+            self._insert(event)
+            added = True
+        if added:
+            self._dates = sorted(self._by_date)
+            self._month_days = sorted(self._by_month_day)
+
+    def between(self, start, end):
+        """
+        Returns (date, seq, event) tuples for every occurrence of an indexed
+        event from date `start` to date `end` inclusive, in order of
+        occurrence and then calendar order
+
+        keyword arguments:
+        start -- the first date of the range
+        end -- the last date of the range
+        """
+        found = []
+        first = bisect.bisect_left(self._dates, start)
+        last = bisect.bisect_right(self._dates, end)
+        for date in self._dates[first:last]:
+            found.extend(
+                (date, seq, event) for seq, event in self._by_date[date])
+        for year in range(start.year, end.year + 1):
+            low = (start.month, start.day) if year == start.year else (1, 1)
+            high = (end.month, end.day) if year == end.year else (12, 31)
+            first = bisect.bisect_left(self._month_days, low)
+            last = bisect.bisect_right(self._month_days, high)
+            for month, day in self._month_days[first:last]:
+                try:
+                    date = datetime.date(year=year, month=month, day=day)
+                except ValueError:
+                    # eg. the 29th of February outside a leap year
+                    continue
+                found.extend(
+                    (date, seq, event)
+                    for seq, event in self._by_month_day[(month, day)])
+        for seq, event in self._recurring:
+            for date in event.occurrences(start):
+                if date > end:
+                    break
+                found.append((date, seq, event))
+        found.sort(key=lambda match: match[:2])
+        return found
+
+    def todays_event(self, now, schedule=None):
+        """
+        Returns the first event happening on the day of datetime `now` or None
+
+        keyword arguments:
+        now -- the datetime to check
+        schedule -- the Schedule of the calendar. Defaults to the default
+            schedule.
+        """
+        if bedtime.schedule_or_default(schedule).is_nighttime(now):
+            return None
+        return self._first(
+            self._candidates(now.date()),
+            lambda event: event.today_at(now, schedule))
+
+    def event_on(self, search_date, now, schedule=None):
+        """
+        Returns the first event whose date is `search_date` or None
+
+        keyword arguments:
+        search_date -- the date to look up
+        now -- the datetime that recurring event dates are evaluated at
+        schedule -- the Schedule of the calendar. Defaults to the default
+            schedule.
+        """
+        return self._first(
+            self._candidates(search_date),
+            lambda event: event.date_at(now, schedule) == search_date)
+
+    def remove(self, event):
+        """
+        Remove an event from the index. Raises ValueError if it isn't indexed.
+
+        keyword arguments:
+        event -- the event instance to remove
+        """
+        key, index, keys = self._location(event)
+        bucket = self._recurring if index is None else index.get(key, [])
+        for position, (_, candidate) in enumerate(bucket):
+            if candidate is event:
+                del bucket[position]
+                break
+        else:
+            raise ValueError("Event %r is not indexed" % event.name)
+        if index is not None and not bucket:
+            del index[key]
+            del keys[bisect.bisect_left(keys, key)]
+
+    def _location(self, event):
+        # the key of an event, the dict of buckets that it's kept in and the
+        # sorted keys of the buckets. Recurring events have none of these.
+        if isinstance(event, RecurringEvent):
+            return None, None, None
+        if isinstance(event, SpecialDay):
+            return event.date, self._by_date, self._dates
+        return (event.month, event.day), self._by_month_day, self._month_days
+
+    def _insert(self, event):
+        # add the event to its bucket, returning its key, the sorted keys that
+        # the key belongs in and whether the key is new
+        key, index, keys = self._location(event)
+        if index is None:
+            self._recurring.append((self._count, event))
+            self._count += 1
+            return key, keys, False
+        bucket = index.setdefault(key, [])
+        bucket.append((self._count, event))
+        self._count += 1
+        return key, keys, len(bucket) == 1
+
+    def _candidates(self, date):
+        return (
+            self._by_date.get(date, []) +
+            self._by_month_day.get((date.month, date.day), []) +
+            [
+                (seq, event) for seq, event in self._recurring
+                if event.occurs_on(date)])
+
+    @staticmethod
+    def _first(candidates, predicate):
+        matches = [
+            (seq, event) for seq, event in candidates if predicate(event)]
+        return min(matches, key=lambda match: match[0])[1] if matches else None
@@ -0,0 +1,130 @@
+"""
+Change notifications for values derived from a calendar
+"""
+import logging
+from threading import RLock
+
+LOGGER = logging.getLogger("observer")
+
+# the snapshot values that may be subscribed to
+VALUES = (
+    "events",
+    "next_event",
+    "sleeps_to_next_event",
+    "todays_event",
+    "special_day_today",
+    "is_nighttime",
+)
+_UNSET = object()
+
+
+def _differs(last, current):
+    # events compare by their attributes, which None doesn't have
+    if last is current:
+        return False
+    if last is None or current is None:
+        return True
+    return last != current
+
+
+class Subscription:
+    """
+    A handle on a callback subscribed to a value with Publisher.subscribe
+
+    keyword arguments:
+    publisher -- the publisher the callback is subscribed to
+    value -- the name of the value
+    callback -- the callable to notify
+    """
+    def __init__(self, publisher, value, callback):
+        self._publisher = publisher
+        self._value = value
+        self._callback = callback
+
+    @property
+    def value(self):
+        """Returns the name of the value subscribed to"""
+        return self._value
+
+    @property
+    def callback(self):
+        """Returns the callable that is notified of changes"""
+        return self._callback
+
+    def cancel(self):
+        """Stop notifying the callback"""
+        # pylint: disable=protected-access
+        self._publisher._unsubscribe(self)
+
+
+class Publisher:
+    """
+    Notifies subscribers when values taken from successive calendar snapshots
+    change. Each value is compared once per snapshot however many callbacks
+    are subscribed to it. New subscribers are also notified of the current
+    value on the next publish.
+    """
+    def __init__(self):
+        self._lock = RLock()
+        self._subscriptions = {}
+        self._last = {}
+        self._new = set()
+
+    def __bool__(self):
+        return bool(self._subscriptions)
+
+    def subscribe(self, value, callback):
+        """
+        Subscribe to changes in a value. Returns a Subscription.
+
+        keyword arguments:
+        value -- the name of a CalendarSnapshot property listed in VALUES
+        callback -- a callable taking the new value
+        """
+        if value not in VALUES:
+            raise ValueError("Cannot subscribe to %r" % value)
+        subscription = Subscription(self, value, callback)
+        with self._lock:
+            self._subscriptions.setdefault(value, []).append(subscription)
+            self._new.add(subscription)
+        return subscription
+
+    def publish(self, snapshot):
+        """
+        Notify subscribers of values that have changed since the last snapshot
+
+        keyword arguments:
+        snapshot -- a CalendarSnapshot
+        """
+        notifications = []
+        with self._lock:
+            for value, subscriptions in self._subscriptions.items():
+                current = getattr(snapshot, value)
+                last = self._last.get(value, _UNSET)
+                if last is _UNSET or _differs(last, current):
+                    self._last[value] = current
+                    notify = subscriptions
+                else:
+                    notify = [sub for sub in subscriptions if sub in self._new]
+                notifications.extend((sub, current) for sub in notify)
+            self._new.clear()
+        for subscription, current in notifications:
+            LOGGER.debug(
+                "Notifying %r of %s", subscription.callback, subscription.value)
+            try:
+                subscription.callback(current)
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.exception(
+                    "Subscriber %r to %s failed",
+                    subscription.callback,
+                    subscription.value)
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.value, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+            self._new.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.value, None)
+                self._last.pop(subscription.value, None)
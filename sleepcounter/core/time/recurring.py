@@ -0,0 +1,272 @@
+"""
+Events that recur by rule rather than on a fixed date, eg. the second Sunday
+in May, the last Friday of every month, every Saturday or Easter Sunday. The
+dates of each rule are worked out in closed form a year at a time and cached
+per year, so a single rule stands in for any number of one-off events.
+"""
+from abc import abstractmethod
+import bisect
+import calendar
+import datetime
+import logging
+
+from sleepcounter.core import metrics
+from sleepcounter.core.time import bedtime, clock
+from sleepcounter.core.time.event import EventBase
+
+LOGGER = logging.getLogger("recurring")
+
+_DAY = datetime.timedelta(days=1)
+_WEEK = datetime.timedelta(days=7)
+# the Gregorian calendar repeats every 400 years so every rule that happens
+# at all happens within that many years of any date
+_MAX_YEARS = 400
+
+
+class RecurringEvent(EventBase):
+    """
+    Base class of events that happen on every date matching a rule.
+    Subclasses work out the dates in a year in _dates_in(year), which are
+    cached per year.
+
+    The month, day and year of a recurring event are those of its next
+    occurrence.
+
+    keyword arguments:
+    name -- a string that defines a name for the event for debugging and display
+    sleeps -- the number of sleeps to count in the lead-up to each occurrence.
+        Defaults to counting from the previous occurrence.
+    """
+    def __init__(self, name: str, sleeps=None):
+        super().__init__(name, None, None, sleeps)
+        self._years = {}
+
+    @property
+    @abstractmethod
+    def rule(self):
+        """
+        Returns the keyword arguments, other than name and sleeps, that the
+        event was created with
+        """
+
+    @property
+    def month(self):
+        """Returns the month of the next occurrence"""
+        return self.date.month
+
+    @property
+    def day(self):
+        """Returns the day of the next occurrence"""
+        return self.date.day
+
+    @property
+    def year(self):
+        """Returns the year of the next occurrence"""
+        return self.date.year
+
+    @property
+    def date(self):
+        """Returns the date of the next occurrence"""
+        metrics.increment("event.date")
+        return self.date_at(clock.now())
+
+    def dates_in(self, year):
+        """Returns a sorted tuple of the dates the event happens in a year"""
+        dates = self._years.get(year)
+        if dates is None:
+            dates = self._years[year] = tuple(self._dates_in(year))
+        return dates
+
+    def next_on_or_after(self, date):
+        """Returns the first date from `date` on which the event happens"""
+        for year in range(date.year, date.year + _MAX_YEARS):
+            dates = self.dates_in(year)
+            position = bisect.bisect_left(dates, date)
+            if position < len(dates):
+                return dates[position]
+        raise ValueError("Event %r never happens" % self.name)
+
+    def occurs_on(self, date):
+        """Returns whether the event happens on `date`"""
+        dates = self.dates_in(date.year)
+        position = bisect.bisect_left(dates, date)
+        return position < len(dates) and dates[position] == date
+
+    def date_at(self, now, schedule=None):
+        """
+        Returns the date of the next occurrence as seen at the datetime `now`.
+        Like an anniversary, an occurrence is the next one until bedtime on
+        the day.
+        """
+        schedule = bedtime.schedule_or_default(schedule)
+        return self._cache(schedule).get(
+            "date", now, lambda now: self._next_date(now, schedule))
+
+    def _next_date(self, now, schedule):
+        date = self.next_on_or_after(now.date())
+        if date == now.date() and schedule.is_nighttime(now) and \
+                self._seconds_until(date, now, schedule) <= 0:
+            date = self.next_on_or_after(date + _DAY)
+        return date
+
+    def occurrences(self, start):
+        """
+        Generates the dates on which the event happens in ascending order,
+        starting from the date `start`. Never ends.
+        """
+        date = self.next_on_or_after(start)
+        year = date.year
+        position = bisect.bisect_left(self.dates_in(year), date)
+        while True:
+            yield from self.dates_in(year)[position:]
+            year += 1
+            position = 0
+
+    def today_at(self, now, schedule=None):
+        """
+        Checks whether the datetime `now` falls on a day that the event
+        happens
+        """
+        if bedtime.schedule_or_default(schedule).is_nighttime(now):
+            LOGGER.debug("It's nighttime right now. Wait until morning")
+            return False
+        return self.occurs_on(now.date())
+
+    @abstractmethod
+    def _dates_in(self, year):
+        """Returns the dates of the event in a year in ascending order"""
+
+
+class NthWeekday(RecurringEvent):
+    """
+    An event on the nth given weekday of a month, eg. the second Sunday in May,
+    or of every month.
+
+    keyword arguments:
+    name -- a string that defines a name for the event for debugging and display
+    month -- the month 1->12, or None for every month
+    weekday -- the day of the week, 0 for Monday to 6 for Sunday
+    nth -- 1 for the first such weekday of the month up to 5, or -1 for the
+        last such weekday back to -5. Months without an nth weekday are
+        skipped.
+    sleeps -- the number of sleeps to count in the lead-up to the event.
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(
+            self,
+            name: str,
+            month,
+            weekday: int,
+            nth: int,
+            sleeps=None,
+        ):
+        if month is not None and not 1 <= month <= 12:
+            raise ValueError("Month must be 1 to 12, not %r" % (month,))
+        if not 0 <= weekday <= 6:
+            raise ValueError("Weekday must be 0 to 6, not %r" % (weekday,))
+        if nth == 0 or not -5 <= nth <= 5:
+            raise ValueError("nth must be 1 to 5 or -1 to -5, not %r" % (nth,))
+        super().__init__(name, sleeps)
+        self._rule_month = month
+        self._weekday = weekday
+        self._nth = nth
+
+    @property
+    def rule(self):
+        return {
+            "month": self._rule_month,
+            "weekday": self._weekday,
+            "nth": self._nth,
+        }
+
+    def _dates_in(self, year):
+        months = range(1, 13) if self._rule_month is None \
+            else (self._rule_month,)
+        for month in months:
+            first_weekday, days = calendar.monthrange(year, month)
+            if self._nth > 0:
+                day = 1 + (self._weekday - first_weekday) % 7 + \
+                    7 * (self._nth - 1)
+            else:
+                last_weekday = (first_weekday + days - 1) % 7
+                day = days - (last_weekday - self._weekday) % 7 + \
+                    7 * (self._nth + 1)
+            if 1 <= day <= days:
+                yield datetime.date(year, month, day)
+
+
+class Weekly(RecurringEvent):
+    """
+    An event on the same day every week, eg. every Saturday
+
+    keyword arguments:
+    name -- a string that defines a name for the event for debugging and display
+    weekday -- the day of the week, 0 for Monday to 6 for Sunday
+    sleeps -- the number of sleeps to count in the lead-up to the event.
+    """
+    def __init__(self, name: str, weekday: int, sleeps=None):
+        if not 0 <= weekday <= 6:
+            raise ValueError("Weekday must be 0 to 6, not %r" % (weekday,))
+        super().__init__(name, sleeps)
+        self._weekday = weekday
+
+    @property
+    def rule(self):
+        return {"weekday": self._weekday}
+
+    def _dates_in(self, year):
+        first = datetime.date(year, 1, 1)
+        date = first + datetime.timedelta(
+            days=(self._weekday - first.weekday()) % 7)
+        while date.year == year:
+            yield date
+            date += _WEEK
+
+
+def easter(year):
+    """
+    Returns the date of Easter Sunday in a year of the Gregorian calendar,
+    worked out with the anonymous Gregorian algorithm
+    """
+    # pylint: disable=invalid-name
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+class Easter(RecurringEvent):
+    """
+    An event on Easter Sunday, or a number of days either side of it, eg. -2
+    for Good Friday
+
+    keyword arguments:
+    name -- a string that defines a name for the event for debugging and display
+    offset -- the number of days after Easter Sunday that the event happens
+    sleeps -- the number of sleeps to count in the lead-up to the event.
+    """
+    def __init__(self, name: str, offset: int = 0, sleeps=None):
+        super().__init__(name, sleeps)
+        self._offset = offset
+
+    @property
+    def rule(self):
+        return {"offset": self._offset}
+
+    def _dates_in(self, year):
+        # the event may fall in a year either side of its Easter Sunday
+        spread = 1 + abs(self._offset) // 365
+        for easter_year in range(year - spread, year + spread + 1):
+            date = easter(easter_year) + datetime.timedelta(days=self._offset)
+            if date.year == year:
+                yield date
+
+
+RECURRENCES = {cls.__name__: cls for cls in (NthWeekday, Weekly, Easter)}
@@ -0,0 +1,146 @@
+"""
+Defines the CalendarRegistry class which holds the calendars of many tenants
+"""
+import logging
+from threading import Lock
+import weakref
+
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.event import Anniversary
+
+LOGGER = logging.getLogger("registry")
+
+
+def _key(event):
+    # the identity of an anniversary that may be shared, or None
+    if type(event) is not Anniversary:  # pylint: disable=unidiomatic-typecheck
+        return None
+    return event.name, event.month, event.day, event.sleeps
+
+
+class CalendarRegistry:
+    """
+    Holds a calendar for each of many tenants, eg. households. Anniversaries
+    equal to one already held by any tenant are replaced by that instance, so
+    each common anniversary is stored once however many tenants have it.
+    Events memoize their dates and sleeps until the next wake-up time or
+    bedtime, so the date math of a shared anniversary is also done once per
+    period for all tenants rather than once per tenant.
+
+    Events should be added through the registry rather than directly to the
+    tenants' calendars so that they're shared.
+
+    keyword arguments:
+    clock -- the Clock for the tenants' calendars to tell the time by.
+        Defaults to the clock in use.
+    """
+    def __init__(self, clock=None):
+        self._clock = clock
+        self._lock = Lock()
+        self._calendars = {}
+        # shared anniversaries are dropped once no tenant holds them
+        self._shared = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._calendars)
+
+    def __contains__(self, tenant):
+        return tenant in self._calendars
+
+    def __iter__(self):
+        return iter(list(self._calendars))
+
+    @property
+    def shared_events(self):
+        """Returns the number of distinct anniversaries held"""
+        return len(self._shared)
+
+    def calendar(self, tenant):
+        """
+        Returns the calendar of a tenant. Raises KeyError for unknown tenants.
+
+        keyword arguments:
+        tenant -- the hashable identifier of the tenant
+        """
+        return self._calendars[tenant]
+
+    def add_tenant(self, tenant, events=(), schedule=None):
+        """
+        Create a calendar for a new tenant and return it. Shared events keep
+        separate memoized values for each schedule, so tenants with the same
+        schedule share the work.
+
+        keyword arguments:
+        tenant -- the hashable identifier of the tenant
+        events -- an iterable of event instances for the tenant's calendar
+        schedule -- the Schedule of the tenant. Defaults to the default
+            schedule.
+        """
+        events = [self.intern(event) for event in events]
+        calendar = Calendar(events, self._clock, schedule)
+        with self._lock:
+            if tenant in self._calendars:
+                raise ValueError("Tenant %r already exists" % (tenant,))
+            self._calendars[tenant] = calendar
+        LOGGER.info("Added tenant %r with %s events", tenant, len(events))
+        return calendar
+
+    def remove_tenant(self, tenant):
+        """
+        Remove a tenant's calendar. Raises KeyError for unknown tenants.
+
+        keyword arguments:
+        tenant -- the hashable identifier of the tenant
+        """
+        with self._lock:
+            del self._calendars[tenant]
+        LOGGER.info("Removed tenant %r", tenant)
+
+    def add_event(self, tenant, event):
+        """
+        Add an event to a tenant's calendar
+
+        keyword arguments:
+        tenant -- the hashable identifier of the tenant
+        event -- an event instance
+        """
+        self.calendar(tenant).add_event(self.intern(event))
+
+    def add_events(self, tenant, events):
+        """
+        Add several events to a tenant's calendar
+
+        keyword arguments:
+        tenant -- the hashable identifier of the tenant
+        events -- an iterable of event instances
+        """
+        self.calendar(tenant).add_events(self.intern(event) for event in events)
+
+    def remove_event(self, tenant, event):
+        """
+        Remove an event from a tenant's calendar. Raises ValueError if it isn't
+        in the calendar.
+
+        keyword arguments:
+        tenant -- the hashable identifier of the tenant
+        event -- an event instance
+        """
+        self.calendar(tenant).remove_event(event)
+
+    def intern(self, event):
+        """
+        Returns the shared instance of an anniversary equal to `event`, which
+        becomes the shared instance if there isn't one yet. Other events are
+        returned as they are.
+
+        keyword arguments:
+        event -- an event instance
+        """
+        key = _key(event)
+        if key is None:
+            return event
+        with self._lock:
+            shared = self._shared.get(key)
+            if shared is None:
+                shared = self._shared[key] = event
+        return shared
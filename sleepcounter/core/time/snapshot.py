@@ -0,0 +1,116 @@
+"""
+Defines the CalendarSnapshot class which holds the state of a calendar at a
+single instant
+"""
+import logging
+
+LOGGER = logging.getLogger("snapshot")
+
+
+class CalendarSnapshot:
+    """
+    An immutable view of a calendar evaluated against a single point in time.
+    All values are computed once on creation so that they are consistent with
+    each other and may be shared between widgets.
+
+    keyword arguments:
+    calendar -- the calendar to evaluate
+    now -- the datetime to evaluate the calendar at
+    """
+    __slots__ = (
+        "_now",
+        "_events",
+        "_next_event",
+        "_seconds_to_next_event",
+        "_sleeps_to_next_event",
+        "_todays_event",
+        "_special_day_today",
+        "_is_nighttime",
+        "_valid_until",
+    )
+
+    def __init__(self, calendar, now):
+        # pylint: disable=protected-access
+        schedule = calendar.schedule
+        local = schedule.local(now)
+        self._now = now
+        self._events = calendar._active_events(local)
+        try:
+            occurrence = calendar._next_occurrence(local)
+        except ValueError:
+            occurrence = None
+        if occurrence:
+            self._next_event = occurrence.event
+            self._seconds_to_next_event = \
+                occurrence.event.seconds_remaining_at(local, schedule)
+            self._sleeps_to_next_event = \
+                occurrence.event.sleeps_remaining_at(local, schedule)
+        else:
+            self._next_event = None
+            self._seconds_to_next_event = None
+            self._sleeps_to_next_event = None
+        self._is_nighttime = schedule.is_nighttime(local)
+        self._valid_until = calendar.next_change(now)
+        self._todays_event = None
+        self._special_day_today = False
+        if not self._is_nighttime:
+            self._todays_event = calendar._todays_event(local)
+            self._special_day_today = any(
+                event.today_at(local, schedule) for event in self._events)
+        LOGGER.debug("Created snapshot %r", self)
+
+    @property
+    def now(self):
+        """Returns the datetime that the snapshot was taken at"""
+        return self._now
+
+    @property
+    def valid_until(self):
+        """
+        Returns the datetime at which the calendar state may next change.
+        Everything but the seconds to the next event holds until then.
+        """
+        return self._valid_until
+
+    @property
+    def events(self):
+        """Returns a tuple of the events that were active"""
+        return self._events
+
+    @property
+    def next_event(self):
+        """Returns the next event to happen or None if there are no events"""
+        return self._next_event
+
+    @property
+    def seconds_to_next_event(self):
+        """Returns the time to the next event in seconds or None"""
+        return self._seconds_to_next_event
+
+    @property
+    def sleeps_to_next_event(self):
+        """Returns the number of sleeps to the next event or None"""
+        return self._sleeps_to_next_event
+
+    @property
+    def todays_event(self):
+        """Returns todays event or None if it's not a special day"""
+        return self._todays_event
+
+    @property
+    def special_day_today(self):
+        """Returns a bool to indicate whether it was a special day"""
+        return self._special_day_today
+
+    @property
+    def is_nighttime(self):
+        """Returns a bool to indicate whether it was nighttime"""
+        return self._is_nighttime
+
+    def __repr__(self):
+        return "%s(now=%s, next_event=%s, sleeps=%s, today=%s)" % (
+            self.__class__.__name__,
+            self._now,
+            (self._next_event.name if self._next_event else None),
+            self._sleeps_to_next_event,
+            (self._todays_event.name if self._todays_event else None))
@@ -0,0 +1,336 @@
+"""
+A serialisable record of the state of a calendar over the period for which it
+holds, a mixin for stand-ins that answer calendar queries from such records
+rather than from the events themselves, and a stand-in that shares one record
+between all the readers of a calendar
+"""
+from abc import ABC, abstractmethod
+import datetime
+import logging
+from threading import Lock
+
+from sleepcounter.core import metrics
+from sleepcounter.core.time.event import Anniversary, SpecialDay
+from sleepcounter.core.time.recurring import RECURRENCES, RecurringEvent
+
+LOGGER = logging.getLogger("state")
+
+
+def encode_event(event):
+    """
+    Returns an Anniversary or SpecialDay as a [name, month, day, year, sleeps]
+    list, where year is None for anniversaries, or a recurring event as a
+    [name, kind, rule, sleeps] list, where kind is the name of its class and
+    rule is a dict of its rule
+    """
+    if isinstance(event, RecurringEvent) and \
+            RECURRENCES.get(type(event).__name__) is type(event):
+        return [event.name, type(event).__name__, event.rule, event.sleeps]
+    if isinstance(event, SpecialDay):
+        year = event.year
+    elif isinstance(event, Anniversary):
+        year = None
+    else:
+        raise TypeError(
+            "Cannot encode event %r of type %s" % (
+                event.name, type(event).__name__))
+    return [event.name, event.month, event.day, year, event.sleeps]
+
+
+def decode_event(fields):
+    """Returns the event encoded by encode_event"""
+    if len(fields) == 4:
+        name, kind, rule, sleeps = fields
+        return RECURRENCES[kind](name=name, sleeps=sleeps, **rule)
+    name, month, day, year, sleeps = fields
+    if year is None:
+        return Anniversary(name=name, month=month, day=day, sleeps=sleeps)
+    return SpecialDay(name=name, year=year, month=month, day=day, sleeps=sleeps)
+
+
+def _index(events, event):
+    # the position of an event among the events or None
+    if event is None:
+        return None
+    return next(
+        position for position, candidate in enumerate(events)
+        if candidate is event)
+
+
+class CalendarState:
+    """
+    The state of a calendar taken at one time and valid until its next change.
+    The seconds to the next event are worked out for any time in between.
+
+    keyword arguments:
+    now -- the datetime the state was taken at
+    valid_until -- the datetime at which the state may next change
+    events -- a tuple of the active events
+    next_event -- the next event or None
+    todays_event -- today's event or None
+    sleeps_to_next_event -- the number of sleeps to the next event or None
+    seconds_to_next_event -- the seconds to the next event at `now` or None
+    special_day_today -- a bool to indicate whether it's a special day
+    is_nighttime -- a bool to indicate whether it's nighttime
+    """
+    # pylint: disable=too-many-instance-attributes
+    __slots__ = (
+        "now",
+        "valid_until",
+        "events",
+        "next_event",
+        "todays_event",
+        "sleeps_to_next_event",
+        "seconds_to_next_event",
+        "special_day_today",
+        "is_nighttime",
+    )
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+            self,
+            now,
+            valid_until,
+            events,
+            next_event,
+            todays_event,
+            sleeps_to_next_event,
+            seconds_to_next_event,
+            special_day_today,
+            is_nighttime,
+        ):
+        self.now = now
+        self.valid_until = valid_until
+        self.events = tuple(events)
+        self.next_event = next_event
+        self.todays_event = todays_event
+        self.sleeps_to_next_event = sleeps_to_next_event
+        self.seconds_to_next_event = seconds_to_next_event
+        self.special_day_today = special_day_today
+        self.is_nighttime = is_nighttime
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Returns the state recorded by a CalendarSnapshot"""
+        return cls(
+            snapshot.now,
+            snapshot.valid_until,
+            snapshot.events,
+            snapshot.next_event,
+            snapshot.todays_event,
+            snapshot.sleeps_to_next_event,
+            snapshot.seconds_to_next_event,
+            snapshot.special_day_today,
+            snapshot.is_nighttime)
+
+    @classmethod
+    def decode(cls, message):
+        """Returns the state encoded as a dict by encode()"""
+        events = [decode_event(fields) for fields in message["events"]]
+        return cls(
+            datetime.datetime.fromisoformat(message["now"]),
+            datetime.datetime.fromisoformat(message["until"]),
+            events,
+            None if message["next"] is None else events[message["next"]],
+            None if message["today"] is None else events[message["today"]],
+            message["sleeps"],
+            message["seconds"],
+            message["special"],
+            message["night"])
+
+    def encode(self, now=None):
+        """
+        Returns the state as a dict of JSON types: now and until as ISO 8601
+        strings, events as encode_event lists, next and today as indexes into
+        events, and sleeps, seconds, special and night.
+
+        keyword arguments:
+        now -- a datetime covered by the state to record it as taken at.
+            Defaults to the time it was taken at.
+        """
+        if now is None:
+            now = self.now
+        return {
+            "now": now.isoformat(),
+            "until": self.valid_until.isoformat(),
+            "events": [encode_event(event) for event in self.events],
+            "next": _index(self.events, self.next_event),
+            "today": _index(self.events, self.todays_event),
+            "sleeps": self.sleeps_to_next_event,
+            "seconds": self.seconds_to_next_event_at(now),
+            "special": self.special_day_today,
+            "night": self.is_nighttime,
+        }
+
+    def at(self, now):
+        """
+        Returns a copy of the state as if taken at the datetime `now`, which
+        the state must cover
+        """
+        return CalendarState(
+            now,
+            self.valid_until,
+            self.events,
+            self.next_event,
+            self.todays_event,
+            self.sleeps_to_next_event,
+            self.seconds_to_next_event_at(now),
+            self.special_day_today,
+            self.is_nighttime)
+
+    def covers(self, now):
+        """Returns whether the state holds at the datetime `now`"""
+        return self.now <= now < self.valid_until
+
+    def seconds_to_next_event_at(self, now):
+        """Returns the seconds to the next event at `now` or None"""
+        if self.seconds_to_next_event is None:
+            return None
+        return self.seconds_to_next_event - (now - self.now).total_seconds()
+
+
+def calendar_state(calendar, now=None):
+    """
+    Returns the CalendarState of a Calendar, or of a stand-in answering from
+    states, at the datetime `now`, by default the current time
+    """
+    if isinstance(calendar, StateQueries):
+        return calendar.state(now)
+    return CalendarState.from_snapshot(calendar.snapshot(now))
+
+
+class StateQueries(ABC):
+    """
+    Implements the query interface of Calendar for stand-ins that answer from
+    a CalendarState. Subclasses provide the clock property and
+    _state_at(now), which returns a state covering the datetime `now`.
+    """
+    @property
+    @abstractmethod
+    def clock(self):
+        """Returns the clock that the stand-in tells the time by"""
+
+    @property
+    def events(self):
+        """Returns the active events in the calendar"""
+        return list(self._state_at(self.clock.now()).events)
+
+    @property
+    def next_event(self):
+        """Get the next event to happen"""
+        return self._next(self._state_at(self.clock.now())).next_event
+
+    @property
+    def sleeps_to_next_event(self):
+        """Return the number of sleeps to the next event"""
+        return self._next(
+            self._state_at(self.clock.now())).sleeps_to_next_event
+
+    @property
+    def seconds_to_next_event(self):
+        """Returns the time to the next event in seconds"""
+        now = self.clock.now()
+        return self._next(self._state_at(now)).seconds_to_next_event_at(now)
+
+    @property
+    def special_day_today(self):
+        """Checks whether today is a special day"""
+        return self._state_at(self.clock.now()).special_day_today
+
+    @property
+    def todays_event(self):
+        """Returns todays event or None if it's not a special day"""
+        return self._state_at(self.clock.now()).todays_event
+
+    @property
+    def is_nighttime(self):
+        """Checks whether it's nighttime and returns the result as a bool"""
+        return self._state_at(self.clock.now()).is_nighttime
+
+    def state(self, now=None):
+        """
+        Returns the CalendarState at the datetime `now`, by default the
+        current time, as taken at that time
+        """
+        if now is None:
+            now = self.clock.now()
+        return self._state_at(now).at(now)
+
+    def next_change(self, now=None):
+        """
+        Returns the next datetime after `now` at which the state of the
+        calendar may change, other than the seconds to the next event.
+
+        keyword arguments:
+        now -- the datetime to look from. Defaults to the current time.
+        """
+        if now is None:
+            now = self.clock.now()
+        return self._state_at(now).valid_until
+
+    def snapshot(self, now=None):
+        """
+        Returns the state at the datetime `now`, by default the current time,
+        as a CalendarState taken at that time. It has the values of a
+        CalendarSnapshot, so stand-ins may be used wherever a calendar is
+        snapshotted, eg. in a Simulation.
+        """
+        return self.state(now)
+
+    @abstractmethod
+    def _state_at(self, now):
+        """Returns a CalendarState covering the datetime `now`"""
+
+    @staticmethod
+    def _next(state):
+        if state.next_event is None:
+            raise ValueError("No active events in the calendar")
+        return state
+
+
+class SharedState(StateQueries):
+    """
+    A read-only stand-in for a calendar that evaluates it at most once per
+    state boundary, however many readers it has. The state is kept until its
+    valid_until time, or until the calendar's events change, and readers
+    arriving while it's being computed wait for it rather than computing it
+    again.
+
+    keyword arguments:
+    calendar -- the Calendar, or a stand-in for one, to share the state of
+    """
+    def __init__(self, calendar):
+        self._calendar = calendar
+        self._lock = Lock()
+        self._state = None
+        # the version of the calendar's events that the state was taken at
+        self._version = None
+
+    @property
+    def calendar(self):
+        """Returns the calendar whose state is shared"""
+        return self._calendar
+
+    @property
+    def clock(self):
+        """Returns the clock that the calendar tells the time by"""
+        return self._calendar.clock
+
+    def _events_version(self):
+        # stand-ins follow changes to the events themselves
+        if isinstance(self._calendar, StateQueries):
+            return None
+        return self._calendar.version
+
+    def _state_at(self, now):
+        with self._lock:
+            state = self._state
+            version = self._events_version()
+            if state is not None and state.covers(now) and \
+                    version == self._version:
+                metrics.increment("state.shared_hit")
+                return state
+            metrics.increment("state.shared_miss")
+            state = self._state = calendar_state(self._calendar, now)
+            self._version = version
+            return state
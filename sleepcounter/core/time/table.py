@@ -0,0 +1,169 @@
+"""
+Columnar, vectorised evaluation of large sets of events. Requires numpy which
+is an optional dependency of sleepcounter-core:
+
+    pip install sleepcounter-core[numpy]
+"""
+from collections import namedtuple
+import datetime
+import logging
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from sleepcounter.core.time import bedtime, clock
+from sleepcounter.core.time.event import Anniversary, SpecialDay
+
+LOGGER = logging.getLogger("table")
+_SECONDS_PER_DAY = 24 * 3600
+_MICROSECONDS_PER_SECOND = 10 ** 6
+_NO_YEAR = -1
+
+EventTableResult = namedtuple(
+    "EventTableResult",
+    [
+        "date",
+        "seconds_remaining",
+        "sleeps_remaining",
+        "active",
+        "today",
+        "rolled_over",
+    ])
+EventTableResult.__doc__ = """
+Arrays holding the state of each event in an EventTable at a single instant.
+Element i of each array corresponds to event i of the table.
+
+date -- the date of the event as datetime64[D]
+seconds_remaining -- float seconds until wake-up time on the event date
+sleeps_remaining -- integer number of sleeps to the event
+active -- bool indicating whether the event is active
+today -- bool indicating whether the event is happening today
+rolled_over -- bool indicating whether an anniversary is counting down to its
+    occurrence next year
+"""
+
+
+class EventTable:
+    """
+    Stores the year, month, day and sleeps of Anniversary and SpecialDay events
+    as numpy arrays so that the state of every event can be computed in a few
+    vectorised passes. Results match the per-event properties of EventBase.
+
+    keyword arguments:
+    events -- an iterable of Anniversary and SpecialDay instances
+    """
+    def __init__(self, events):
+        if numpy is None:
+            raise ImportError(
+                "EventTable requires numpy: "
+                "pip install sleepcounter-core[numpy]")
+        self._events = list(events)
+        years, months, days, sleeps = [], [], [], []
+        for event in self._events:
+            if isinstance(event, SpecialDay):
+                years.append(event.year)
+            elif isinstance(event, Anniversary):
+                years.append(_NO_YEAR)
+            else:
+                raise TypeError(
+                    "Cannot tabulate event %r of type %s" % (
+                        event.name, type(event).__name__))
+            months.append(event.month)
+            days.append(event.day)
+            # pylint: disable=protected-access
+            sleeps.append(event._sleeps or 0)
+        self._years = numpy.array(years, dtype=numpy.int64)
+        self._months = numpy.array(months, dtype=numpy.int64)
+        self._days = numpy.array(days, dtype=numpy.int64)
+        self._sleeps = numpy.array(sleeps, dtype=numpy.int64)
+        self._recurring = self._years == _NO_YEAR
+        LOGGER.debug("Tabulated %s events", len(self._events))
+
+    def __len__(self):
+        return len(self._events)
+
+    def __getitem__(self, index):
+        return self._events[index]
+
+    @property
+    def events(self):
+        """Returns the tabulated event objects in table order"""
+        return list(self._events)
+
+    def evaluate(self, now=None, schedule=None):
+        """
+        Compute the state of every event at a single instant
+
+        keyword arguments:
+        now -- the datetime to evaluate at. Defaults to the current time.
+        schedule -- the Schedule whose wake-up time and bedtime apply.
+            Defaults to the default schedule.
+        """
+        schedule = bedtime.schedule_or_default(schedule)
+        if now is None:
+            now = schedule.local(clock.now())
+        now64 = numpy.datetime64(now.replace(tzinfo=None).isoformat(), "us")
+        wake = schedule.wake_up_time
+        wake_offset = numpy.timedelta64(
+            datetime.timedelta(
+                hours=wake.hour,
+                minutes=wake.minute,
+                seconds=wake.second,
+                microseconds=wake.microsecond),
+            "us")
+
+        recurring = self._recurring
+        this_year = self._make_dates(
+            numpy.where(recurring, now.year, self._years))
+        next_year = self._make_dates(numpy.where(
+            recurring, now.year + 1, self._years))
+
+        nighttime = schedule.is_nighttime(now)
+        today = (self._months == now.month) & (self._days == now.day) & \
+            (recurring | (self._years == now.year))
+        if nighttime:
+            today[:] = False
+        in_future = (this_year.astype("M8[us]") + wake_offset) > now64
+        rolled_over = recurring & ~(in_future | today)
+        date = numpy.where(rolled_over, next_year, this_year)
+
+        delta = (date.astype("M8[us]") + wake_offset) - now64
+        seconds = delta.astype(numpy.int64) / _MICROSECONDS_PER_SECOND
+        sleeps = numpy.ceil(seconds / _SECONDS_PER_DAY).astype(numpy.int64)
+        windowed = self._sleeps != 0
+        active = (sleeps >= 0) & ~(windowed & (sleeps > self._sleeps))
+        return EventTableResult(
+            date=date,
+            seconds_remaining=seconds,
+            sleeps_remaining=sleeps,
+            active=active,
+            today=today,
+            rolled_over=rolled_over)
+
+    def next_event(self, now=None, schedule=None):
+        """
+        Returns the next active event to happen or None if there is none. Ties
+        are resolved in table order.
+        """
+        result = self.evaluate(now, schedule)
+        candidates = numpy.flatnonzero(result.active)
+        if not candidates.size:
+            return None
+        best = candidates[numpy.argmin(result.seconds_remaining[candidates])]
+        return self._events[best]
+
+    def _make_dates(self, years):
+        # build datetime64[D] dates from integer columns, raising on invalid
+        # dates as datetime.date would
+        months = (years - 1970).astype("M8[Y]").astype("M8[M]") + \
+            (self._months - 1).astype("m8[M]")
+        dates = months.astype("M8[D]") + (self._days - 1).astype("m8[D]")
+        valid = (self._months >= 1) & (self._months <= 12) & \
+            (self._days >= 1) & (dates.astype("M8[M]") == months)
+        if not valid.all():
+            bad = self._events[int(numpy.argmin(valid))]
+            raise ValueError(
+                "Event %r does not have a valid date" % bad.name)
+        return dates
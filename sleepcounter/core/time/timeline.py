@@ -0,0 +1,84 @@
+"""
+Day-by-day timelines of the state of a calendar computed in a single sweep
+"""
+from collections import namedtuple
+import datetime
+import heapq
+import logging
+
+LOGGER = logging.getLogger("timeline")
+
+_DAY = datetime.timedelta(days=1)
+
+TimelineDay = namedtuple(
+    "TimelineDay",
+    ["date", "events", "next_event", "sleeps_to_next_event", "todays_event"])
+TimelineDay.__doc__ = """
+The state of a calendar during the day, ie. from wake-up time until bedtime,
+on a date. next_event and sleeps_to_next_event are None if no event is active.
+"""
+
+
+def _windows(seq, event, start, end):
+    # the (first day, date) spans over which each occurrence of an event is
+    # the one counted down to and active, clipped to start..end
+    previous = None
+    for date in event.occurrences(start):
+        first = start if previous is None else previous + _DAY
+        if event.sleeps:
+            first = max(first, date - datetime.timedelta(days=event.sleeps))
+        if first > end:
+            break
+        yield first, date, seq, event
+        previous = date
+
+
+def timeline(events, start, end):
+    """
+    Generates a TimelineDay for each date from `start` to `end` inclusive.
+
+    During the day the number of sleeps to an occurrence is simply the number
+    of days until it, so each occurrence is active over a fixed span of days
+    leading up to it. The spans of all events are sorted once and swept over
+    the range with a heap of the active occurrences, costing
+    O((days + occurrences) log events) rather than evaluating every event on
+    every day.
+
+    keyword arguments:
+    events -- the events to follow, in calendar order
+    start -- the first date of the timeline
+    end -- the last date of the timeline
+    """
+    windows = sorted(
+        window
+        for seq, event in enumerate(events)
+        for window in _windows(seq, event, start, end))
+    LOGGER.debug(
+        "Sweeping %s occurrences from %s to %s", len(windows), start, end)
+    upcoming = 0
+    heap = []
+    active = {}
+    ordered = ()
+    day = start
+    while day <= end:
+        changed = False
+        while heap and heap[0][0] < day:
+            _, seq, _ = heapq.heappop(heap)
+            del active[seq]
+            changed = True
+        while upcoming < len(windows) and windows[upcoming][0] <= day:
+            _, date, seq, event = windows[upcoming]
+            heapq.heappush(heap, (date, seq, event))
+            active[seq] = event
+            upcoming += 1
+            changed = True
+        if changed:
+            ordered = tuple(active[seq] for seq in sorted(active))
+        if heap:
+            date, _, event = heap[0]
+            sleeps = (date - day).days
+            yield TimelineDay(
+                day, ordered, event, sleeps, event if not sleeps else None)
+        else:
+            yield TimelineDay(day, ordered, None, None, None)
+        day += _DAY
@@ -3,56 +3,137 @@
 from abc import ABC, abstractmethod
 from logging import getLogger
 from threading import Event, Thread
-from time import sleep
+
+from sleepcounter.core import metrics
+from sleepcounter.core.time.state import calendar_state
 
 _LOGGER = getLogger("widget")
 
 
-class BaseWidget(ABC, Thread):
+def seconds_until_change(calendar):
+    """Returns the number of seconds until a calendar's state next changes"""
+    now = calendar.clock.now()
+    return max(0.0, (calendar.next_change(now) - now).total_seconds())
+
+
+class WidgetMixin:
+    """
+    The calendar, label and state shared by BaseWidget and AsyncBaseWidget,
+    which set them when instantiated.
+
+    Widgets are updated whenever the state of their calendar may have changed.
+    Set mins_between_updates to poll at a fixed interval instead.
+    """
+    mins_between_updates = None
+    _label = None
+    _calendar = None
+    _shared_state = None
+
+    @property
+    def label(self):
+        """Retrieve the label of the widget"""
+        return self._label
+
+    @property
+    def calendar(self):
+        """Retrieve the calendar displayed by the widget"""
+        return self._calendar
+
+    @property
+    def state(self):
+        """
+        Retrieve the CalendarState of the calendar now. Reading the state once
+        per update rather than querying the calendar lets widgets share a
+        single evaluation of it, see shared_state.
+        """
+        if self._shared_state is not None:
+            return self._shared_state.state()
+        return calendar_state(self._calendar)
+
+    @property
+    def shared_state(self):
+        """Retrieve the SharedState that the widget reads its state from"""
+        return self._shared_state
+
+    @shared_state.setter
+    def shared_state(self, shared_state):
+        """
+        Read the state from a SharedState of the widget's calendar, or None
+        to evaluate the calendar for each read
+        """
+        self._shared_state = shared_state
+
+    def seconds_until_update(self):
+        """Returns the number of seconds to wait before the next update"""
+        if self.mins_between_updates is not None:
+            return 60 * self.mins_between_updates
+        return seconds_until_change(self._calendar)
+
+
+class BaseWidget(WidgetMixin, ABC, Thread):
     # pylint: disable=too-few-public-methods
     """
     The interface for all widgets to implement. Each widget represents the date
     somehow. They must implement an update method that will be called from
-    inside a thread.
+    inside a thread: either the widget's own thread or, if the widget is
+    started with a scheduler, the scheduler's thread shared by many widgets.
+
+    Widgets are updated whenever the state of their calendar may have changed,
+    see WidgetMixin. Widgets that read their calendar through the state
+    property rather than querying it directly opt into sharing one evaluation
+    of the calendar per change of state with all other widgets of an
+    Application.
     """
     daemon = True
-    mins_between_updates = 120
 
     def __init__(self, calendar, label=None):
         self._label = label
         self._calendar = calendar
+        self._shared_state = None
         self._running = Event()
+        # set to cut short the wait between updates
+        self._wakeup = Event()
         super().__init__(target=self._refresh, daemon=BaseWidget.daemon)
         _LOGGER.info(
             "Instantiated %s daemon widget %r",
             ("" if BaseWidget.daemon else "non"),
             self)
 
-    @property
-    def label(self):
-        """Retrieve the label of the widget"""
-        return self._label
-
     @property
     def running(self):
         """Retrieve the status of the widget's thread of activity"""
         return self._running.is_set()
 
-    def start(self):
-        """Start the widget's thread of activity"""
+    def start(self, scheduler=None):
+        """
+        Start the widget's thread of activity
+
+        keyword arguments:
+        scheduler -- a Scheduler to run updates on instead of a thread owned by
+            the widget
+        """
         if not self.running:
             _LOGGER.info("Starting widget %r...", self)
+            self._wakeup.clear()
             self._running.set()
-            super().start()
+            if scheduler is None:
+                super().start()
+            else:
+                scheduler.add(self)
             _LOGGER.info("Widget %r has started", self)
         else:
             _LOGGER.info("Widget %r already running", self)
 
     def stop(self):
-        """Stop the widget's thread of activity"""
+        """
+        Stop the widget's thread of activity. A thread waiting for its next
+        update finishes straight away; one in the middle of an update finishes
+        once the update returns.
+        """
         if self.running:
             _LOGGER.info("Stopping widget %r...", self)
             self._running.clear()
+            self._wakeup.set()
         else:
             _LOGGER.info("Widget %r is not running", self)
 
@@ -65,6 +146,73 @@ class BaseWidget(ABC, Thread):
 
     def _refresh(self):
         while self.running:
-            self.update()
-            sleep(60 * BaseWidget.mins_between_updates)
+            with metrics.timer("widget.update.%s" % type(self).__name__):
+                self.update()
+            metrics.first_update()
+            self._wakeup.wait(self.seconds_until_update())
         _LOGGER.info("Widget %r has stopped", self)
+
+
+class AsyncBaseWidget(WidgetMixin, ABC):
+    """
+    The interface for widgets whose update is a coroutine, eg. because it
+    talks to a display over a socket. They run on an event loop, see
+    Application.run_async, rather than in a thread. Like BaseWidget, they're
+    updated whenever the state of their calendar may have changed.
+    """
+
+    def __init__(self, calendar, label=None):
+        self._label = label
+        self._calendar = calendar
+        self._shared_state = None
+        self._running = Event()
+        _LOGGER.info("Instantiated async widget %r", self)
+
+    @property
+    def running(self):
+        """Retrieve the status of the widget's activity"""
+        return self._running.is_set()
+
+    def start(self, scheduler=None):
+        """
+        Start the widget's activity
+
+        keyword arguments:
+        scheduler -- an AsyncScheduler to run updates on
+        """
+        if scheduler is None:
+            raise TypeError("Async widgets must be started on a scheduler")
+        if not self.running:
+            _LOGGER.info("Starting widget %r...", self)
+            self._running.set()
+            scheduler.add(self)
+            _LOGGER.info("Widget %r has started", self)
+        else:
+            _LOGGER.info("Widget %r already running", self)
+
+    def stop(self):
+        """Stop the widget's activity"""
+        if self.running:
+            _LOGGER.info("Stopping widget %r...", self)
+            self._running.clear()
+        else:
+            _LOGGER.info("Widget %r is not running", self)
+
+    @abstractmethod
+    async def update(self):
+        """Update the information displayed by the widget."""
+
+    def __repr__(self):
+        return "<%s: label=%s>" % (self.__class__.__name__, self.label)
+
+
+class CalendarPublisher(BaseWidget):
+    """
+    A widget that publishes changes in its calendar to the calendar's
+    subscribers (see Calendar.subscribe) each time the calendar's state may
+    have changed. Run one alongside widgets that subscribe to the calendar
+    rather than redrawing on every update.
+    """
+    def update(self):
+        """Notify subscribers of changes to the calendar"""
+        self._calendar.publish()
@@ -1,8 +1,17 @@
+import asyncio
+import datetime
+import threading
+import time
 from unittest import TestCase
 from unittest.mock import Mock
 
+from sleepcounter.core import metrics
 from sleepcounter.core.application import Application
 from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.clock import VirtualClock
+from sleepcounter.core.time.event import Anniversary
+from sleepcounter.core.time.state import calendar_state
+from sleepcounter.core.widget import AsyncBaseWidget, BaseWidget
 
 
 class ApplicationBasicTests(TestCase):
@@ -19,3 +28,220 @@ class ApplicationBasicTests(TestCase):
     def test_appliction_stops_widgets(self):
         self.app.stop()
         self.mock_widget.stop.assert_called()
+
+
+class ApplicationThreadingTests(TestCase):
+
+    def test_widgets_are_started_on_shared_scheduler(self):
+        widgets = [Mock(), Mock()]
+        app = Application(widgets)
+        app.start()
+        try:
+            schedulers = {
+                widget.start.call_args.kwargs["scheduler"]
+                for widget in widgets}
+            self.assertEqual(1, len(schedulers))
+        finally:
+            app.stop()
+
+    def test_thread_per_widget_is_opt_in(self):
+        widget = Mock()
+        app = Application([widget], threaded=True)
+        app.start()
+        widget.start.assert_called_with()
+        app.stop()
+        widget.stop.assert_called()
+
+
+class ApplicationAsyncTests(TestCase):
+
+    def test_async_and_sync_widgets_share_event_loop(self):
+        class AsyncWidget(AsyncBaseWidget):
+            mins_between_updates = 0.01 / 60
+            updates = 0
+
+            async def update(self):
+                self.updates += 1
+                await asyncio.sleep(0)
+
+        class SyncWidget(BaseWidget):
+            thread = None
+
+            def update(self):
+                self.thread = threading.current_thread()
+
+        async_widget = AsyncWidget(Mock())
+        sync_widget = SyncWidget(Calendar())
+        app = Application([async_widget, sync_widget])
+
+        async def run():
+            task = asyncio.ensure_future(app.run_async())
+            await asyncio.sleep(0.1)
+            app.stop()
+            await asyncio.wait_for(task, 1)
+
+        asyncio.run(run())
+        self.assertGreater(async_widget.updates, 2)
+        self.assertIsNotNone(sync_widget.thread)
+        self.assertIsNot(threading.current_thread(), sync_widget.thread)
+        self.assertFalse(async_widget.running)
+        self.assertFalse(sync_widget.running)
+        self.assertFalse(sync_widget.is_alive())
+
+
+class ApplicationSharedStateTests(TestCase):
+
+    def setUp(self):
+        self.sink = metrics.enable()
+        self.addCleanup(metrics.disable)
+        self.clock = VirtualClock(datetime.datetime(2018, 10, 30, 12))
+        self.calendar = Calendar(
+            [Anniversary(name='Halloween', month=10, day=31)],
+            clock=self.clock)
+
+    def test_widgets_share_one_evaluation_per_tick(self):
+        class StateWidget(BaseWidget):
+            mins_between_updates = 0.01 / 60
+
+            def __init__(self, calendar):
+                super().__init__(calendar)
+                self.states = []
+                self.updated = threading.Event()
+
+            def update(self):
+                self.states.append(self.state)
+                self.updated.set()
+
+        widgets = [StateWidget(self.calendar) for _ in range(20)]
+        app = Application(widgets)
+        app.start()
+        try:
+            for widget in widgets:
+                self.assertTrue(widget.updated.wait(1))
+            self.clock.advance(datetime.timedelta(days=1))
+            for widget in widgets:
+                widget.updated.clear()
+            for widget in widgets:
+                self.assertTrue(widget.updated.wait(1))
+        finally:
+            app.stop()
+        counters = self.sink.stats()['counters']
+        self.assertEqual(2, counters['state.shared_miss'])
+        self.assertGreaterEqual(
+            counters['state.shared_hit'], 2 * len(widgets) - 2)
+        self.assertEqual(1, widgets[0].states[0].sleeps_to_next_event)
+        self.assertEqual(0, widgets[0].states[-1].sleeps_to_next_event)
+        self.assertIsNone(widgets[0].shared_state)
+
+    def test_state_follows_changes_to_events(self):
+        class StateWidget(BaseWidget):
+            def update(self):
+                pass
+
+        widget = StateWidget(self.calendar)
+        app = Application([widget])
+        app.start()
+        try:
+            self.assertEqual(1, len(widget.state.events))
+            self.calendar.add_event(
+                Anniversary(name='Bonfire Night', month=11, day=5))
+            self.assertEqual(2, len(widget.state.events))
+        finally:
+            app.stop()
+        # changes are found from the calendar's version, not by subscribing
+        self.assertFalse(self.calendar._publisher)
+
+    def test_shared_state_is_taken_when_read(self):
+        class StateWidget(BaseWidget):
+            def update(self):
+                pass
+
+        widget = StateWidget(self.calendar)
+        app = Application([widget])
+        app.start()
+        try:
+            widget.state
+            self.clock.advance(datetime.timedelta(hours=5))
+            state = widget.state
+        finally:
+            app.stop()
+        self.assertEqual(self.clock.now(), state.now)
+        self.assertEqual(
+            calendar_state(self.calendar).seconds_to_next_event,
+            state.seconds_to_next_event)
+        self.assertEqual(1, self.sink.stats()['counters']['state.shared_miss'])
+
+    def test_widget_state_without_application(self):
+        class StateWidget(BaseWidget):
+            def update(self):
+                pass
+
+        widget = StateWidget(self.calendar)
+        self.assertIsNone(widget.shared_state)
+        self.assertEqual(1, widget.state.sleeps_to_next_event)
+
+
+class ApplicationStopTests(TestCase):
+
+    class HangingWidget(BaseWidget):
+
+        def __init__(self, calendar):
+            super().__init__(calendar)
+            self.updated = threading.Event()
+            self.release = threading.Event()
+
+        def update(self):
+            self.updated.set()
+            self.release.wait(5)
+
+    def test_stop_reports_stragglers(self):
+        for threaded in (False, True):
+            widget = self.HangingWidget(Calendar())
+            self.addCleanup(widget.release.set)
+            app = Application([widget], threaded=threaded)
+            app.start()
+            self.assertTrue(widget.updated.wait(1))
+            start = time.monotonic()
+            self.assertEqual([widget], app.stop(timeout=0.1))
+            self.assertLess(time.monotonic() - start, 1)
+
+    def test_threaded_widgets_cannot_time_out(self):
+        with self.assertRaises(ValueError):
+            Application([], threaded=True, update_timeout=1)
+
+    def test_stop_without_stragglers(self):
+        class Widget(BaseWidget):
+            mins_between_updates = 120
+
+            def update(self):
+                pass
+
+        widgets = [Widget(Calendar()) for _ in range(3)]
+        app = Application(widgets, threaded=True)
+        app.start()
+        self.assertEqual([], app.stop(timeout=1))
+        self.assertFalse(any(widget.is_alive() for widget in widgets))
+
+    def test_hung_coroutine_update_is_cancelled(self):
+        class AsyncWidget(AsyncBaseWidget):
+            mins_between_updates = 0.01 / 60
+            updates = 0
+
+            async def update(self):
+                self.updates += 1
+                await asyncio.sleep(10)
+
+        widget = AsyncWidget(Mock())
+        app = Application([widget], update_timeout=0.02)
+        sink = metrics.enable()
+        self.addCleanup(metrics.disable)
+
+        async def run():
+            task = asyncio.ensure_future(app.run_async())
+            await asyncio.sleep(0.1)
+            app.stop()
+            await asyncio.wait_for(task, 1)
+
+        asyncio.run(run())
+        self.assertEqual(1, widget.updates)
+        self.assertEqual(1, sink.stats()['counters']['widget.hung'])
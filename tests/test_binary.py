@@ -0,0 +1,85 @@
+import datetime
+import os
+import random
+import tempfile
+import unittest
+
+from sleepcounter.core.mocks import mock_datetime, random_events
+from sleepcounter.core.time.binary import MappedCalendar, write_calendar
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.event import SpecialDay, Anniversary
+
+
+class MappedCalendarTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "diary.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_matches_calendar(self):
+        events = random_events(200)
+        write_calendar(self.path, events)
+        calendar = Calendar(list(events))
+        rand = random.Random(1)
+        with MappedCalendar(self.path) as mapped:
+            self.assertEqual(200, len(mapped))
+            for _ in range(50):
+                now = datetime.datetime(2018, 1, 1) + datetime.timedelta(
+                    minutes=rand.randint(0, 2 * 365 * 24 * 60))
+                with mock_datetime(target=now):
+                    self.assertEqual(calendar.events, mapped.events)
+                    self.assertEqual(calendar.next_event, mapped.next_event)
+                    self.assertEqual(
+                        calendar.sleeps_to_next_event,
+                        mapped.sleeps_to_next_event)
+                    self.assertEqual(
+                        calendar.todays_event, mapped.todays_event)
+                    self.assertEqual(
+                        calendar.special_day_today, mapped.special_day_today)
+                    self.assertEqual(
+                        calendar.upcoming(10), mapped.upcoming(10))
+                start = now.date()
+                end = start + datetime.timedelta(days=rand.randint(0, 400))
+                self.assertEqual(
+                    calendar.events_between(start, end),
+                    mapped.events_between(start, end))
+
+    def test_round_trip_of_event_fields(self):
+        events = [
+            Anniversary(name='Hallöween', month=10, day=31, sleeps=20),
+            SpecialDay(name='Legoland', year=2019, month=4, day=27),
+        ]
+        write_calendar(self.path, events)
+        with MappedCalendar(self.path) as mapped:
+            self.assertEqual(events, [mapped.event(0), mapped.event(1)])
+            self.assertIs(mapped.event(0), mapped.event(0))
+
+    def test_events_between(self):
+        halloween = Anniversary(name='Halloween', month=10, day=31)
+        legoland = SpecialDay(name='Legoland', year=2019, month=4, day=27)
+        bonfire = Anniversary(name='Bonfire Night', month=11, day=5)
+        write_calendar(self.path, [halloween, legoland, bonfire])
+        with MappedCalendar(self.path) as mapped:
+            self.assertEqual(
+                [halloween, bonfire, legoland],
+                mapped.events_between(
+                    datetime.date(2018, 10, 1), datetime.date(2019, 4, 30)))
+            self.assertEqual(
+                [],
+                mapped.events_between(
+                    datetime.date(2018, 4, 1), datetime.date(2018, 4, 30)))
+
+    def test_read_only(self):
+        write_calendar(self.path, [])
+        with MappedCalendar(self.path) as mapped:
+            with self.assertRaises(TypeError):
+                mapped.add_event(Anniversary(name='foo', month=1, day=1))
+
+    def test_not_a_calendar_file(self):
+        with open(self.path, "wb") as stream:
+            stream.write(b"nonsense" * 4)
+        with self.assertRaises(ValueError):
+            MappedCalendar(self.path)
@@ -0,0 +1,109 @@
+import datetime
+import unittest
+from unittest import mock
+
+from sleepcounter.core.time.bedtime import Schedule, SleepChecker
+from sleepcounter.core.time.cache import PeriodCache
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.clock import VirtualClock
+
+
+class SleepCheckerPeriodTests(unittest.TestCase):
+
+    def test_period_before_wake_up(self):
+        self.assertEqual(
+            (datetime.datetime(2018, 10, 30, 19, 0, 0, 1),
+             datetime.datetime(2018, 10, 31, 6, 30)),
+            SleepChecker.period(datetime.datetime(2018, 10, 31, 5)))
+
+    def test_period_during_day(self):
+        self.assertEqual(
+            (datetime.datetime(2018, 10, 31, 6, 30),
+             datetime.datetime(2018, 10, 31, 19, 0, 0, 1)),
+            SleepChecker.period(datetime.datetime(2018, 10, 31, 19)))
+
+    def test_period_after_bedtime(self):
+        self.assertEqual(
+            (datetime.datetime(2018, 10, 31, 19, 0, 0, 1),
+             datetime.datetime(2018, 11, 1, 6, 30)),
+            SleepChecker.period(datetime.datetime(2018, 10, 31, 23)))
+
+    def test_assigned_bedtime(self):
+        now = datetime.datetime(2018, 10, 31, 20)
+        self.assertTrue(SleepChecker.is_nighttime(now))
+        with mock.patch.object(SleepChecker, 'BEDTIME', datetime.time(21)):
+            self.assertFalse(SleepChecker.is_nighttime(now))
+            self.assertFalse(Calendar(clock=VirtualClock(now)).is_nighttime)
+            self.assertEqual(
+                datetime.datetime(2018, 10, 31, 21, 0, 0, 1),
+                SleepChecker.period(now)[1])
+
+
+class ScheduleTests(unittest.TestCase):
+
+    def setUp(self):
+        self.schedule = Schedule(
+            wake_up_time=datetime.time(7), bedtime=datetime.time(20, 30))
+
+    def test_is_nighttime(self):
+        self.assertTrue(
+            self.schedule.is_nighttime(datetime.datetime(2018, 10, 31, 6, 45)))
+        self.assertFalse(
+            self.schedule.is_nighttime(datetime.datetime(2018, 10, 31, 20)))
+        self.assertFalse(
+            self.schedule.is_nighttime(datetime.datetime(2018, 10, 31, 20, 30)))
+
+    def test_period(self):
+        self.assertEqual(
+            (datetime.datetime(2018, 10, 31, 7),
+             datetime.datetime(2018, 10, 31, 20, 30, 0, 1)),
+            self.schedule.period(datetime.datetime(2018, 10, 31, 19)))
+
+    def test_default_schedule(self):
+        self.assertEqual(
+            Schedule(SleepChecker.WAKE_UP_TIME, SleepChecker.BEDTIME),
+            Schedule())
+
+    def test_timezone(self):
+        schedule = Schedule(
+            timezone=datetime.timezone(datetime.timedelta(hours=2)))
+        now = datetime.datetime(
+            2018, 10, 31, 5, tzinfo=datetime.timezone.utc)
+        local = schedule.local(now)
+        self.assertEqual(datetime.datetime(2018, 10, 31, 7), local)
+        self.assertEqual(now, schedule.from_local(local, now))
+
+    def test_wake_up_after_bedtime(self):
+        with self.assertRaises(ValueError):
+            Schedule(wake_up_time=datetime.time(20), bedtime=datetime.time(8))
+
+
+class PeriodCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = PeriodCache()
+        self.calls = []
+
+    def compute(self, now):
+        self.calls.append(now)
+        return len(self.calls)
+
+    def test_value_is_cached_within_period(self):
+        morning = datetime.datetime(2018, 10, 31, 7)
+        evening = datetime.datetime(2018, 10, 31, 18)
+        self.assertEqual(1, self.cache.get("foo", morning, self.compute))
+        self.assertEqual(1, self.cache.get("foo", evening, self.compute))
+        self.assertEqual(1, self.cache.stats.hits)
+        self.assertEqual(1, self.cache.stats.misses)
+
+    def test_value_is_recomputed_in_next_period(self):
+        self.cache.get("foo", datetime.datetime(2018, 10, 31, 7), self.compute)
+        self.assertEqual(2, self.cache.get(
+            "foo", datetime.datetime(2018, 10, 31, 20), self.compute))
+        self.assertEqual(2, self.cache.stats.misses)
+
+    def test_clear(self):
+        now = datetime.datetime(2018, 10, 31, 7)
+        self.cache.get("foo", now, self.compute)
+        self.cache.clear()
+        self.assertEqual(2, self.cache.get("foo", now, self.compute))
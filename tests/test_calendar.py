@@ -2,11 +2,14 @@ import datetime
 import logging
 from unittest import mock
 from sys import stdout
+import threading
 import unittest
 
 from sleepcounter.core.mocks import mock_datetime
+from sleepcounter.core.time.bedtime import Schedule
 from sleepcounter.core.time.calendar import Calendar
-from sleepcounter.core.time.event import SpecialDay, Anniversary
+from sleepcounter.core.time.clock import VirtualClock
+from sleepcounter.core.time.event import SpecialDay, Anniversary, EventBase
 
 logging.basicConfig(
     format='%(asctime)s[%(name)s]:%(levelname)s:%(message)s',
@@ -41,6 +44,14 @@ class CalendarDateKeeping(unittest.TestCase):
         with mock_datetime(target=today):
             self.assertEqual(2, calendar.sleeps_to_event(xmas))
 
+    def test_time_to_event_on_the_class(self):
+        today = datetime.datetime(2018, 12, 23, 6, 30)
+        with mock_datetime(target=today):
+            self.assertEqual(2, Calendar.sleeps_to_event(CHRISTMAS))
+            self.assertEqual(
+                CHRISTMAS.seconds_remaining,
+                Calendar.seconds_to_event(CHRISTMAS))
+
     def test_sleeps_to_xmas_too_many_sleeps(self):
         # Events may have a configurable number of sleeps to count when passed
         # the (optional) sleeps kwarg on addition to the the calendar. Test that
@@ -202,3 +213,511 @@ class CalendarDateKeeping(unittest.TestCase):
         calendar = create_calendar()
         with mock_datetime(target=today):
             self.assertFalse(calendar.is_nighttime)
+
+
+class CalendarNextEventIndex(unittest.TestCase):
+
+    @staticmethod
+    def _scan_next_event(calendar):
+        deltas = {ev: ev.seconds_remaining for ev in calendar.events}
+        return min(deltas, key=deltas.get)
+
+    def test_next_event_matches_scan_as_time_moves_forward(self):
+        calendar = Calendar([
+            Anniversary(name='a', month=1, day=10, sleeps=5),
+            Anniversary(name='b', month=1, day=12),
+            SpecialDay(name='c', year=2019, month=1, day=11, sleeps=3),
+            SpecialDay(name='d', year=2019, month=1, day=12),
+            Anniversary(name='e', month=2, day=1, sleeps=1),
+        ])
+        start = datetime.datetime(year=2019, month=1, day=5)
+        for hours in range(0, 24 * 40, 5):
+            now = start + datetime.timedelta(hours=hours, minutes=30)
+            with mock_datetime(target=now):
+                expected = self._scan_next_event(calendar)
+                self.assertIs(expected, calendar.next_event, now)
+                self.assertEqual(
+                    expected.seconds_remaining,
+                    calendar.seconds_to_next_event)
+                self.assertEqual(
+                    expected.sleeps_remaining,
+                    calendar.sleeps_to_next_event)
+
+    def test_next_event_after_clock_goes_back(self):
+        calendar = create_calendar()
+        with mock_datetime(target=datetime.datetime(2018, 11, 1, 12)):
+            self.assertEqual(BONFIRE_NIGHT, calendar.next_event)
+        with mock_datetime(target=datetime.datetime(2018, 10, 1, 12)):
+            self.assertEqual(HALLOWEEN, calendar.next_event)
+
+    def test_added_event_is_indexed(self):
+        calendar = create_calendar()
+        with mock_datetime(target=datetime.datetime(2018, 10, 1, 12)):
+            self.assertEqual(HALLOWEEN, calendar.next_event)
+            foo = SpecialDay(name='foo', year=2018, month=10, day=2)
+            calendar.add_event(foo)
+            self.assertEqual(foo, calendar.next_event)
+
+    def test_next_event_with_no_active_events(self):
+        calendar = Calendar([SpecialDay(name='foo', year=2018, month=1, day=1)])
+        with mock_datetime(target=datetime.datetime(2018, 10, 1, 12)):
+            with self.assertRaises(ValueError):
+                calendar.next_event
+
+    def test_concurrent_readers(self):
+        events = []
+        for seq in range(600):
+            date = datetime.date(2019, 1, 1) + datetime.timedelta(days=seq)
+            if seq % 2:
+                events.append(Anniversary(
+                    name=str(seq), month=date.month, day=date.day, sleeps=3))
+            else:
+                events.append(SpecialDay(
+                    name=str(seq), year=date.year, month=date.month,
+                    day=date.day, sleeps=10))
+        start = datetime.datetime(2019, 1, 1, 12)
+        times = [
+            start + datetime.timedelta(hours=7 * step) for step in range(300)]
+        expected = [
+            Calendar(events).upcoming(3, now) for now in times]
+        calendar = Calendar(events)
+        wrong = []
+
+        def read(offset):
+            # each reader moves forward in time, a little out of step
+            for position in range(offset, len(times)):
+                if calendar.upcoming(3, times[position]) != \
+                        expected[position]:
+                    wrong.append(times[position])
+
+        readers = [
+            threading.Thread(target=read, args=(offset,))
+            for offset in range(6)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        self.assertEqual([], wrong)
+
+
+class CalendarSnapshotTests(unittest.TestCase):
+
+    def test_snapshot_matches_calendar(self):
+        calendar = create_calendar()
+        for today in (
+                datetime.datetime(2018, 10, 14, 23, 1),
+                datetime.datetime(2018, 10, 31, 5, 0),
+                datetime.datetime(2018, 10, 31, 8, 0),
+                datetime.datetime(2018, 11, 5, 12, 0)):
+            with mock_datetime(target=today):
+                snapshot = calendar.snapshot()
+                self.assertEqual(today, snapshot.now)
+                self.assertEqual(calendar.events, list(snapshot.events))
+                self.assertEqual(calendar.next_event, snapshot.next_event)
+                self.assertEqual(
+                    calendar.sleeps_to_next_event,
+                    snapshot.sleeps_to_next_event)
+                self.assertEqual(
+                    calendar.seconds_to_next_event,
+                    snapshot.seconds_to_next_event)
+                self.assertEqual(calendar.todays_event, snapshot.todays_event)
+                self.assertEqual(
+                    calendar.special_day_today, snapshot.special_day_today)
+                self.assertEqual(calendar.is_nighttime, snapshot.is_nighttime)
+
+    def test_snapshot_at_explicit_time(self):
+        calendar = create_calendar()
+        snapshot = calendar.snapshot(datetime.datetime(2018, 10, 31, 8, 0))
+        self.assertEqual(HALLOWEEN, snapshot.todays_event)
+        self.assertTrue(snapshot.special_day_today)
+        self.assertFalse(snapshot.is_nighttime)
+
+    def test_snapshot_is_immutable(self):
+        snapshot = create_calendar().snapshot(datetime.datetime(2018, 10, 1))
+        with self.assertRaises(AttributeError):
+            snapshot.next_event = CHRISTMAS
+
+    def test_snapshot_without_active_events(self):
+        snapshot = Calendar().snapshot(datetime.datetime(2018, 10, 1, 12))
+        self.assertIsNone(snapshot.next_event)
+        self.assertIsNone(snapshot.sleeps_to_next_event)
+        self.assertEqual((), snapshot.events)
+
+
+class CalendarDateIndex(unittest.TestCase):
+
+    def test_first_added_event_is_todays_event(self):
+        foo = SpecialDay(name='foo', year=2018, month=10, day=31)
+        calendar = create_calendar().add_event(foo)
+        with mock_datetime(target=datetime.datetime(2018, 10, 31, 8)):
+            self.assertEqual(HALLOWEEN, calendar.todays_event)
+        calendar.events = [foo, HALLOWEEN]
+        with mock_datetime(target=datetime.datetime(2018, 10, 31, 8)):
+            self.assertEqual(foo, calendar.todays_event)
+
+    def test_special_day_is_not_today_in_another_year(self):
+        foo = SpecialDay(name='foo', year=2018, month=10, day=30)
+        calendar = Calendar().add_event(foo)
+        with mock_datetime(target=datetime.datetime(2018, 10, 30, 8)):
+            self.assertEqual(foo, calendar.todays_event)
+        with mock_datetime(target=datetime.datetime(2019, 10, 30, 8)):
+            self.assertIsNone(calendar.todays_event)
+
+    def test_get_event_by_date(self):
+        foo = SpecialDay(name='foo', year=2018, month=10, day=30)
+        calendar = create_calendar().add_event(foo)
+        with mock_datetime(target=datetime.datetime(2018, 10, 1, 8)):
+            self.assertEqual(
+                foo, calendar._get_event(datetime.date(2018, 10, 30)))
+            self.assertEqual(
+                HALLOWEEN, calendar._get_event(datetime.date(2018, 10, 31)))
+            self.assertIsNone(calendar._get_event(datetime.date(2019, 10, 31)))
+            self.assertIsNone(calendar._get_event(datetime.date(2018, 10, 29)))
+
+
+class CalendarCacheTests(unittest.TestCase):
+
+    def test_repeated_queries_hit_cache(self):
+        calendar = create_calendar()
+        with mock_datetime(target=datetime.datetime(2018, 10, 14, 8)):
+            self.assertEqual(HALLOWEEN, calendar.next_event)
+        misses = calendar.cache_stats.misses
+        with mock_datetime(target=datetime.datetime(2018, 10, 14, 12)):
+            self.assertEqual(HALLOWEEN, calendar.next_event)
+            self.assertEqual(17, calendar.sleeps_to_next_event)
+        self.assertEqual(misses, calendar.cache_stats.misses)
+        self.assertEqual(2, calendar.cache_stats.hits)
+
+    def test_cache_is_invalidated_at_wake_up_time(self):
+        calendar = create_calendar()
+        with mock_datetime(target=datetime.datetime(2018, 10, 31, 6, 29)):
+            self.assertIsNone(calendar.todays_event)
+        with mock_datetime(target=datetime.datetime(2018, 10, 31, 6, 30)):
+            self.assertEqual(HALLOWEEN, calendar.todays_event)
+
+    def test_cache_is_invalidated_by_new_events(self):
+        calendar = create_calendar()
+        foo = SpecialDay(name='foo', year=2018, month=10, day=20)
+        with mock_datetime(target=datetime.datetime(2018, 10, 14, 8)):
+            self.assertEqual(HALLOWEEN, calendar.next_event)
+            calendar.add_event(foo)
+            self.assertEqual(foo, calendar.next_event)
+
+
+class CalendarSubscriptionTests(unittest.TestCase):
+
+    def test_subscribers_are_notified_of_changes_only(self):
+        calendar = create_calendar()
+        sleeps, nights = [], []
+        calendar.subscribe('sleeps_to_next_event', sleeps.append)
+        calendar.subscribe('is_nighttime', nights.append)
+        calendar.publish(datetime.datetime(2018, 10, 29, 8))
+        calendar.publish(datetime.datetime(2018, 10, 29, 12))
+        calendar.publish(datetime.datetime(2018, 10, 29, 20))
+        calendar.publish(datetime.datetime(2018, 10, 30, 8))
+        self.assertEqual([2, 1], sleeps)
+        self.assertEqual([False, True, False], nights)
+
+    def test_new_subscriber_hears_current_value(self):
+        calendar = create_calendar()
+        first, second = [], []
+        calendar.subscribe('next_event', first.append)
+        calendar.publish(datetime.datetime(2018, 10, 29, 8))
+        calendar.subscribe('next_event', second.append)
+        calendar.publish(datetime.datetime(2018, 10, 29, 9))
+        self.assertEqual([HALLOWEEN], first)
+        self.assertEqual([HALLOWEEN], second)
+
+    def test_values_changing_to_none(self):
+        calendar = create_calendar().add_event(CHRISTMAS)
+        values = []
+        calendar.subscribe('todays_event', values.append)
+        calendar.publish(datetime.datetime(2018, 12, 25, 12))
+        calendar.publish(datetime.datetime(2018, 12, 25, 21))
+        calendar.publish(datetime.datetime(2018, 12, 26, 8))
+        self.assertEqual([CHRISTMAS, None], values)
+
+    def test_cancelled_subscription(self):
+        calendar = create_calendar()
+        values = []
+        subscription = calendar.subscribe('todays_event', values.append)
+        subscription.cancel()
+        calendar.publish(datetime.datetime(2018, 10, 31, 8))
+        self.assertEqual([], values)
+
+    def test_adding_events_publishes_changes(self):
+        calendar = create_calendar()
+        foo = SpecialDay(name='foo', year=2018, month=10, day=20)
+        values = []
+        calendar.subscribe('next_event', values.append)
+        with mock_datetime(target=datetime.datetime(2018, 10, 14, 8)):
+            calendar.publish()
+            calendar.add_event(foo)
+        self.assertEqual([HALLOWEEN, foo], values)
+
+    def test_changes_only_evaluate_subscribed_values(self):
+        calendar = create_calendar()
+        values = []
+        calendar.subscribe('next_event', values.append)
+        foo = SpecialDay(name='foo', year=2018, month=10, day=20)
+        with mock_datetime(target=datetime.datetime(2018, 10, 14, 8)), \
+                mock.patch.object(calendar, '_active_events') as scan:
+            calendar.add_event(foo)
+        scan.assert_not_called()
+        self.assertEqual([foo], values)
+
+    def test_version_follows_changes_to_events(self):
+        calendar = create_calendar()
+        version = calendar.version
+        foo = SpecialDay(name='foo', year=2018, month=10, day=20)
+        calendar.add_event(foo)
+        calendar.remove_event(foo)
+        self.assertEqual(version + 2, calendar.version)
+        with mock_datetime(target=datetime.datetime(2018, 10, 14, 8)):
+            calendar.next_event
+        self.assertEqual(version + 2, calendar.version)
+
+    def test_unknown_value(self):
+        with self.assertRaises(ValueError):
+            Calendar().subscribe('foo', print)
+
+
+class CalendarTimelineTests(unittest.TestCase):
+
+    def test_timeline_matches_snapshots(self):
+        calendar = Calendar([
+            Anniversary(name='a', month=1, day=10, sleeps=5),
+            Anniversary(name='b', month=1, day=12),
+            SpecialDay(name='c', year=2019, month=1, day=11, sleeps=3),
+            SpecialDay(name='d', year=2019, month=1, day=12),
+            Anniversary(name='e', month=2, day=1, sleeps=1),
+            Anniversary(name='f', month=1, day=12, sleeps=400),
+        ])
+        start = datetime.date(2018, 12, 1)
+        end = datetime.date(2020, 2, 1)
+        days = list(calendar.timeline(start, end))
+        self.assertEqual((end - start).days + 1, len(days))
+        for day in days:
+            snapshot = calendar.snapshot(datetime.datetime.combine(
+                day.date, datetime.time(6, 30)))
+            self.assertEqual(snapshot.events, day.events, day.date)
+            self.assertIs(snapshot.next_event, day.next_event, day.date)
+            self.assertEqual(
+                snapshot.sleeps_to_next_event, day.sleeps_to_next_event)
+            self.assertIs(snapshot.todays_event, day.todays_event, day.date)
+
+    def test_timeline_without_active_events(self):
+        calendar = Calendar([SpecialDay(name='foo', year=2018, month=1, day=1)])
+        day, = calendar.timeline(
+            datetime.date(2018, 1, 2), datetime.date(2018, 1, 2))
+        self.assertEqual((), day.events)
+        self.assertIsNone(day.next_event)
+        self.assertIsNone(day.sleeps_to_next_event)
+        self.assertIsNone(day.todays_event)
+
+    def test_timeline_of_custom_events(self):
+        class Deadline(EventBase):
+            year = 2019
+            date = datetime.date(2019, 1, 11)
+
+        deadline = Deadline(name='deadline', month=1, day=11, sleeps=3)
+        calendar = Calendar([deadline])
+        days = list(calendar.timeline(
+            datetime.date(2019, 1, 7), datetime.date(2019, 1, 12)))
+        self.assertEqual(
+            [None, 3, 2, 1, 0, None],
+            [day.sleeps_to_next_event for day in days])
+        self.assertIs(deadline, days[4].todays_event)
+
+
+class CalendarRangeQueryTests(unittest.TestCase):
+
+    def test_upcoming_events(self):
+        legoland = SpecialDay(name='Legoland', year=2018, month=11, day=1)
+        calendar = create_calendar().add_event(CHRISTMAS).add_event(legoland)
+        now = datetime.datetime(2018, 10, 14, 12)
+        self.assertEqual(
+            [HALLOWEEN, legoland, BONFIRE_NIGHT], calendar.upcoming(3, now))
+        self.assertEqual(4, len(calendar.upcoming(10, now)))
+        self.assertEqual([], calendar.upcoming(0, now))
+        with mock_datetime(target=now):
+            self.assertEqual(calendar.next_event, calendar.upcoming(1)[0])
+
+    def test_upcoming_respects_sleeps(self):
+        counting = Anniversary(name='counting', month=10, day=20, sleeps=3)
+        calendar = Calendar([counting, HALLOWEEN])
+        self.assertEqual(
+            [HALLOWEEN],
+            calendar.upcoming(2, datetime.datetime(2018, 10, 14, 12)))
+        self.assertEqual(
+            [counting, HALLOWEEN],
+            calendar.upcoming(2, datetime.datetime(2018, 10, 17, 12)))
+
+    def test_events_between(self):
+        legoland = SpecialDay(name='Legoland', year=2019, month=4, day=27)
+        calendar = create_calendar().add_event(legoland)
+        self.assertEqual(
+            [HALLOWEEN, BONFIRE_NIGHT, legoland],
+            calendar.events_between(
+                datetime.date(2018, 10, 1), datetime.date(2019, 4, 30)))
+        self.assertEqual(
+            [HALLOWEEN, BONFIRE_NIGHT, legoland, HALLOWEEN],
+            calendar.events_between(
+                datetime.date(2018, 10, 31), datetime.date(2019, 10, 31)))
+        self.assertEqual(
+            [],
+            calendar.events_between(
+                datetime.date(2018, 4, 1), datetime.date(2018, 4, 30)))
+
+
+class CalendarScheduleTests(unittest.TestCase):
+
+    def test_calendar_keeps_its_own_bedtime(self):
+        schedule = Schedule(
+            wake_up_time=datetime.time(7), bedtime=datetime.time(20))
+        late_risers = Calendar([HALLOWEEN], schedule=schedule)
+        early_risers = Calendar([HALLOWEEN])
+        with mock_datetime(target=datetime.datetime(2018, 10, 30, 6, 45)):
+            self.assertEqual(2, late_risers.sleeps_to_next_event)
+            self.assertEqual(1, early_risers.sleeps_to_next_event)
+        with mock_datetime(target=datetime.datetime(2018, 10, 31, 6, 45)):
+            self.assertIsNone(late_risers.todays_event)
+            self.assertEqual(HALLOWEEN, early_risers.todays_event)
+        with mock_datetime(target=datetime.datetime(2018, 10, 31, 19, 30)):
+            self.assertEqual(HALLOWEEN, late_risers.todays_event)
+            self.assertFalse(late_risers.is_nighttime)
+            self.assertTrue(early_risers.is_nighttime)
+            self.assertEqual(
+                datetime.datetime(2018, 10, 31, 20, 0, 0, 1),
+                late_risers.next_change())
+
+    def test_calendar_in_another_timezone(self):
+        utc = datetime.timezone.utc
+        clock = VirtualClock(datetime.datetime(2018, 10, 31, 5, tzinfo=utc))
+        ahead = Calendar(
+            [HALLOWEEN],
+            clock=clock,
+            schedule=Schedule(
+                timezone=datetime.timezone(datetime.timedelta(hours=2))))
+        behind = Calendar(
+            [HALLOWEEN],
+            clock=clock,
+            schedule=Schedule(
+                timezone=datetime.timezone(datetime.timedelta(hours=-5))))
+        self.assertEqual(HALLOWEEN, ahead.todays_event)
+        self.assertIsNone(behind.todays_event)
+        self.assertTrue(behind.is_nighttime)
+        self.assertEqual(
+            datetime.datetime(2018, 10, 31, 17, 0, 0, 1, tzinfo=utc),
+            ahead.next_change())
+        snapshot = behind.snapshot()
+        self.assertEqual(1, snapshot.sleeps_to_next_event)
+        self.assertEqual(
+            datetime.datetime(2018, 10, 31, 11, 30, tzinfo=utc),
+            snapshot.valid_until)
+
+
+    def test_time_to_event_uses_the_calendar_clock_and_schedule(self):
+        schedule = Schedule(
+            wake_up_time=datetime.time(7), bedtime=datetime.time(20))
+        clock = VirtualClock(datetime.datetime(2018, 10, 30, 6, 45))
+        calendar = Calendar([HALLOWEEN], clock=clock, schedule=schedule)
+        self.assertEqual(
+            calendar.sleeps_to_next_event,
+            calendar.sleeps_to_event(calendar.next_event))
+        self.assertEqual(2, calendar.sleeps_to_event(HALLOWEEN))
+        self.assertEqual(
+            (24 + 0.25) * 3600, calendar.seconds_to_event(HALLOWEEN))
+
+class CalendarRemovalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(datetime.datetime(2018, 10, 14, 12))
+        self.legoland = SpecialDay(name='Legoland', year=2018, month=11, day=1)
+        self.party = SpecialDay(name='Party', year=2018, month=10, day=20)
+
+    def create_calendar(self, **kwargs):
+        return Calendar(
+            [HALLOWEEN, self.party, BONFIRE_NIGHT, self.legoland, CHRISTMAS],
+            clock=self.clock,
+            **kwargs)
+
+    def test_remove_event(self):
+        calendar = self.create_calendar()
+        self.assertEqual(self.party, calendar.next_event)
+        calendar.remove_event(self.party)
+        self.assertEqual(HALLOWEEN, calendar.next_event)
+        self.assertNotIn(self.party, calendar.events)
+        self.assertEqual(
+            [HALLOWEEN, self.legoland],
+            calendar.events_between(
+                datetime.date(2018, 10, 14), datetime.date(2018, 11, 1)))
+        self.clock.set(datetime.datetime(2018, 10, 20, 12))
+        self.assertIsNone(calendar.todays_event)
+
+    def test_remove_equal_event(self):
+        calendar = self.create_calendar()
+        calendar.remove_event(
+            SpecialDay(name='Legoland', year=2018, month=11, day=1))
+        self.assertEqual(
+            [self.party, HALLOWEEN, BONFIRE_NIGHT, CHRISTMAS],
+            calendar.upcoming(5))
+
+    def test_remove_missing_event(self):
+        calendar = self.create_calendar()
+        with self.assertRaises(ValueError):
+            calendar.remove_events([self.party, self.party])
+        # nothing was removed
+        self.assertEqual(self.party, calendar.next_event)
+
+    def test_remove_many_events(self):
+        calendar = self.create_calendar()
+        calendar.next_event
+        calendar.remove_events([self.party, HALLOWEEN, BONFIRE_NIGHT])
+        self.assertEqual(self.legoland, calendar.next_event)
+        self.assertEqual([self.legoland, CHRISTMAS], calendar.upcoming(5))
+        calendar.add_event(HALLOWEEN)
+        self.assertEqual(HALLOWEEN, calendar.next_event)
+
+    def test_remove_repeated_event(self):
+        calendar = self.create_calendar()
+        calendar.add_event(self.party)
+        calendar.remove_event(self.party)
+        self.assertEqual(self.party, calendar.next_event)
+        self.assertEqual(
+            [self.party, HALLOWEEN],
+            calendar.events_between(
+                datetime.date(2018, 10, 14), datetime.date(2018, 10, 31)))
+        calendar.remove_event(self.party)
+        self.assertEqual(HALLOWEEN, calendar.next_event)
+
+    def test_compact(self):
+        calendar = self.create_calendar()
+        self.assertEqual([], calendar.compact())
+        self.clock.set(datetime.datetime(2018, 11, 2, 12))
+        self.assertEqual([self.party, self.legoland], calendar.compact())
+        self.assertEqual(
+            [HALLOWEEN, BONFIRE_NIGHT, CHRISTMAS],
+            calendar.events_between(
+                datetime.date(2018, 10, 1), datetime.date(2018, 12, 31)))
+        self.assertEqual(BONFIRE_NIGHT, calendar.next_event)
+
+    def test_auto_compact(self):
+        calendar = self.create_calendar(auto_compact=True)
+        self.assertEqual(self.party, calendar.next_event)
+        self.clock.set(datetime.datetime(2018, 11, 2, 12))
+        self.assertEqual(BONFIRE_NIGHT, calendar.next_event)
+        self.assertEqual(
+            [HALLOWEEN, BONFIRE_NIGHT, CHRISTMAS],
+            calendar.events_between(
+                datetime.date(2018, 10, 1), datetime.date(2018, 12, 31)))
+        self.assertEqual([], calendar.compact())
+
+    def test_removal_is_published(self):
+        calendar = self.create_calendar()
+        published = []
+        calendar.subscribe('events', published.append)
+        calendar.publish()
+        calendar.remove_event(HALLOWEEN)
+        self.assertEqual(2, len(published))
+        self.assertNotIn(HALLOWEEN, published[-1])
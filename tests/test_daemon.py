@@ -0,0 +1,167 @@
+import asyncio
+import datetime
+import os
+import socket
+import tempfile
+from threading import Thread
+import unittest
+
+from sleepcounter.core import metrics
+from sleepcounter.core.daemon import CalendarClient, CalendarServer, QueryError
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.clock import VirtualClock
+from sleepcounter.core.time.event import Anniversary, SpecialDay
+
+HALLOWEEN = Anniversary(name='Halloween', month=10, day=31, sleeps=20)
+BONFIRE_NIGHT = Anniversary(name='Bonfire Night', month=11, day=5)
+
+
+class CalendarServerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(datetime.datetime(2018, 10, 30, 8))
+        self.calendar = Calendar([HALLOWEEN, BONFIRE_NIGHT], clock=self.clock)
+        self.directory = tempfile.TemporaryDirectory()
+        self.server = CalendarServer(
+            {'home': self.calendar},
+            os.path.join(self.directory.name, 'sleepcounter.sock'))
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.wait_for(self.server.start())
+        self.sink = metrics.enable()
+
+    def tearDown(self):
+        metrics.disable()
+        self.wait_for(self.server.stop())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(1)
+        self.loop.close()
+        self.directory.cleanup()
+
+    def wait_for(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(1)
+
+    def client(self, name='home'):
+        client = CalendarClient(self.server.path, name, clock=self.clock)
+        self.addCleanup(client.close)
+        return client
+
+    def test_client_answers_like_the_calendar(self):
+        client = self.client()
+        for _ in range(3):
+            self.assertEqual(self.calendar.events, client.events)
+            self.assertEqual(self.calendar.next_event, client.next_event)
+            self.assertEqual(
+                self.calendar.sleeps_to_next_event,
+                client.sleeps_to_next_event)
+            self.assertEqual(
+                self.calendar.seconds_to_next_event,
+                client.seconds_to_next_event)
+            self.assertEqual(self.calendar.todays_event, client.todays_event)
+            self.assertEqual(
+                self.calendar.special_day_today, client.special_day_today)
+            self.assertEqual(self.calendar.is_nighttime, client.is_nighttime)
+            self.assertEqual(self.calendar.next_change(), client.next_change())
+            self.clock.advance(datetime.timedelta(hours=7))
+
+    def test_client_asks_once_per_state_boundary(self):
+        client = self.client()
+        for _ in range(5):
+            client.next_event
+            client.seconds_to_next_event
+            self.clock.advance(datetime.timedelta(hours=3))
+        # once for the day and once at 20:00 for the night
+        stats = self.sink.stats()
+        self.assertEqual(2, stats['histograms']['daemon.batch_size']['count'])
+        self.assertEqual(2, stats['counters']['daemon.cache_miss'])
+
+    def test_clients_share_the_evaluation(self):
+        for client in (self.client(), self.client()):
+            client.next_event
+        stats = self.sink.stats()
+        self.assertEqual(1, stats['counters']['daemon.cache_miss'])
+        self.assertEqual(1, stats['counters']['daemon.cache_hit'])
+
+    def test_batched_queries(self):
+        async def query_many():
+            return await asyncio.gather(
+                *(self.server.query('home') for _ in range(10)))
+        responses = self.wait_for(query_many())
+        self.assertEqual(1, len({response['now'] for response in responses}))
+        stats = self.sink.stats()
+        self.assertEqual(1, stats['counters']['daemon.cache_miss'])
+        self.assertEqual(
+            10, stats['histograms']['daemon.batch_size']['max'])
+
+    def test_changes_to_the_calendar_are_served(self):
+        self.client().next_event
+        party = SpecialDay(name='Party', year=2018, month=10, day=31)
+        self.calendar.add_event(party)
+        self.assertEqual(
+            [HALLOWEEN, BONFIRE_NIGHT, party], self.client().events)
+        self.assertFalse(self.calendar._publisher)
+
+    def test_changes_are_seen_by_clients_from_the_next_boundary(self):
+        client = self.client()
+        client.next_event
+        party = SpecialDay(name='Party', year=2018, month=10, day=31)
+        self.calendar.add_event(party)
+        # the answer is kept until the next change of state
+        self.assertEqual([HALLOWEEN, BONFIRE_NIGHT], client.events)
+        self.clock.set(client.next_change())
+        self.assertEqual([HALLOWEEN, BONFIRE_NIGHT, party], client.events)
+
+    def test_client_recovers_from_a_timeout(self):
+        query = self.server.query
+        queries = []
+
+        async def slow_query(name, now=None):
+            # answer the first query late
+            queries.append(name)
+            if len(queries) == 1:
+                await asyncio.sleep(0.2)
+            return await query(name, now)
+
+        self.server.query = slow_query
+        client = CalendarClient(
+            self.server.path, 'home', clock=self.clock, timeout=0.05)
+        self.addCleanup(client.close)
+        with self.assertRaises(socket.timeout):
+            client.next_event
+        self.assertEqual(HALLOWEEN, client.next_event)
+
+    def test_lagging_clients_share_the_evaluation(self):
+        self.client().next_event
+        lagging = CalendarClient(
+            self.server.path,
+            'home',
+            clock=VirtualClock(datetime.datetime(2018, 10, 30, 7, 59)))
+        self.addCleanup(lagging.close)
+        self.assertEqual(HALLOWEEN, lagging.next_event)
+        self.assertEqual(
+            self.calendar.seconds_to_next_event + 60,
+            lagging.seconds_to_next_event)
+        stats = self.sink.stats()
+        self.assertEqual(1, stats['counters']['daemon.cache_miss'])
+        self.assertEqual(1, stats['counters']['daemon.cache_hit'])
+
+    def test_queries_before_the_period_are_not_cached(self):
+        # the night before Halloween
+        self.clock.set(datetime.datetime(2018, 10, 30, 19, 1))
+        self.client().next_event
+        lagging = CalendarClient(
+            self.server.path,
+            'home',
+            clock=VirtualClock(datetime.datetime(2018, 10, 30, 18, 59)))
+        self.addCleanup(lagging.close)
+        self.assertFalse(lagging.is_nighttime)
+        self.assertTrue(self.client().is_nighttime)
+        stats = self.sink.stats()
+        self.assertEqual(1, stats['counters']['daemon.cache_miss'])
+        self.assertEqual(1, stats['counters']['daemon.past_query'])
+        self.assertEqual(1, stats['counters']['daemon.cache_hit'])
+
+    def test_unknown_calendar(self):
+        with self.assertRaises(QueryError):
+            self.client('work').next_event
@@ -0,0 +1,100 @@
+import datetime
+import io
+import os
+import tempfile
+import unittest
+
+from sleepcounter.core.loader import (
+    LoadError, load_calendar, load_events, raise_error)
+from sleepcounter.core.mocks import mock_datetime
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.event import Anniversary, SpecialDay
+
+CSV = """name,year,month,day,sleeps
+Halloween,,10,31,20
+Legoland,2019,4,27,
+Nonsense,2019,2,30,
+,2019,1,1,
+Christmas,,12,25,
+"""
+
+JSONL = """{"name": "Halloween", "month": 10, "day": 31, "sleeps": 20}
+
+{"name": "Legoland", "year": 2019, "month": 4, "day": 27}
+not json
+{"name": "Leap day", "month": 2, "day": 29}
+"""
+
+ICS = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+SUMMARY:Hallo
+ ween
+DTSTART;VALUE=DATE:20181031
+RRULE:FREQ=YEARLY;BYMONTH=10;BYMONTHDAY=31
+X-SLEEPCOUNTER-SLEEPS:20
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Legoland\\, Windsor
+DTSTART:20190427T090000
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Monthly
+DTSTART:20190427
+RRULE:FREQ=MONTHLY
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+class LoaderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.errors = []
+
+    def load(self, text, fmt):
+        return list(load_events(io.StringIO(text), fmt, self.errors.append))
+
+    def test_load_csv(self):
+        events = self.load(CSV, "csv")
+        self.assertEqual([
+            Anniversary(name='Halloween', month=10, day=31, sleeps=20),
+            SpecialDay(name='Legoland', year=2019, month=4, day=27),
+            Anniversary(name='Christmas', month=12, day=25),
+        ], events)
+        self.assertEqual([4, 5], [error.line for error in self.errors])
+
+    def test_load_jsonl(self):
+        events = self.load(JSONL, "jsonl")
+        self.assertEqual([
+            Anniversary(name='Halloween', month=10, day=31, sleeps=20),
+            SpecialDay(name='Legoland', year=2019, month=4, day=27),
+        ], events)
+        self.assertEqual([4, 5], [error.line for error in self.errors])
+
+    def test_load_ics(self):
+        events = self.load(ICS, "ics")
+        self.assertEqual([
+            Anniversary(name='Halloween', month=10, day=31, sleeps=20),
+            SpecialDay(name='Legoland, Windsor', year=2019, month=4, day=27),
+        ], events)
+        self.assertEqual([14], [error.line for error in self.errors])
+
+    def test_raise_on_error(self):
+        with self.assertRaises(LoadError):
+            list(load_events(io.StringIO(CSV), "csv", raise_error))
+
+    def test_load_calendar_from_file_in_batches(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "diary.csv")
+            with open(path, "w") as diary:
+                diary.write(CSV)
+            calendar = load_calendar(
+                path, Calendar(), on_error=self.errors.append, batch_size=2)
+        with mock_datetime(target=datetime.datetime(2018, 10, 14, 12)):
+            self.assertEqual('Halloween', calendar.next_event.name)
+            self.assertEqual(3, len(calendar.events))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            list(load_events("diary.txt"))
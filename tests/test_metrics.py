@@ -0,0 +1,59 @@
+import datetime
+import unittest
+
+from sleepcounter.core import metrics
+from sleepcounter.core.mocks import mock_datetime
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.event import Anniversary
+
+
+class MetricsTests(unittest.TestCase):
+
+    def tearDown(self):
+        metrics.disable()
+
+    def test_disabled_by_default(self):
+        self.assertFalse(metrics.enabled())
+        metrics.increment("foo")
+        with metrics.timer("bar"):
+            pass
+        self.assertEqual({}, metrics.stats())
+
+    def test_in_memory_metrics(self):
+        metrics.enable()
+        metrics.increment("foo")
+        metrics.increment("foo", 2)
+        metrics.observe("size", 50)
+        with metrics.timer("bar"):
+            pass
+        stats = metrics.stats()
+        self.assertEqual(3, stats["counters"]["foo"])
+        self.assertEqual(1, stats["timers"]["bar"]["count"])
+        self.assertEqual(1, stats["histograms"]["size"]["buckets"]["le_100"])
+
+    def test_calendar_queries_are_instrumented(self):
+        sink = metrics.enable()
+        calendar = Calendar([
+            Anniversary(name='foo', month=10, day=31),
+            Anniversary(name='bar', month=11, day=5),
+        ])
+        with mock_datetime(target=datetime.datetime(2018, 10, 1, 12)):
+            calendar.next_event
+            calendar.events
+        stats = sink.stats()
+        self.assertEqual(1, stats["counters"]["calendar.next_event"])
+        self.assertEqual(1, stats["counters"]["calendar.events"])
+        self.assertEqual(
+            2, stats["histograms"]["calendar.events_scanned"]["count"])
+        self.assertIn("calendar.find_next_event", stats["timers"])
+
+    def test_periodic_dump(self):
+        metrics.enable()
+        dumps = []
+        dump = metrics.PeriodicDump(0.01, log=dumps.append)
+        dump.start()
+        metrics.increment("foo")
+        dump.join(0.1)
+        dump.stop()
+        dump.join(1)
+        self.assertTrue(dumps)
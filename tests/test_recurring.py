@@ -0,0 +1,156 @@
+import datetime
+import itertools
+import unittest
+
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.clock import VirtualClock
+from sleepcounter.core.time.event import Anniversary, SpecialDay
+from sleepcounter.core.time.recurring import (
+    Easter, NthWeekday, RecurringEvent, Weekly, easter)
+from sleepcounter.core.time.state import decode_event, encode_event
+
+SUNDAY, FRIDAY, SATURDAY = 6, 4, 5
+MOTHERS_DAY = NthWeekday(name="Mother's Day", month=5, weekday=SUNDAY, nth=2)
+PAY_DAY = NthWeekday(name='Pay day', month=None, weekday=FRIDAY, nth=-1)
+SWIMMING = Weekly(name='Swimming', weekday=SATURDAY, sleeps=3)
+GOOD_FRIDAY = Easter(name='Good Friday', offset=-2)
+
+
+class RecurringEventTests(unittest.TestCase):
+
+    def test_easter(self):
+        self.assertEqual(datetime.date(2019, 4, 21), easter(2019))
+        self.assertEqual(datetime.date(2024, 3, 31), easter(2024))
+        self.assertEqual(datetime.date(2038, 4, 25), easter(2038))
+
+    def test_nth_weekday(self):
+        self.assertEqual(
+            (datetime.date(2019, 5, 12),), MOTHERS_DAY.dates_in(2019))
+        self.assertEqual(
+            (datetime.date(2020, 5, 10),), MOTHERS_DAY.dates_in(2020))
+
+    def test_last_weekday_of_every_month(self):
+        dates = PAY_DAY.dates_in(2019)
+        self.assertEqual(12, len(dates))
+        self.assertEqual(datetime.date(2019, 1, 25), dates[0])
+        self.assertEqual(datetime.date(2019, 5, 31), dates[4])
+        self.assertTrue(all(date.weekday() == FRIDAY for date in dates))
+
+    def test_fifth_weekday_skips_short_months(self):
+        event = NthWeekday(name='foo', month=None, weekday=SATURDAY, nth=5)
+        self.assertEqual(
+            [datetime.date(2019, 3, 30), datetime.date(2019, 6, 29)],
+            list(event.dates_in(2019))[:2])
+
+    def test_weekly(self):
+        dates = SWIMMING.dates_in(2019)
+        self.assertEqual(52, len(dates))
+        self.assertEqual(datetime.date(2019, 1, 5), dates[0])
+
+    def test_easter_offset_across_years(self):
+        self.assertEqual(
+            [datetime.date(2020, 4, 10), datetime.date(2021, 4, 2)],
+            list(itertools.islice(
+                GOOD_FRIDAY.occurrences(datetime.date(2019, 4, 20)), 2)))
+
+    def test_invalid_rules(self):
+        with self.assertRaises(ValueError):
+            NthWeekday(name='foo', month=13, weekday=0, nth=1)
+        with self.assertRaises(ValueError):
+            NthWeekday(name='foo', month=1, weekday=0, nth=0)
+        with self.assertRaises(ValueError):
+            Weekly(name='foo', weekday=7)
+
+    def test_rule_must_be_implemented(self):
+        class Fortnightly(RecurringEvent):
+            def _dates_in(self, year):
+                return ()
+
+        with self.assertRaises(TypeError):
+            Fortnightly(name='foo')
+
+    def test_date_rolls_over_at_bedtime(self):
+        # Mother's Day 2019 was the 12th of May
+        on_the_day = datetime.datetime(2019, 5, 12, 12)
+        self.assertEqual(
+            datetime.date(2019, 5, 12), MOTHERS_DAY.date_at(on_the_day))
+        self.assertTrue(MOTHERS_DAY.today_at(on_the_day))
+        self.assertEqual(0, MOTHERS_DAY.sleeps_remaining_at(on_the_day))
+        after_bedtime = datetime.datetime(2019, 5, 12, 20)
+        self.assertEqual(
+            datetime.date(2020, 5, 10), MOTHERS_DAY.date_at(after_bedtime))
+        self.assertFalse(MOTHERS_DAY.today_at(after_bedtime))
+
+    def test_sleeps_are_counted(self):
+        # Saturday the 5th of January 2019
+        now = datetime.datetime(2019, 1, 1, 12)
+        self.assertEqual(4, SWIMMING.sleeps_remaining_at(now))
+        self.assertFalse(SWIMMING.active_at(now))
+        self.assertTrue(SWIMMING.active_at(now + datetime.timedelta(days=1)))
+
+    def test_equality(self):
+        self.assertEqual(
+            MOTHERS_DAY,
+            NthWeekday(name="Mother's Day", month=5, weekday=SUNDAY, nth=2))
+        self.assertNotEqual(
+            MOTHERS_DAY,
+            NthWeekday(name="Mother's Day", month=5, weekday=SUNDAY, nth=3))
+
+    def test_encoding(self):
+        for event in (MOTHERS_DAY, PAY_DAY, SWIMMING, GOOD_FRIDAY):
+            self.assertEqual(event, decode_event(encode_event(event)))
+
+
+class RecurringCalendarTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(datetime.datetime(2019, 5, 1, 12))
+        self.halloween = Anniversary(name='Halloween', month=10, day=31)
+        self.legoland = SpecialDay(
+            name='Legoland', year=2019, month=5, day=4)
+        self.calendar = Calendar(
+            [self.halloween, MOTHERS_DAY, SWIMMING, self.legoland],
+            clock=self.clock)
+
+    def test_next_event(self):
+        self.assertEqual(SWIMMING, self.calendar.next_event)
+        self.assertEqual(3, self.calendar.sleeps_to_next_event)
+        self.clock.advance(datetime.timedelta(days=4))
+        self.assertEqual(MOTHERS_DAY, self.calendar.next_event)
+        self.clock.advance(datetime.timedelta(days=7))
+        self.assertEqual(MOTHERS_DAY, self.calendar.next_event)
+        self.assertEqual(MOTHERS_DAY, self.calendar.todays_event)
+
+    def test_todays_event(self):
+        self.clock.set(datetime.datetime(2019, 5, 4, 12))
+        # Legoland comes after swimming in calendar order
+        self.assertEqual(SWIMMING, self.calendar.todays_event)
+        self.clock.set(datetime.datetime(2019, 5, 11, 12))
+        self.assertEqual(SWIMMING, self.calendar.todays_event)
+        self.clock.set(datetime.datetime(2019, 5, 10, 12))
+        self.assertIsNone(self.calendar.todays_event)
+
+    def test_events_between(self):
+        self.assertEqual(
+            [SWIMMING, self.legoland, SWIMMING, MOTHERS_DAY],
+            self.calendar.events_between(
+                datetime.date(2019, 5, 1), datetime.date(2019, 5, 12)))
+
+    def test_upcoming(self):
+        self.assertEqual(
+            [SWIMMING, self.legoland, MOTHERS_DAY, self.halloween],
+            self.calendar.upcoming(4))
+
+    def test_timeline_matches_snapshots(self):
+        calendar = Calendar([
+            self.halloween, MOTHERS_DAY, SWIMMING, PAY_DAY, GOOD_FRIDAY])
+        start = datetime.date(2019, 1, 1)
+        end = datetime.date(2020, 6, 1)
+        for day in calendar.timeline(start, end):
+            snapshot = calendar.snapshot(datetime.datetime.combine(
+                day.date, datetime.time(6, 30)))
+            self.assertEqual(snapshot.events, day.events, day.date)
+            self.assertIs(snapshot.next_event, day.next_event, day.date)
+            self.assertEqual(
+                snapshot.sleeps_to_next_event, day.sleeps_to_next_event)
+            self.assertIs(snapshot.todays_event, day.todays_event, day.date)
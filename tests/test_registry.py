@@ -0,0 +1,64 @@
+import datetime
+import unittest
+
+from sleepcounter.core.time.clock import VirtualClock
+from sleepcounter.core.time.event import Anniversary, EventBase, SpecialDay
+from sleepcounter.core.time.registry import CalendarRegistry
+
+
+def national_holidays():
+    return [
+        Anniversary(name='Halloween', month=10, day=31, sleeps=20),
+        Anniversary(name='Christmas', month=12, day=25),
+    ]
+
+
+class CalendarRegistryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(datetime.datetime(2018, 10, 14, 12))
+        self.registry = CalendarRegistry(self.clock)
+
+    def test_anniversaries_are_shared_between_tenants(self):
+        first = self.registry.add_tenant('first', national_holidays())
+        second = self.registry.add_tenant('second', national_holidays())
+        for ours, theirs in zip(first.events, second.events):
+            self.assertIs(ours, theirs)
+        self.assertEqual(2, self.registry.shared_events)
+
+    def test_shared_dates_are_computed_once_per_period(self):
+        for tenant in range(10):
+            self.registry.add_tenant(tenant, national_holidays())
+        EventBase.cache_stats.reset()
+        for tenant in self.registry:
+            calendar = self.registry.calendar(tenant)
+            calendar.events
+            calendar.next_event
+        # one date and one sleeps computation per shared event
+        self.assertEqual(4, EventBase.cache_stats.misses)
+
+    def test_tenants_answer_their_own_queries(self):
+        birthday = SpecialDay(name='Party', year=2018, month=10, day=20)
+        self.registry.add_tenant('first', national_holidays())
+        self.registry.add_tenant('second', national_holidays())
+        self.registry.add_event('second', birthday)
+        self.assertEqual(
+            'Halloween', self.registry.calendar('first').next_event.name)
+        self.assertIs(birthday, self.registry.calendar('second').next_event)
+
+    def test_differing_anniversaries_are_not_shared(self):
+        self.registry.add_tenant('first', national_holidays())
+        self.registry.add_events(
+            'first',
+            [Anniversary(name='Christmas', month=12, day=25, sleeps=5)])
+        self.assertEqual(3, self.registry.shared_events)
+
+    def test_tenants(self):
+        self.registry.add_tenant('first')
+        self.assertIn('first', self.registry)
+        with self.assertRaises(ValueError):
+            self.registry.add_tenant('first')
+        self.registry.remove_tenant('first')
+        self.assertEqual(0, len(self.registry))
+        with self.assertRaises(KeyError):
+            self.registry.calendar('first')
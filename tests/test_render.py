@@ -0,0 +1,144 @@
+import datetime
+import os
+import subprocess
+import sys
+import threading
+import unittest
+
+from sleepcounter.core.application import Application
+from sleepcounter.core.render import RenderHost, RenderWidget
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.clock import VirtualClock
+from sleepcounter.core.time.event import Anniversary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HALLOWEEN = Anniversary(name='Halloween', month=10, day=31, sleeps=20)
+
+
+class CountdownWidget(RenderWidget):
+    # draws the sleeps to the next event and the rendering process
+    frame_size = 16
+
+    def __init__(self, calendar, fill=0):
+        super().__init__(calendar)
+        self.fill = fill
+        self.frames = []
+        self.shown = threading.Event()
+
+    @property
+    def render_args(self):
+        return (self.fill,)
+
+    @classmethod
+    def render(cls, state, frame, fill):
+        frame[:] = bytes([fill]) * len(frame)
+        frame[0] = state.sleeps_to_next_event
+        frame[1:5] = os.getpid().to_bytes(4, 'little')
+
+    def show(self, frame):
+        self.frames.append(bytes(frame))
+        self.shown.set()
+
+
+class BrokenWidget(CountdownWidget):
+
+    @classmethod
+    def render(cls, state, frame, fill):
+        raise ValueError('no ink')
+
+
+def pid(frame):
+    return int.from_bytes(frame[1:5], 'little')
+
+
+class RenderWidgetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(datetime.datetime(2018, 10, 30, 12))
+        self.calendar = Calendar([HALLOWEEN], clock=self.clock)
+
+    def test_renders_in_process_without_a_host(self):
+        widget = CountdownWidget(self.calendar, fill=7)
+        widget.update()
+        frame, = widget.frames
+        self.assertEqual(1, frame[0])
+        self.assertEqual(os.getpid(), pid(frame))
+        self.assertEqual(bytes([7]) * 11, frame[5:])
+
+    def test_renders_in_worker_process(self):
+        widget = CountdownWidget(self.calendar, fill=3)
+        with RenderHost(1) as host:
+            host.add(widget)
+            self.assertIs(host, widget.host)
+            widget.update()
+            self.clock.advance(datetime.timedelta(days=1))
+            widget.update()
+        self.assertIsNone(widget.host)
+        first, second = widget.frames
+        self.assertEqual(1, first[0])
+        self.assertEqual(0, second[0])
+        self.assertNotEqual(os.getpid(), pid(first))
+        self.assertEqual(bytes([3]) * 11, first[5:])
+
+    def test_errors_are_raised_in_the_widget(self):
+        widget = BrokenWidget(self.calendar)
+        with RenderHost(1) as host:
+            host.add(widget)
+            with self.assertRaises(ValueError):
+                widget.update()
+        self.assertEqual([], widget.frames)
+
+    def test_removed_widget_renders_in_process(self):
+        widget = CountdownWidget(self.calendar)
+        with RenderHost(1) as host:
+            host.add(widget)
+            host.remove(widget)
+            widget.update()
+        self.assertEqual(os.getpid(), pid(widget.frames[0]))
+
+    def test_widget_must_show_frames(self):
+        class Unseen(RenderWidget):
+            frame_size = 16
+
+            @classmethod
+            def render(cls, state, frame):
+                pass
+
+        with self.assertRaises(TypeError):
+            Unseen(self.calendar)
+
+    def test_widget_needs_frame_size(self):
+        widget = CountdownWidget(self.calendar)
+        widget.frame_size = None
+        with RenderHost(1) as host:
+            with self.assertRaises(ValueError):
+                host.add(widget)
+
+
+class ApplicationRenderTests(unittest.TestCase):
+
+    def test_render_widgets_use_worker_processes(self):
+        widget = CountdownWidget(Calendar([HALLOWEEN]))
+        app = Application([widget], processes=1)
+        app.start()
+        try:
+            self.assertTrue(widget.shown.wait(10))
+        finally:
+            app.stop()
+        self.assertNotEqual(os.getpid(), pid(widget.frames[0]))
+        self.assertIsNone(widget.host)
+
+    def test_importing_application_defers_multiprocessing(self):
+        # a fresh interpreter, since this one has imported everything already
+        script = (
+            "import sys\n"
+            "import sleepcounter.core.application\n"
+            "assert 'multiprocessing' not in sys.modules\n"
+            "import asyncio, unittest.mock\n"
+            "print(asyncio.run(asyncio.sleep(0, 'ok')))\n")
+        output = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=ROOT,
+            check=True,
+            stdout=subprocess.PIPE).stdout
+        self.assertEqual(b'ok', output.strip())
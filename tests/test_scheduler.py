@@ -0,0 +1,162 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+import time
+from unittest import TestCase
+from sleepcounter.core.time.calendar import Calendar
+
+from sleepcounter.core import metrics
+from sleepcounter.core.scheduler import AsyncScheduler, Scheduler
+from sleepcounter.core.widget import BaseWidget
+
+
+class CountingWidget(BaseWidget):
+
+    def __init__(self, calendar, label=None, fail=False):
+        super().__init__(calendar, label)
+        self.updates = 0
+        self.updated = Event()
+        self._fail = fail
+
+    def update(self):
+        self.updates += 1
+        self.updated.set()
+        if self._fail:
+            raise RuntimeError("display unplugged")
+
+
+class SchedulerTests(TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.scheduler.start()
+
+    def tearDown(self):
+        self.scheduler.stop(timeout=1)
+
+    def test_widgets_share_the_scheduler_thread(self):
+        widgets = [CountingWidget(Calendar(), label=i) for i in range(10)]
+        for widget in widgets:
+            widget.start(scheduler=self.scheduler)
+        for widget in widgets:
+            self.assertTrue(widget.updated.wait(1))
+            self.assertFalse(widget.is_alive())
+
+    def test_per_widget_interval(self):
+        fast = CountingWidget(Calendar())
+        slow = CountingWidget(Calendar())
+        fast.mins_between_updates = 0.01 / 60
+        fast.start(scheduler=self.scheduler)
+        slow.start(scheduler=self.scheduler)
+        time.sleep(0.2)
+        self.assertGreater(fast.updates, 5)
+        self.assertEqual(1, slow.updates)
+
+    def test_stopped_widget_is_dropped(self):
+        widget = CountingWidget(Calendar())
+        self.scheduler.add(widget, interval=0.01)
+        widget.stop()
+        time.sleep(0.05)
+        self.assertEqual(0, widget.updates)
+        self.assertEqual(0, len(self.scheduler))
+
+    def test_failing_widget_does_not_stop_others(self):
+        failing = CountingWidget(Calendar(), fail=True)
+        healthy = CountingWidget(Calendar())
+        failing.start(scheduler=self.scheduler)
+        healthy.mins_between_updates = 0.01 / 60
+        healthy.start(scheduler=self.scheduler)
+        self.assertTrue(failing.updated.wait(1))
+        time.sleep(0.1)
+        self.assertGreater(healthy.updates, 1)
+
+
+class HangingWidget(CountingWidget):
+
+    def __init__(self, calendar):
+        super().__init__(calendar)
+        self.release = Event()
+
+    def update(self):
+        super().update()
+        self.release.wait(5)
+
+
+class SchedulerWatchdogTests(TestCase):
+
+    def setUp(self):
+        self.sink = metrics.enable()
+        self.addCleanup(metrics.disable)
+        self.scheduler = Scheduler(update_timeout=0.05)
+        self.scheduler.start()
+        self.hanging = HangingWidget(Calendar())
+        self.addCleanup(self.hanging.release.set)
+
+    def tearDown(self):
+        self.scheduler.stop(timeout=1)
+
+    def test_hung_widget_does_not_hold_up_others(self):
+        healthy = CountingWidget(Calendar())
+        healthy.mins_between_updates = 0.01 / 60
+        self.hanging.start(scheduler=self.scheduler)
+        self.assertTrue(self.hanging.updated.wait(1))
+        healthy.start(scheduler=self.scheduler)
+        self.assertTrue(healthy.updated.wait(1))
+        time.sleep(0.1)
+        self.assertGreater(healthy.updates, 2)
+        self.assertEqual([self.hanging], self.scheduler.updating)
+        self.assertEqual(1, self.sink.stats()['counters']['widget.hung'])
+
+    def test_hung_widget_is_rescheduled_once_it_returns(self):
+        self.hanging.mins_between_updates = 0.01 / 60
+        self.hanging.start(scheduler=self.scheduler)
+        self.assertTrue(self.hanging.updated.wait(1))
+        time.sleep(0.1)
+        self.assertEqual(1, self.hanging.updates)
+        self.hanging.release.set()
+        time.sleep(0.1)
+        self.assertGreater(self.hanging.updates, 2)
+        self.assertEqual(1, self.sink.stats()['counters']['widget.hung'])
+
+    def test_stop_reports_hung_widgets(self):
+        self.hanging.start(scheduler=self.scheduler)
+        self.assertTrue(self.hanging.updated.wait(1))
+        start = time.monotonic()
+        self.assertEqual([self.hanging], self.scheduler.stop(timeout=0.1))
+        self.assertLess(time.monotonic() - start, 1)
+
+
+class AsyncSchedulerWatchdogTests(TestCase):
+
+    def setUp(self):
+        self.sink = metrics.enable()
+        self.addCleanup(metrics.disable)
+        self.executor = ThreadPoolExecutor(2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_hung_plain_update_is_left_running(self):
+        hanging = HangingWidget(Calendar())
+        hanging.mins_between_updates = 0.01 / 60
+        self.addCleanup(hanging.release.set)
+        healthy = CountingWidget(Calendar())
+        healthy.mins_between_updates = 0.01 / 60
+
+        async def run():
+            scheduler = AsyncScheduler(self.executor, update_timeout=0.05)
+            hanging.start(scheduler=scheduler)
+            healthy.start(scheduler=scheduler)
+            await asyncio.sleep(0.2)
+            # the hung widget's task has finished rather than waiting
+            self.assertEqual(1, len(scheduler))
+            self.assertEqual(1, hanging.updates)
+            self.assertGreater(healthy.updates, 2)
+            hanging.release.set()
+            await asyncio.sleep(0.1)
+            self.assertEqual(2, len(scheduler))
+            hanging.stop()
+            healthy.stop()
+            await scheduler.stop()
+
+        asyncio.run(run())
+        self.assertGreater(hanging.updates, 2)
+        self.assertEqual(1, self.sink.stats()['counters']['widget.hung'])
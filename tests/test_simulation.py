@@ -0,0 +1,94 @@
+import datetime
+import time
+import unittest
+
+from sleepcounter.core.application import Application
+from sleepcounter.core.simulation import Simulation
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.clock import VirtualClock, get_clock, use_clock
+from sleepcounter.core.time.event import Anniversary, SpecialDay
+from sleepcounter.core.time.state import SharedState
+from sleepcounter.core.widget import BaseWidget
+
+HALLOWEEN = Anniversary(name='Halloween', month=10, day=31, sleeps=20)
+LEGOLAND = SpecialDay(name='Legoland', year=2019, month=4, day=27)
+
+
+class SleepsWidget(BaseWidget):
+
+    def update(self):
+        if self.calendar.is_nighttime:
+            return "zzz"
+        return self.calendar.sleeps_to_next_event
+
+
+class VirtualClockTests(unittest.TestCase):
+
+    def test_events_read_installed_clock(self):
+        clock = VirtualClock(datetime.datetime(2018, 10, 29, 12))
+        with use_clock(clock):
+            self.assertEqual(2, HALLOWEEN.sleeps_remaining)
+            clock.advance(datetime.timedelta(days=1))
+            self.assertEqual(1, HALLOWEEN.sleeps_remaining)
+        self.assertIsNot(clock, get_clock())
+
+    def test_calendar_with_own_clock(self):
+        clock = VirtualClock(datetime.datetime(2018, 10, 31, 8))
+        calendar = Calendar([HALLOWEEN], clock=clock)
+        self.assertEqual(HALLOWEEN, calendar.todays_event)
+        clock.advance(datetime.timedelta(hours=12))
+        self.assertTrue(calendar.is_nighttime)
+        self.assertIsNone(calendar.todays_event)
+
+    def test_cannot_go_backwards(self):
+        clock = VirtualClock(datetime.datetime(2018, 10, 31, 8))
+        with self.assertRaises(ValueError):
+            clock.advance(datetime.timedelta(hours=-1))
+
+
+class SimulationTests(unittest.TestCase):
+
+    def test_simulate_a_year(self):
+        widget = SleepsWidget(Calendar([HALLOWEEN, LEGOLAND]), label='sleeps')
+        app = Application([widget])
+        start = time.monotonic()
+        trace = app.simulate(
+            datetime.datetime(2018, 5, 1, 12),
+            datetime.datetime(2019, 5, 1, 12))
+        self.assertLess(time.monotonic() - start, 30)
+        self.assertFalse(widget.running)
+        # one update at the start then one at each wake-up and bedtime
+        self.assertEqual(1 + 2 * 365, len(trace))
+        shown = {entry.time: entry.result for entry in trace}
+        self.assertEqual(2, shown[datetime.datetime(2018, 10, 29, 6, 30)])
+        self.assertEqual(
+            "zzz", shown[datetime.datetime(2018, 10, 29, 19, 0, 0, 1)])
+        halloween = shown[datetime.datetime(2018, 10, 31, 6, 30)]
+        self.assertEqual(0, halloween)
+        entry = next(
+            entry for entry in trace
+            if entry.time == datetime.datetime(2018, 10, 31, 6, 30))
+        self.assertEqual(HALLOWEEN, entry.snapshot.todays_event)
+        self.assertIs(widget, entry.widget)
+        self.assertIsNone(entry.error)
+
+    def test_simulate_stand_in_calendar(self):
+        shared = SharedState(Calendar([HALLOWEEN]))
+        trace = Simulation([SleepsWidget(shared)]).run(
+            datetime.datetime(2018, 10, 30, 12),
+            datetime.datetime(2018, 10, 31, 12))
+        self.assertEqual([1, 'zzz', 0], [entry.result for entry in trace])
+        snapshot = trace[-1].snapshot
+        self.assertEqual(trace[-1].time, snapshot.now)
+        self.assertEqual(HALLOWEEN, snapshot.todays_event)
+        self.assertEqual(
+            Calendar([HALLOWEEN]).snapshot(snapshot.now).seconds_to_next_event,
+            snapshot.seconds_to_next_event)
+
+    def test_system_clock_between_updates(self):
+        replay = Simulation([SleepsWidget(Calendar([HALLOWEEN]))]).replay(
+            datetime.datetime(2018, 1, 1, 12),
+            datetime.datetime(2018, 1, 2, 12))
+        next(replay)
+        self.assertNotIsInstance(get_clock(), VirtualClock)
+        replay.close()
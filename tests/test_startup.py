@@ -0,0 +1,180 @@
+import datetime
+import importlib
+import os
+import tempfile
+from threading import Event
+import unittest
+from unittest import mock
+
+from sleepcounter.core import diary, metrics
+from sleepcounter.core.lazy import lazy_import
+from sleepcounter.core.startup import StartupCache, StartupCalendar
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.time.clock import VirtualClock
+from sleepcounter.core.time.event import Anniversary, SpecialDay
+from sleepcounter.core.time.recurring import Weekly
+from sleepcounter.core.time.state import CalendarState
+
+HALLOWEEN = Anniversary(name='Halloween', month=10, day=31, sleeps=20)
+BONFIRE_NIGHT = Anniversary(name='Bonfire Night', month=11, day=5)
+LEGOLAND = SpecialDay(name='Legoland', year=2018, month=11, day=1, sleeps=20)
+
+
+class StartupCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(datetime.datetime(2018, 10, 30, 8))
+        self.calendar = Calendar(
+            [HALLOWEEN, BONFIRE_NIGHT, LEGOLAND], clock=self.clock)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache = StartupCache(
+            os.path.join(self.directory.name, 'state.json'))
+
+    def state(self):
+        return CalendarState.from_snapshot(self.calendar.snapshot())
+
+    def test_round_trip(self):
+        state = self.state()
+        self.cache.save(state)
+        loaded = self.cache.load(self.clock.now())
+        self.assertEqual(state.events, loaded.events)
+        self.assertEqual(state.next_event, loaded.next_event)
+        self.assertEqual(state.valid_until, loaded.valid_until)
+        self.assertEqual(
+            state.sleeps_to_next_event, loaded.sleeps_to_next_event)
+        self.assertFalse(os.path.exists(self.cache.path + '.tmp'))
+
+    def test_missing_file(self):
+        self.assertIsNone(self.cache.load(self.clock.now()))
+
+    def test_expired_state(self):
+        state = self.state()
+        self.cache.save(state)
+        self.assertIsNone(self.cache.load(state.valid_until))
+
+    def test_unreadable_file(self):
+        with open(self.cache.path, 'w') as stream:
+            stream.write('{"now": ')
+        self.assertIsNone(self.cache.load(self.clock.now()))
+
+
+class StartupCalendarTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(datetime.datetime(2018, 10, 30, 8))
+        self.calendar = Calendar([HALLOWEEN, BONFIRE_NIGHT], clock=self.clock)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache = StartupCache(
+            os.path.join(self.directory.name, 'state.json'))
+        self.release = Event()
+        self.addCleanup(self.release.set)
+        self.sink = metrics.enable()
+        self.addCleanup(metrics.disable)
+
+    def load(self):
+        self.release.wait(1)
+        return self.calendar
+
+    def startup(self):
+        return StartupCalendar(self.load, self.cache, clock=self.clock)
+
+    def test_answers_from_the_cache_while_loading(self):
+        self.cache.save(
+            CalendarState.from_snapshot(self.calendar.snapshot()))
+        calendar = self.startup()
+        self.assertFalse(calendar.loaded)
+        self.assertEqual(HALLOWEEN, calendar.next_event)
+        self.assertEqual(1, calendar.sleeps_to_next_event)
+        self.assertEqual(
+            self.calendar.seconds_to_next_event,
+            calendar.seconds_to_next_event)
+        self.assertFalse(calendar.loaded)
+        self.assertEqual(
+            1, self.sink.stats()['counters']['startup.cache_hit'])
+
+    def test_waits_for_the_calendar_without_a_cache(self):
+        calendar = self.startup()
+        with self.assertRaises(TimeoutError):
+            calendar.wait(0)
+        self.release.set()
+        self.assertEqual(HALLOWEEN, calendar.next_event)
+        self.assertTrue(calendar.loaded)
+        self.assertEqual(
+            1, self.sink.stats()['counters']['startup.cache_miss'])
+        # the new state is saved for the next start
+        saved = self.cache.load(self.clock.now())
+        self.assertEqual(HALLOWEEN, saved.next_event)
+
+    def test_follows_the_calendar_once_loaded(self):
+        self.release.set()
+        calendar = self.startup()
+        calendar.wait(1)
+        self.clock.advance(datetime.timedelta(days=2))
+        self.assertEqual(BONFIRE_NIGHT, calendar.next_event)
+        self.assertEqual(
+            BONFIRE_NIGHT, self.cache.load(self.clock.now()).next_event)
+
+    def test_changes_to_events_are_seen(self):
+        self.release.set()
+        calendar = self.startup()
+        calendar.wait(1)
+        self.assertEqual(HALLOWEEN, calendar.next_event)
+        calendar.add_event(LEGOLAND)
+        self.assertIn(LEGOLAND, calendar.events)
+        self.assertFalse(self.calendar._publisher)
+
+    def test_runs_without_the_cache_for_custom_events(self):
+        class Lessons(Weekly):
+            pass
+
+        lessons = Lessons(name='Swimming', weekday=1)
+        self.calendar.add_event(lessons)
+        self.release.set()
+        calendar = self.startup()
+        with self.assertLogs('startup', 'WARNING'):
+            self.assertEqual(lessons, calendar.next_event)
+        self.assertIsNone(self.cache.load(self.clock.now()))
+        self.assertFalse(os.path.exists(self.cache.path + '.tmp'))
+
+    def test_load_errors_are_raised(self):
+        def load():
+            raise OSError('no diary')
+        calendar = StartupCalendar(load, self.cache, clock=self.clock)
+        with self.assertRaises(OSError):
+            calendar.wait(1)
+
+
+class FirstUpdateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = metrics.enable()
+        self.addCleanup(metrics.disable)
+
+    def test_recorded_once(self):
+        with mock.patch.object(metrics, '_first_update_done', False):
+            metrics.first_update()
+            metrics.first_update()
+        timers = self.sink.stats()['timers']
+        self.assertEqual(1, timers['startup.first_update']['count'])
+
+
+class DiaryTests(unittest.TestCase):
+
+    def test_custom_diary_built_on_first_use(self):
+        module = importlib.reload(diary)
+        self.assertNotIn('CUSTOM_DIARY', vars(module))
+        custom = module.CUSTOM_DIARY
+        self.assertIs(custom, module.CUSTOM_DIARY)
+        self.assertIsInstance(custom, Calendar)
+
+
+class LazyImportTests(unittest.TestCase):
+
+    def test_imported_module_is_returned(self):
+        self.assertIs(unittest, lazy_import('unittest'))
+
+    def test_submodules_are_not_deferred(self):
+        with self.assertRaises(ValueError):
+            lazy_import('concurrent.futures')
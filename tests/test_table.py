@@ -0,0 +1,64 @@
+import datetime
+import random
+import unittest
+
+from sleepcounter.core.mocks import random_events
+from sleepcounter.core.time.event import Anniversary
+
+try:
+    import numpy
+    from sleepcounter.core.time.table import EventTable
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class EventTableTests(unittest.TestCase):
+
+    def test_matches_scalar_events(self):
+        events = random_events(300)
+        table = EventTable(events)
+        rand = random.Random(1)
+        times = [
+            datetime.datetime(2018, 10, 31, 5, 0),
+            datetime.datetime(2018, 10, 31, 6, 30),
+            datetime.datetime(2018, 10, 31, 19, 0),
+            datetime.datetime(2018, 10, 31, 19, 0, 1),
+            datetime.datetime(2018, 12, 31, 23, 59),
+        ]
+        times += [
+            datetime.datetime(2018, 1, 1) + datetime.timedelta(
+                minutes=rand.randint(0, 2 * 365 * 24 * 60))
+            for _ in range(30)]
+        for now in times:
+            result = table.evaluate(now)
+            for i, event in enumerate(events):
+                self.assertEqual(
+                    event.date_at(now), result.date[i].astype(datetime.date))
+                self.assertEqual(
+                    event.seconds_remaining_at(now),
+                    result.seconds_remaining[i])
+                self.assertEqual(
+                    event.sleeps_remaining_at(now),
+                    result.sleeps_remaining[i])
+                self.assertEqual(event.active_at(now), result.active[i])
+                self.assertEqual(event.today_at(now), result.today[i])
+
+    def test_next_event(self):
+        events = random_events(50, seed=2)
+        table = EventTable(events)
+        now = datetime.datetime(2018, 6, 1, 12)
+        active = [ev for ev in events if ev.active_at(now)]
+        expected = min(active, key=lambda ev: ev.seconds_remaining_at(now))
+        self.assertIs(expected, table.next_event(now))
+
+    def test_rollover_of_anniversary_after_bedtime(self):
+        table = EventTable([Anniversary(name='foo', month=10, day=31)])
+        result = table.evaluate(datetime.datetime(2018, 10, 31, 20))
+        self.assertTrue(result.rolled_over[0])
+        self.assertEqual(2019, result.date[0].astype(datetime.date).year)
+
+    def test_invalid_date_raises(self):
+        table = EventTable([Anniversary(name='leap', month=2, day=29)])
+        with self.assertRaises(ValueError):
+            table.evaluate(datetime.datetime(2018, 1, 1))
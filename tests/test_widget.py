@@ -0,0 +1,58 @@
+import datetime
+import threading
+from unittest import TestCase
+
+from sleepcounter.core.mocks import mock_datetime
+from sleepcounter.core.time.calendar import Calendar
+from sleepcounter.core.widget import BaseWidget
+
+
+class Widget(BaseWidget):
+
+    def update(self):
+        pass
+
+
+class WidgetUpdateTimingTests(TestCase):
+
+    def test_update_at_wake_up_time(self):
+        widget = Widget(Calendar())
+        with mock_datetime(target=datetime.datetime(2018, 10, 31, 6, 0)):
+            self.assertEqual(30 * 60, widget.seconds_until_update())
+
+    def test_update_after_bedtime(self):
+        widget = Widget(Calendar())
+        with mock_datetime(target=datetime.datetime(2018, 10, 31, 18, 0)):
+            self.assertEqual(3600.000001, widget.seconds_until_update())
+
+    def test_polling_widget(self):
+        widget = Widget(Calendar())
+        widget.mins_between_updates = 5
+        self.assertEqual(300, widget.seconds_until_update())
+
+    def test_next_change_of_calendar(self):
+        calendar = Calendar()
+        self.assertEqual(
+            datetime.datetime(2018, 11, 1, 6, 30),
+            calendar.next_change(datetime.datetime(2018, 10, 31, 23)))
+
+
+class WidgetLifecycleTests(TestCase):
+
+    def test_stop_interrupts_wait_for_next_update(self):
+        class SlowWidget(BaseWidget):
+            mins_between_updates = 120
+
+            def __init__(self, calendar):
+                super().__init__(calendar)
+                self.updated = threading.Event()
+
+            def update(self):
+                self.updated.set()
+
+        widget = SlowWidget(Calendar())
+        widget.start()
+        self.assertTrue(widget.updated.wait(1))
+        widget.stop()
+        widget.join(1)
+        self.assertFalse(widget.is_alive())